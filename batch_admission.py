@@ -0,0 +1,322 @@
+"""
+Headless bulk admission, for loading another clinic's records without the menus:
+    python batch_admission.py admissions.csv
+    python batch_admission.py admissions.jsonl --payment-method card --rejects rejects.csv
+Columns / JSON keys: name, age, urgent_care, specialist_needed, regular_checkup,
+follow_up, insurance, chronic_condition (y/n, blank = n), insurance_type (required
+with insurance=y), specific_doctor (a DoctorID, only with specialist_needed=y),
+payment_method (cash/card; rows without one are admitted but not billed unless
+--payment-method is given) and an optional source_id / patient_id that is kept
+in the --id-map output only: every admitted row gets a fresh ID from the shared
+sequence.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from billing import BillingSystem
+from doctors import DoctorDirectory
+from id_allocator import PatientIdAllocator, parse_patient_id
+from metrics import METRICS
+from money import format_cents
+from patient import Patient
+from storage import StorageBackend, open_storage
+from utilities import validate_input
+
+FLAG_FIELDS = ("urgent_care", "specialist_needed", "regular_checkup", "follow_up", "insurance", "chronic_condition")
+AGE_RANGE = [0, 150]  # as in add_new_patient
+INSURANCE_TYPES = ["private", "public"]
+PAYMENT_METHODS = ["cash", "card"]
+SOURCE_ID_FIELDS = ("source_id", "patient_id")
+BATCH_SIZE = 5000
+SEQ_PATH = "data/patients.seq"
+
+# (patient without its ID yet, payment method or None, source ID)
+Admission = Tuple[Patient, Optional[str], str]
+
+
+def _text(value) -> str:
+    """JSON values as the strings a prompt would have received (true/false -> y/n)."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return 'y' if value else 'n'
+    return str(value)
+
+
+def iter_admission_records(path: str, fmt: Optional[str] = None) -> Iterator[Tuple[int, Optional[Dict], str]]:
+    """
+    (line number, record, error) per input row; record is None when the row could
+    not be read (error says why). fmt is "csv" or "jsonl" (default: by extension).
+    """
+    fmt = fmt or ("jsonl" if path.lower().endswith((".jsonl", ".ndjson")) else "csv")
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for record in reader:
+                if None in record:
+                    yield reader.line_num, None, "row: more values than header columns"
+                else:
+                    yield reader.line_num, record, ""
+            return
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f"row: invalid JSON ({e})"
+                continue
+            if not isinstance(record, dict):
+                yield line_number, None, "row: not a JSON object"
+                continue
+            yield line_number, record, ""
+
+
+def _validate_choice(name: str, value: str, choices: List[str]) -> str:
+    try:
+        return validate_input(value, "choice", choices)
+    except ValueError as e:
+        raise ValueError(f"{name}: {value!r} rejected. {e}") from None
+
+
+def validate_admission(record: Dict, doctors: DoctorDirectory,
+                       default_method: Optional[str] = None) -> Admission:
+    """
+    One record -> (Patient with an empty patient_id, payment method, source ID),
+    checked with the prompt rules (utilities.validate_input). Raises ValueError
+    starting with the offending field name.
+    """
+    def field(name: str, kind: str = "text", valid_range=None, default=None):
+        raw = _text(record.get(name)).strip()
+        if not raw and default is not None:
+            return default
+        try:
+            return validate_input(raw, kind, valid_range)
+        except ValueError as e:
+            raise ValueError(f"{name}: {raw!r} rejected. {e}") from None
+
+    name = field("name")
+    age = field("age", "number", AGE_RANGE)
+    flags = {flag: field(flag, "yes_no", default='n') for flag in FLAG_FIELDS}
+
+    insurance_type = _text(record.get("insurance_type")).strip().lower()
+    if flags["insurance"] == 'y':
+        insurance_type = _validate_choice("insurance_type", insurance_type, INSURANCE_TYPES)
+    elif insurance_type:
+        raise ValueError(f"insurance_type: {insurance_type!r} given but insurance is 'n'")
+    else:
+        insurance_type = None
+
+    doctor_id = _text(record.get("specific_doctor")).strip() or None
+    if doctor_id is not None:
+        if flags["specialist_needed"] != 'y':
+            raise ValueError(f"specific_doctor: {doctor_id!r} given but specialist_needed is 'n'")
+        doctor = doctors.get(doctor_id)
+        if doctor is None:
+            raise ValueError(f"specific_doctor: unknown DoctorID {doctor_id!r}")
+        doctor_id = doctor.doctor_id
+
+    method = _text(record.get("payment_method")).strip().lower()
+    method = _validate_choice("payment_method", method, PAYMENT_METHODS) if method else default_method
+
+    source_id = next((_text(record.get(key)).strip() for key in SOURCE_ID_FIELDS if record.get(key)), "")
+    patient = Patient("", name.strip(), age,
+                      flags["urgent_care"], flags["specialist_needed"], flags["regular_checkup"],
+                      flags["follow_up"], flags["insurance"], flags["chronic_condition"],
+                      doctor_id, insurance_type)
+    return patient, method, source_id
+
+
+class AdmissionReport:
+    """Counters of one import run, printed by report()."""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.rows = 0
+        self.admitted = 0
+        self.batches = 0
+        self.payments = 0
+        self.billed_cents = 0
+        self.rejected = 0
+        self.reasons: Counter = Counter()  # field -> rejected rows
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self.commit_seconds = 0.0
+
+    def reject(self, reason: str):
+        self.rejected += 1
+        self.reasons[reason.split(":", 1)[0]] += 1
+
+    def report(self, stream=None, rejects_path: Optional[str] = None, dry_run: bool = False):
+        stream = stream or sys.stdout
+        rate = self.rows / self.elapsed if self.elapsed else 0.0
+        print(f"\nRead {self.rows:,} row(s) from {self.source} in {self.elapsed:.2f} s ({rate:,.0f} rows/sec)",
+              file=stream)
+        if dry_run:
+            print(f"  valid:    {self.admitted:,} (dry run, nothing written)", file=stream)
+        else:
+            admitted_rate = self.admitted / self.elapsed if self.elapsed else 0.0
+            print(f"  admitted: {self.admitted:,} in {self.batches:,} batch(es), "
+                  f"{admitted_rate:,.0f} patients/sec ({self.commit_seconds:.2f} s writing)", file=stream)
+            print(f"  billed:   {self.payments:,} payment(s), €{format_cents(self.billed_cents)}", file=stream)
+        where = f" (see {rejects_path})" if rejects_path and self.rejected else ""
+        print(f"  rejected: {self.rejected:,}{where}", file=stream)
+        for reason, count in self.reasons.most_common():
+            print(f"    {reason:<20} {count:,}", file=stream)
+
+
+class BatchAdmission:
+    """
+    Validates admission records and commits them in batches of `batch_size`:
+    - one PatientIdAllocator.allocate(n) per batch (a single locked sequence update)
+    - one storage.add_patients() per batch (CSV: one buffered write and fsync;
+      SQLite: one transaction), then the batch's payments in one
+      BillingSystem.save_payments() call, then storage.flush()
+    - the summary aggregates are updated per patient and checkpointed at the end
+    Rejected rows go to the report (and the rejects CSV when given) and never
+    stop the import.
+    """
+
+    def __init__(self, storage: StorageBackend, batch_size: int = BATCH_SIZE, billing: bool = True,
+                 default_method: Optional[str] = None, seq_path: str = SEQ_PATH, dry_run: bool = False):
+        self.storage = storage
+        self.batch_size = max(1, batch_size)
+        self.billing_enabled = billing
+        self.default_method = default_method
+        self.dry_run = dry_run
+        state = storage.load_state()
+        self.doctors = state.doctors
+        self.billing = BillingSystem(storage=storage, services=state.services)
+        self.allocator = PatientIdAllocator(seq_path)
+        if not dry_run:
+            self.allocator.reconcile(max(filter(None, map(parse_patient_id, state.patients.patient_ids)),
+                                         default=None))
+        self.summary = None if dry_run else storage.load_summary()
+
+    def run(self, records: Iterable[Tuple[int, Optional[Dict], str]], report: AdmissionReport,
+            rejects=None, id_map=None) -> AdmissionReport:
+        """
+        records: (line, record, read error) as from iter_admission_records.
+        rejects / id_map: optional csv.writer for rejected rows and source -> new IDs.
+        """
+        batch: List[Tuple[int, Admission]] = []
+        for line, record, error in records:
+            report.rows += 1
+            if record is not None:
+                try:
+                    batch.append((line, validate_admission(record, self.doctors, self.default_method)))
+                except ValueError as e:
+                    error = str(e)
+            if error:
+                report.reject(error)
+                if rejects is not None:
+                    rejects.writerow([line, error, json.dumps(record) if record is not None else ""])
+            if len(batch) >= self.batch_size:
+                self._commit(batch, report, id_map)
+                batch = []
+        if batch:
+            self._commit(batch, report, id_map)
+        if self.summary is not None:
+            self.storage.save_summary(self.summary)
+        self.storage.flush()
+        report.elapsed = time.perf_counter() - report.started
+        return report
+
+    def _commit(self, batch: List[Tuple[int, Admission]], report: AdmissionReport, id_map):
+        if self.dry_run:
+            report.admitted += len(batch)
+            return
+        start = time.perf_counter()
+        with METRICS.timer("operation_seconds", op="admission_batch"):
+            patients = [patient for _, (patient, _, _) in batch]
+            for patient, patient_id in zip(patients, self.allocator.allocate(len(patients))):
+                patient.patient_id = patient_id
+            self.storage.add_patients(patients)
+            if self.billing_enabled:
+                self._bill([(patient, method) for _, (patient, method, _) in batch if method], report)
+            self.storage.flush()
+        for patient in patients:
+            self.summary.add(patient)
+        if id_map is not None:
+            id_map.writerows([line, source_id, patient.patient_id] for line, (patient, _, source_id) in batch)
+        METRICS.inc("patients_registered_total", len(patients))
+        report.admitted += len(patients)
+        report.batches += 1
+        report.commit_seconds += time.perf_counter() - start
+
+    def _bill(self, billable: List[Tuple[Patient, str]], report: AdmissionReport):
+        if not billable:
+            return
+        rules = self.billing.rules  # one price list version for the whole batch
+        totals, discounted = rules.bill_many([patient for patient, _ in billable])
+        payments = [
+            (patient.patient_id, rules.services_for(patient), total, discounted_total, method, rules.version)
+            for (patient, method), total, discounted_total in zip(billable, totals, discounted)
+            if total
+        ]
+        self.billing.save_payments(payments)
+        report.payments += len(payments)
+        report.billed_cents += sum(payment[3] for payment in payments)
+
+    def close(self):
+        self.storage.close()
+
+
+def _open_csv(path: Optional[str], header: List[str]):
+    if not path:
+        return None, None
+    f = open(path, 'w', newline='', encoding='utf-8')
+    writer = csv.writer(f)
+    writer.writerow(header)
+    return f, writer
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Admit patients in bulk from a CSV or JSONL file")
+    parser.add_argument("path", help="admissions .csv or .jsonl")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="default: from the file extension")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--payment-method", choices=PAYMENT_METHODS,
+                        help="bill rows without a payment_method with this method")
+    parser.add_argument("--no-billing", action="store_true", help="admit only, record no payments")
+    parser.add_argument("--storage", choices=("csv", "sqlite"), help="default: $HOSPITAL_STORAGE or csv")
+    parser.add_argument("--rejects", help="write rejected rows (line, reason, record) to this CSV")
+    parser.add_argument("--id-map", help="write line, source_id, new patient_id of admitted rows to this CSV")
+    parser.add_argument("--dry-run", action="store_true", help="validate only")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.path):
+        print(f"Error: {args.path} not found.")
+        return 1
+    admission = BatchAdmission(open_storage(args.storage), args.batch_size, not args.no_billing,
+                               args.payment_method, dry_run=args.dry_run)
+    rejects_file, rejects = _open_csv(args.rejects, ["line", "reason", "record"])
+    id_map_file, id_map = _open_csv(None if args.dry_run else args.id_map, ["line", "source_id", "patient_id"])
+    report = AdmissionReport(args.path)
+    try:
+        admission.run(iter_admission_records(args.path, args.format), report, rejects, id_map)
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        print(f"Error reading {args.path}: {e}")
+        return 1
+    finally:
+        admission.close()
+        for f in (rejects_file, id_map_file):
+            if f is not None:
+                f.close()
+        if report.elapsed == 0.0:
+            report.elapsed = time.perf_counter() - report.started
+        report.report(rejects_path=args.rejects, dry_run=args.dry_run)
+    return 0
+
+
+if __name__ == "__main__":
+    METRICS.start()
+    try:
+        sys.exit(main(sys.argv[1:]))
+    finally:
+        METRICS.stop()
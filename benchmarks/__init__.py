@@ -0,0 +1,4 @@
+"""
+Stand-alone performance scripts. Run from the repository root, e.g.
+  python -m benchmarks.bench_loader --rows 1000000
+"""
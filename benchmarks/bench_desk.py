@@ -0,0 +1,176 @@
+"""
+Load test for desk_server: many connections, each pipelining requests, with a
+mix of reads (search, get, quote) and writes (allocate, register, bill).
+  python -m benchmarks.bench_desk                       # own server on synthetic data
+  python -m benchmarks.bench_desk --address 127.0.0.1:7400 --write-ratio 0
+Reports requests/sec and p50 / p99 latency per operation, and fails if two
+registrations were given the same patient ID (some registrations bring an ID
+from an earlier allocate, the rest take one from the server's sequence).
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+from benchmarks.generators import FIRST_NAMES, format_scale, parse_scale
+from benchmarks.harness import percentile
+from benchmarks.suite import Dataset
+from desk_protocol import MAX_LINE, decode, encode, parse_address
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _request(rng: random.Random, ids: List[str], write_ratio: float, allocated: List[str]):
+    """(op, args) drawn from the read / write mix; registrations use up `allocated` IDs first."""
+    if rng.random() < write_ratio:
+        kind = rng.random()
+        if kind < 0.4:
+            args = {
+                "name": f"Load Test {rng.randrange(1_000_000)}", "age": rng.randint(0, 99),
+                "urgent_care": rng.choice("yn"), "regular_checkup": rng.choice("yn"),
+                "payment_method": rng.choice(("cash", "card")),
+            }
+            if allocated:
+                args["patient_id"] = allocated.pop()
+            return "register", args
+        if kind < 0.5:
+            return "allocate", {"count": 2}
+        return "bill", {"patient_id": rng.choice(ids), "payment_method": rng.choice(("cash", "card"))}
+    kind = rng.random()
+    if kind < 0.4:
+        return "search", {"name": rng.choice(FIRST_NAMES)[:3].lower(), "limit": 20}
+    if kind < 0.7:
+        return "get", {"patient_id": rng.choice(ids)}
+    return "quote", {"patient_id": rng.choice(ids)}
+
+
+async def _connection(address: str, requests: int, depth: int, ids: List[str], write_ratio: float,
+                      seed: int, latencies: Dict[str, List[int]], errors: List[str], registered: List[str]):
+    kind, host, port = parse_address(address)
+    if kind == "unix":
+        reader, writer = await asyncio.open_unix_connection(host, limit=MAX_LINE)
+    else:
+        reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE)
+    rng = random.Random(seed)
+    in_flight = asyncio.Semaphore(depth)
+    sent: Dict[int, tuple] = {}  # id -> (op, send time ns)
+    allocated: List[str] = []  # IDs from allocate answers, not registered yet
+
+    async def receive():
+        for _ in range(requests):
+            response = decode(await reader.readline())
+            op, started = sent.pop(response["id"])
+            latencies.setdefault(op, []).append(time.perf_counter_ns() - started)
+            if not response.get("ok"):
+                errors.append(f"{op}: {response.get('error')}")
+            elif op == "allocate":
+                allocated.extend(response["result"]["ids"])
+            elif op == "register":
+                registered.append(response["result"]["patient"]["patient_id"])
+            in_flight.release()
+
+    receiver = asyncio.create_task(receive())
+    for request_id in range(requests):
+        await in_flight.acquire()
+        op, args = _request(rng, ids, write_ratio, allocated)
+        sent[request_id] = (op, time.perf_counter_ns())
+        writer.write(encode({"id": request_id, "op": op, "args": args}))
+        if len(sent) >= depth or request_id == requests - 1:
+            await writer.drain()
+    await receiver
+    writer.close()
+
+
+async def load(address: str, connections: int, requests: int, depth: int, ids: List[str],
+               write_ratio: float) -> Dict:
+    latencies: Dict[str, List[int]] = {}
+    errors: List[str] = []
+    registered: List[str] = []
+    per_connection = max(1, requests // connections)
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        _connection(address, per_connection, depth, ids, write_ratio, seed, latencies, errors, registered)
+        for seed in range(connections)
+    ))
+    elapsed = time.perf_counter() - started
+    return {"elapsed": elapsed, "requests": per_connection * connections, "latencies": latencies, "errors": errors,
+            "duplicates": _duplicates(registered, ids)}
+
+
+def _duplicates(registered: List[str], existing: List[str]) -> List[str]:
+    """Patient IDs given to two registrations, or to a registration and an existing patient."""
+    counts = Counter(registered)
+    counts.update(set(existing) & counts.keys())
+    return [patient_id for patient_id, n in counts.items() if n > 1]
+
+
+def report(result: Dict):
+    elapsed = result["elapsed"]
+    print(f"\n{result['requests']:,} requests in {elapsed:.2f} s: {result['requests'] / elapsed:,.0f} req/s")
+    print(f"{'op':<10} {'count':>9} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    everything = []
+    for op, samples in sorted(result["latencies"].items()):
+        samples.sort()
+        everything += samples
+        print(f"{op:<10} {len(samples):>9,} {percentile(samples, 50) / 1e6:>9.2f} "
+              f"{percentile(samples, 99) / 1e6:>9.2f} {samples[-1] / 1e6:>9.2f}")
+    everything.sort()
+    print(f"{'all':<10} {len(everything):>9,} {percentile(everything, 50) / 1e6:>9.2f} "
+          f"{percentile(everything, 99) / 1e6:>9.2f} {everything[-1] / 1e6:>9.2f}")
+    if result["errors"]:
+        print(f"{len(result['errors']):,} error response(s), e.g. {result['errors'][0]}")
+    if result["duplicates"]:
+        print(f"FAILED: {len(result['duplicates']):,} patient ID(s) given out twice, e.g. {result['duplicates'][0]}")
+
+
+def _start_server(directory: str, address: str) -> subprocess.Popen:
+    server = subprocess.Popen([sys.executable, os.path.join(REPO, "desk_server.py"), "--listen", address],
+                              cwd=directory, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                              env=dict(os.environ, PYTHONUNBUFFERED="1"))
+    line = server.stdout.readline()  # "Desk server listening on ..." once it accepts connections
+    if "listening" not in line:
+        server.kill()
+        raise RuntimeError(f"desk server did not start: {line}{server.stdout.read()}")
+    return server
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Requests/sec and latency of desk_server")
+    parser.add_argument("--address", help="an already running server (default: start one on synthetic data)")
+    parser.add_argument("--patients", default="100k", help="synthetic registry size for the own server")
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--depth", type=int, default=16, help="pipelined requests per connection")
+    parser.add_argument("--requests", type=int, default=50_000)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    if args.address:
+        ids = [f"P{1001 + n}" for n in range(1000)]
+        result = asyncio.run(load(args.address, args.connections, args.requests, args.depth, ids, args.write_ratio))
+        report(result)
+        return 1 if result["duplicates"] else 0
+
+    scale = parse_scale(args.patients)
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Generating {format_scale(scale)} patients...")
+        os.makedirs(os.path.join(tmp, "data"))
+        data = Dataset(os.path.join(tmp, "data"), scale)
+        address = "unix:" + os.path.join(tmp, "desk.sock")
+        server = _start_server(tmp, address)
+        try:
+            result = asyncio.run(load(address, args.connections, args.requests, args.depth, data.ids,
+                                      args.write_ratio))
+            report(result)
+        finally:
+            server.terminate()
+            server.wait()
+    return 1 if result["duplicates"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
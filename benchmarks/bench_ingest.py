@@ -0,0 +1,62 @@
+import argparse
+import os
+import tempfile
+import time
+from benchmarks.generators import (
+    generate_doctors, generate_payments, write_payment_history_csv, write_synthetic_patients
+)
+from parallel_ingest import default_workers, load_patient_table, reconcile_payments
+from patient_table import PatientTable
+from utilities import load_patients_from_csv
+
+
+def _time(label, func, rows):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed:8.2f} s  {rows / elapsed:>12,.0f} rows/sec")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunked process-pool ingest vs a single core")
+    parser.add_argument("--patients", type=int, default=1_000_000)
+    parser.add_argument("--payments", type=int, default=2_000_000, help="payments (1-3 rows each)")
+    parser.add_argument("--workers", default=None,
+                        help="comma separated worker counts (default: 1,2,4,... up to one per core)")
+    args = parser.parse_args()
+    if args.workers:
+        counts = [int(n) for n in args.workers.split(",")]
+    else:
+        counts = [1]
+        while counts[-1] * 2 <= default_workers():
+            counts.append(counts[-1] * 2)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        patients_path = os.path.join(tmp, "patients.csv")
+        history_path = os.path.join(tmp, "payment_history.csv")
+        print(f"Generating {args.patients:,} patients and {args.payments:,} payments...")
+        write_synthetic_patients(patients_path, args.patients, generate_doctors(20))
+        ids = [f"P{1001 + n}" for n in range(max(1, args.patients))]
+        write_payment_history_csv(history_path, generate_payments(args.payments, ids))
+
+        baseline = _time("load_patients_from_csv (before)",
+                         lambda: PatientTable.from_patients(load_patients_from_csv(patients_path)), args.patients)
+        for workers in counts:
+            table = _time(f"load_patient_table workers={workers}",
+                          lambda: load_patient_table(patients_path, workers=workers), args.patients)
+            assert table.patient_ids == baseline.patient_ids
+
+        with open(history_path, 'rb') as f:
+            rows = sum(1 for _ in f) - 1
+        expected = None
+        for workers in counts:
+            result = _time(f"reconcile_payments workers={workers}",
+                           lambda: reconcile_payments(history_path, workers=workers), rows)
+            if expected is None:
+                expected = result.by_day
+            assert result.by_day == expected
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import ast
+import csv
+import os
+import tempfile
+import time
+from doctors import load_doctors
+from patient import Patient
+from benchmarks.generators import write_synthetic_patients
+from utilities import load_patients_from_csv
+
+
+def legacy_load_patients_from_csv(filepath):
+    """The previous DictReader + ast.literal_eval loader, kept as the baseline."""
+    patients = []
+    with open(filepath, 'r', newline='') as csvfile:
+        reader = csv.DictReader(csvfile)
+        for row in reader:
+            age = int(row['age'])
+            specific_doctor = None
+            if row['specific_doctor'] and row['specific_doctor'].strip():
+                try:
+                    specific_doctor = ast.literal_eval(row['specific_doctor'])
+                except (SyntaxError, ValueError):
+                    specific_doctor = None
+            patients.append(Patient(
+                patient_id=row['patient_id'],
+                name=row['name'],
+                age=age,
+                urgent_care=row['urgent_care'],
+                specialist_needed=row['specialist_needed'],
+                regular_checkup=row['regular_checkup'],
+                follow_up=row['follow_up'],
+                insurance=row['insurance'],
+                chronic_condition=row['chronic_condition'],
+                specific_doctor=specific_doctor,
+                insurance_type=row['insurance_type']
+            ))
+    return patients
+
+
+def _time(label, func, rows):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed:8.2f} s  {rows / elapsed:>12,.0f} rows/sec")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="patients.csv loader: before/after throughput")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    doctors = load_doctors("data/doctors.csv")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "patients.csv")
+        print(f"Generating {args.rows:,} synthetic rows...")
+        write_synthetic_patients(path, args.rows, doctors)
+        before = _time("before (DictReader+literal_eval)", lambda: legacy_load_patients_from_csv(path), args.rows)
+        after = _time("after (csv.reader+cached ids)", lambda: load_patients_from_csv(path), args.rows)
+        assert len(before) == len(after)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import gc
+import random
+import tracemalloc
+from patient import Patient
+from patient_table import PatientTable
+
+
+class DictPatient:
+    """The previous Patient layout (per-instance __dict__), kept as the baseline."""
+    def __init__(self, patient_id, name, age, urgent_care, specialist_needed,
+                 regular_checkup, follow_up, insurance, chronic_condition,
+                 specific_doctor, insurance_type):
+        self.name = name
+        self.age = age
+        self.patient_id = patient_id
+        self.urgent_care = urgent_care
+        self.specialist_needed = specialist_needed
+        self.regular_checkup = regular_checkup
+        self.follow_up = follow_up
+        self.insurance = insurance
+        self.chronic_condition = chronic_condition
+        self.specific_doctor = specific_doctor
+        self.insurance_type = insurance_type
+
+
+def synthetic_rows(count, seed=7, embedded_doctor=False):
+    """With embedded_doctor, each row carries its own copied doctor dict (the old layout), else the DoctorID."""
+    rng = random.Random(seed)
+    yn = ('y', 'n')
+    for n in range(count):
+        # Build names per row, like a CSV loader would
+        name = "".join(("Patient ", str(n % 5000)))
+        yield (f"P{1001 + n}", name, rng.randint(0, 99),
+               rng.choice(yn), rng.choice(yn), rng.choice(yn), rng.choice(yn),
+               rng.choice(yn), rng.choice(yn),
+               (({"DoctorID": "D001", "DoctorName": "Alice Hart"} if embedded_doctor else "D001")
+                if n % 3 == 0 else None),
+               "".join(("priv", "ate")) if n % 2 else "".join(("pub", "lic")))
+
+
+def measure(label, build, count):
+    gc.collect()
+    tracemalloc.start()
+    data = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<24} {current / count:8.1f} bytes/patient")
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-patient memory of the storage layouts")
+    parser.add_argument("--patients", type=int, default=200_000)
+    args = parser.parse_args()
+    n = args.patients
+
+    measure("dict Patient (before)", lambda: [DictPatient(*r) for r in synthetic_rows(n, embedded_doctor=True)], n)
+    measure("slotted, doctor dicts", lambda: [Patient(*r) for r in synthetic_rows(n, embedded_doctor=True)], n)
+    measure("slotted Patient", lambda: [Patient(*r) for r in synthetic_rows(n)], n)
+    measure("PatientTable", lambda: PatientTable.from_patients(Patient(*r) for r in synthetic_rows(n)), n)
+
+
+if __name__ == "__main__":
+    main()
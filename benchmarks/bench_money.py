@@ -0,0 +1,84 @@
+import argparse
+import random
+import time
+from money import apply_ratio, format_cents, parse_cents
+
+PRICES = ("45", "18", "50", "100", "2300", "100", "30", "12.35", "7.99")
+RATIOS = (None, 0.1, 0.2)
+RATIOS_BP = {None: None, 0.1: 1000, 0.2: 2000}
+
+
+def synthetic_payments(line_items, seed=3):
+    """Payments of 1-3 line items each, as (price strings, copay ratio)."""
+    rng = random.Random(seed)
+    payments = []
+    produced = 0
+    while produced < line_items:
+        count = min(rng.randint(1, 3), line_items - produced)
+        payments.append((tuple(rng.choice(PRICES) for _ in range(count)), rng.choice(RATIOS)))
+        produced += count
+    return payments
+
+
+def float_path(payments):
+    """Previous approach: float prices, float multipliers, f"{x:.2f}" per cell."""
+    rows = []
+    grand = 0.0
+    for prices, ratio in payments:
+        costs = [float(p) for p in prices]
+        total = sum(costs)
+        discounted = total * ratio if ratio else total
+        grand += discounted
+        total_str = f"{total:.2f}"
+        discounted_str = f"{discounted:.2f}"
+        for cost in costs:
+            rows.append((f"{cost:.2f}", total_str, discounted_str))
+    return rows, grand
+
+
+def cents_path(payments):
+    """Integer cents, half-up basis-point ratios, format_cents per cell."""
+    rows = []
+    grand = 0
+    price_cache = {}
+    for prices, ratio in payments:
+        costs = []
+        for p in prices:
+            cents = price_cache.get(p)
+            if cents is None:
+                cents = price_cache[p] = parse_cents(p)
+            costs.append(cents)
+        total = sum(costs)
+        bp = RATIOS_BP[ratio]
+        discounted = apply_ratio(total, bp) if bp else total
+        grand += discounted
+        total_str = format_cents(total)
+        discounted_str = format_cents(discounted)
+        for cost in costs:
+            rows.append((format_cents(cost), total_str, discounted_str))
+    return rows, grand
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Float vs integer-cent billing over synthetic line items")
+    parser.add_argument("--items", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    payments = synthetic_payments(args.items)
+    results = {}
+    for label, func in (("float + f'{:.2f}'", float_path), ("int cents + format_cents", cents_path)):
+        start = time.perf_counter()
+        rows, grand = func(payments)
+        elapsed = time.perf_counter() - start
+        results[label] = (rows, grand)
+        print(f"{label:<26} {elapsed:6.2f} s  {len(rows) / elapsed:>12,.0f} items/sec  grand total {grand}")
+
+    float_rows, float_grand = results["float + f'{:.2f}'"]
+    cents_rows, cents_grand = results["int cents + format_cents"]
+    differing = sum(1 for a, b in zip(float_rows, cents_rows) if a != b)
+    print(f"rows whose text differs: {differing:,}")
+    print(f"float grand total drift vs exact cents: {float_grand - cents_grand / 100:.10f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from benchmarks.generators import generate_payments, write_synthetic_patients
+from doctors import load_doctors
+from storage import CsvBackend, SqliteBackend, migrate_csv_to_sqlite
+from utilities import load_patients_from_csv
+
+
+def _time(label, func, ops):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed * 1000:10.1f} ms  {ops / elapsed:>12,.0f} ops/sec")
+    return result
+
+
+def _lookups(backend, ids):
+    return sum(backend.get_patient(pid) is not None for pid in ids)
+
+
+def _history(backend, ids):
+    return sum(1 for pid in ids for _ in backend.iter_payments(patient_id=pid))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV vs SQLite storage: inserts and lookups")
+    parser.add_argument("--patients", type=int, default=100_000)
+    parser.add_argument("--payments", type=int, default=20_000)
+    parser.add_argument("--lookups", type=int, default=20)
+    args = parser.parse_args()
+
+    doctors = load_doctors("data/doctors.csv")
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = {name: os.path.join(tmp, f"{name}.csv") for name in ("billing", "doctors", "patients")}
+        shutil.copy("data/billing.csv", sources["billing"])
+        shutil.copy("data/doctors.csv", sources["doctors"])
+        print(f"Generating {args.patients:,} patients...")
+        write_synthetic_patients(sources["patients"], args.patients, doctors, legacy_ratio=0.0)
+        patients = load_patients_from_csv(sources["patients"])
+        ids = [p.patient_id for p in patients]
+        payments = list(generate_payments(args.payments, ids))
+        rng = random.Random(11)
+        sample = rng.sample(ids, args.lookups)
+
+        csv_backend = CsvBackend(sources, os.path.join(tmp, "hospital.snapshot"),
+                                 os.path.join(tmp, "payment_history.csv"), os.path.join(tmp, "summary.json"))
+        empty = CsvBackend(dict(sources, patients=os.path.join(tmp, "empty.csv")),
+                           os.path.join(tmp, "empty.snapshot"), os.path.join(tmp, "empty_history.csv"))
+        db = SqliteBackend(os.path.join(tmp, "hospital.db"))
+        empty_db = SqliteBackend(os.path.join(tmp, "empty.db"))
+
+        print("\n-- inserts --")
+        _time("csv    add_patients (one batch)", lambda: (empty.add_patients(patients), empty.flush()), len(patients))
+        _time("sqlite add_patients (one transaction)", lambda: empty_db.add_patients(patients), len(patients))
+        _time("csv    record_payment x N", lambda: ([csv_backend.record_payment(*p) for p in payments],
+                                                    csv_backend.flush()), len(payments))
+        _time("sqlite record_payment x N (txn each)", lambda: [db.record_payment(*p) for p in payments],
+              len(payments))
+
+        migrate_csv_to_sqlite(csv_backend, db, replace=True)
+
+        print("\n-- lookups --")
+        found_csv = _time("csv    get_patient (file scan)", lambda: _lookups(csv_backend, sample), len(sample))
+        found_db = _time("sqlite get_patient (index)", lambda: _lookups(db, sample), len(sample))
+        rows_csv = _time("csv    payments by patient (.idx)", lambda: _history(csv_backend, sample), len(sample))
+        rows_db = _time("sqlite payments by patient (index)", lambda: _history(db, sample), len(sample))
+        assert found_csv == found_db == len(sample)
+        assert rows_csv == rows_db
+
+        for backend in (csv_backend, empty, db, empty_db):
+            backend.close()
+
+
+if __name__ == "__main__":
+    main()
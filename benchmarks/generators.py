@@ -0,0 +1,139 @@
+import csv
+import random
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Sequence, Tuple
+from billing_rules import SERVICE_RULES
+from doctors import DoctorDirectory
+from ledger import LEGACY_FIELDS
+from money import format_cents
+from patient import Doctor, Patient
+from utilities import PATIENT_FIELDS
+
+FIRST_NAMES = ("Anna", "Jose", "Lola", "Mark", "Nick", "Joe", "Mira", "Kevin", "Sophie", "Lexie",
+               "Salome", "Nino", "Giorgi", "Tamar", "Levan", "Luka", "Mariam", "Dato", "Keti", "Ana")
+LAST_NAMES = ("Grey", "Sloan", "Jonas", "Avery", "Chan", "Shah", "Lin", "Moore", "Zhao", "Hart",
+              "Jackson", "Dzidziguri", "Beridze", "Kapanadze", "Gelashvili", "Lomidze", "Tsiklauri")
+DEPARTMENTS = ("Cardiology", "Neurology", "Pediatrics", "Orthopedics", "Dermatology",
+               "Oncology", "Radiology", "Psychiatry", "Gastroenterology", "Urology")
+SERVICE_PRICES = {"Regular Checkup": 4500, "Emergency Services": 255000, "Specialist Consultation": 3000,
+                  "Blood Test": 2000, "Laboratory Services": 5000, "Imaging Services": 10000}
+
+# (patient_id, [(service, cost cents)], total cents, discounted cents, payment method)
+Payment = Tuple[str, List[Tuple[str, int]], int, int, str]
+
+_SCALE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+def parse_scale(text: str) -> int:
+    """"1k" -> 1000, "10M" -> 10000000, "2500" -> 2500"""
+    text = text.strip().lower().replace("_", "")
+    multiplier = _SCALE_SUFFIXES.get(text[-1:], 1)
+    number = text[:-1] if multiplier != 1 else text
+    return int(float(number) * multiplier)
+
+
+def format_scale(count: int) -> str:
+    for suffix, size in (("M", 1_000_000), ("k", 1_000)):
+        if count >= size and count % size == 0:
+            return f"{count // size}{suffix}"
+    return str(count)
+
+
+def generate_doctors(count: int = 20, seed: int = 1) -> DoctorDirectory:
+    """A DoctorDirectory of `count` doctors spread over the departments."""
+    rng = random.Random(seed)
+    return DoctorDirectory(
+        Doctor(f"D{n + 1:03d}", f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+               DEPARTMENTS[n % len(DEPARTMENTS)])
+        for n in range(count)
+    )
+
+
+def write_doctors_csv(filepath: str, doctors: DoctorDirectory):
+    with open(filepath, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["DoctorID", "DoctorName", "Department"])
+        for doctor in doctors:
+            writer.writerow([doctor.doctor_id, doctor.name, doctor.department])
+
+
+def write_billing_csv(filepath: str, prices: Dict[str, int] = SERVICE_PRICES):
+    with open(filepath, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Service", "Price"])
+        for service, cents in prices.items():
+            writer.writerow([service, format_cents(cents)])
+
+
+def generate_patients(count: int, doctors: DoctorDirectory, seed: int = 42,
+                      start_id: int = 1001) -> Iterator[Patient]:
+    """Random patients; about half reference a doctor by ID, names repeat like real ones."""
+    rng = random.Random(seed)
+    all_doctors = [d.doctor_id for d in doctors]
+    yn = ('y', 'n')
+    for n in range(count):
+        insurance = rng.choice(yn)
+        yield Patient(
+            f"P{start_id + n}", f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}{rng.randint(0, 999)}",
+            rng.randint(0, 99),
+            rng.choice(yn), rng.choice(yn), rng.choice(yn), rng.choice(yn), insurance, rng.choice(yn),
+            rng.choice(all_doctors) if all_doctors and rng.random() < 0.5 else None,
+            rng.choice(("private", "public")) if insurance == 'y' else None,
+        )
+
+
+def write_synthetic_patients(filepath, rows, doctors, legacy_ratio=0.5, seed=42):
+    """
+    Write `rows` random patients. Roughly half reference a doctor (from a
+    DoctorDirectory); of those, `legacy_ratio` use the old dict-literal cell and
+    the rest a plain DoctorID.
+    """
+    rng = random.Random(seed)
+    all_doctors = list(doctors) or [Doctor("D001", "Alice Hart", "Cardiology")]
+    first = ["Anna", "Jose", "Lola", "Mark", "Nick", "Joe", "Mira", "Kevin", "Sophie", "Lexie"]
+    last = ["Grey", "Sloan", "Jonas", "Avery", "Chan", "Shah", "Lin", "Moore", "Zhao", "Hart"]
+    yn = ('y', 'n')
+    with open(filepath, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(PATIENT_FIELDS)
+        for n in range(rows):
+            doctor = ""
+            if rng.random() < 0.5:
+                d = rng.choice(all_doctors)
+                if rng.random() < legacy_ratio:
+                    doctor = str({"DoctorID": d.doctor_id, "DoctorName": d.name})
+                else:
+                    doctor = d.doctor_id
+            insurance = rng.choice(yn)
+            writer.writerow([
+                f"P{1001 + n}", f"{rng.choice(first)} {rng.choice(last)}", rng.randint(0, 99),
+                rng.choice(yn), rng.choice(yn), rng.choice(yn), rng.choice(yn),
+                insurance, rng.choice(yn), doctor,
+                rng.choice(("private", "public")) if insurance == 'y' else ""
+            ])
+
+
+def generate_payments(count: int, patient_ids: Sequence[str], prices: Dict[str, int] = SERVICE_PRICES,
+                      seed: int = 7) -> Iterator[Payment]:
+    """Payments of 1-3 services priced from `prices`, 10%/20%/no copay discount."""
+    rng = random.Random(seed)
+    services = [name for _, names in SERVICE_RULES for name in names if name in prices] or list(prices)
+    for _ in range(count):
+        items = [(service, prices[service]) for service in rng.sample(services, min(len(services), rng.randint(1, 3)))]
+        total = sum(cost for _, cost in items)
+        discounted = total * rng.choice((10, 9, 8)) // 10
+        yield rng.choice(patient_ids), items, total, discounted, rng.choice(("cash", "card"))
+
+
+def write_payment_history_csv(filepath: str, payments: Iterator[Payment], days: int = 365, seed: int = 9):
+    """Legacy payment_history.csv (one row per service) with dates spread over the last `days` days."""
+    rng = random.Random(seed)
+    today = date.today()
+    with open(filepath, 'w', newline='') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(LEGACY_FIELDS)
+        for patient_id, items, total, discounted, method in payments:
+            day = (today - timedelta(days=rng.randrange(days))).isoformat()
+            total_str, discounted_str = format_cents(total), format_cents(discounted)
+            for service, cost in items:
+                writer.writerow([patient_id, service, format_cents(cost), total_str, discounted_str, method, day])
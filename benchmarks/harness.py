@@ -0,0 +1,160 @@
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+RESULTS_VERSION = 1
+
+
+def percentile(sorted_samples: List[int], q: float) -> float:
+    """Linear-interpolated percentile (q in 0-100) of already sorted samples."""
+    if not sorted_samples:
+        return float("nan")
+    k = (len(sorted_samples) - 1) * q / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_samples) - 1)
+    return sorted_samples[lo] + (sorted_samples[hi] - sorted_samples[lo]) * (k - lo)
+
+
+def measure(func: Callable, warmup: int = 1, repeat: int = 5, setup: Optional[Callable] = None) -> List[int]:
+    """
+    Run func `warmup` times untimed, then `repeat` timed runs; returns the samples in
+    nanoseconds (time.perf_counter_ns). With setup, each run calls func(setup()) and
+    setup is not timed (fresh files, fresh caches, ...). GC is off while timing.
+    """
+    samples = []
+    for run in range(warmup + repeat):
+        argument = setup() if setup is not None else None
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            start = time.perf_counter_ns()
+            func(argument) if setup is not None else func()
+            elapsed = time.perf_counter_ns() - start
+        finally:
+            if gc_enabled:
+                gc.enable()
+        if run >= warmup:
+            samples.append(elapsed)
+    return samples
+
+
+class BenchmarkResult:
+    """Samples of one case at one scale, summarized as percentiles (ns) and throughput."""
+
+    def __init__(self, group: str, name: str, scale: int, ops: int, samples: List[int]):
+        self.group = group
+        self.name = name
+        self.scale = scale
+        self.ops = ops
+        self.samples = samples
+
+    @property
+    def key(self) -> str:
+        return f"{self.group}/{self.name}@{self.scale}"
+
+    def stats(self) -> Dict[str, float]:
+        ordered = sorted(self.samples)
+        p50 = percentile(ordered, 50)
+        return {
+            "min": ordered[0],
+            "p50": p50,
+            "p90": percentile(ordered, 90),
+            "p99": percentile(ordered, 99),
+            "max": ordered[-1],
+            "mean": sum(ordered) / len(ordered),
+            "ops_per_sec": self.ops / (p50 / 1e9) if p50 else float("inf"),
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            "group": self.group, "name": self.name, "scale": self.scale, "ops": self.ops,
+            "samples_ns": self.samples, **self.stats(),
+        }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5, check=True).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Harness:
+    """
+    Collects BenchmarkResults:
+    - bench(group, name, func, scale, ops, setup): warmups + repeats via measure(),
+      printed as one line of p50/p90/p99 and throughput
+    - save(path): JSON with the environment (python, platform, git commit) so runs
+      from different releases can be compared with compare()
+    """
+
+    def __init__(self, warmup: int = 1, repeat: int = 5, stream=None):
+        self.warmup = warmup
+        self.repeat = repeat
+        self.stream = stream or sys.stdout
+        self.results: List[BenchmarkResult] = []
+
+    def bench(self, group: str, name: str, func: Callable, scale: int, ops: int = 1,
+              setup: Optional[Callable] = None, repeat: Optional[int] = None) -> BenchmarkResult:
+        samples = measure(func, self.warmup, repeat or self.repeat, setup)
+        result = BenchmarkResult(group, name, scale, ops, samples)
+        self.results.append(result)
+        stats = result.stats()
+        print(f"{result.key:<52} p50 {_fmt(stats['p50'])}  p90 {_fmt(stats['p90'])}  "
+              f"p99 {_fmt(stats['p99'])}  {stats['ops_per_sec']:>14,.0f} ops/s", file=self.stream)
+        return result
+
+    def to_dict(self) -> Dict:
+        return {
+            "version": RESULTS_VERSION,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "environment": {
+                "python": platform.python_version(),
+                "implementation": platform.python_implementation(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "commit": _git_commit(),
+            },
+            "warmup": self.warmup,
+            "repeat": self.repeat,
+            "results": [r.to_dict() for r in self.results],
+        }
+
+    def save(self, path: str):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1)
+        os.replace(tmp_path, path)
+
+
+def _fmt(ns: float) -> str:
+    for unit, size in (("s ", 1e9), ("ms", 1e6), ("us", 1e3)):
+        if ns >= size:
+            return f"{ns / size:8.2f} {unit}"
+    return f"{ns:8.0f} ns"
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = 0.10) -> List[Dict]:
+    """
+    Match results of two saved runs by group/name/scale and return the p50 ratio of
+    every case present in both, with `regression` set when current is slower than
+    baseline by more than `threshold` (0.10 = 10%).
+    """
+    def by_key(data):
+        return {f"{r['group']}/{r['name']}@{r['scale']}": r for r in data["results"]}
+
+    old = by_key(baseline)
+    rows = []
+    for key, result in by_key(current).items():
+        if key not in old or not old[key]["p50"]:
+            continue
+        ratio = result["p50"] / old[key]["p50"]
+        rows.append({"key": key, "baseline_p50": old[key]["p50"], "p50": result["p50"],
+                     "ratio": ratio, "regression": ratio > 1 + threshold})
+    return rows
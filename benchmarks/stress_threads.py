@@ -0,0 +1,227 @@
+"""
+Concurrency stress test: many threads share one HospitalSystem, registering
+and billing patients while others search and list, and one keeps swapping the
+price list. Afterwards the data is reopened from disk and checked:
+  - every registered patient is stored exactly once, nothing else appeared
+  - registry and summary counts match the stored patients
+  - the payment history holds exactly the rows the threads recorded (no lost,
+    duplicated or torn rows; line items always match their totals)
+  - every payment re-bills to its recorded totals with the price list version
+    it is tagged with
+    python -m benchmarks.stress_threads
+    python -m benchmarks.stress_threads --threads 32 --operations 2000 --storage sqlite
+Exits non-zero when a check fails.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+from benchmarks.generators import FIRST_NAMES, LAST_NAMES
+from benchmarks.suite import Dataset
+from hospital_system import HospitalSystem
+from ledger import add_price_version_column
+from money import format_cents
+from patient import Patient
+from registry import PatientRegistry
+from service_catalog import ServiceCatalog, rebill_payments
+from storage import CsvBackend, SqliteBackend, migrate_csv_to_sqlite
+
+
+def _random_patient(rng: random.Random, doctor_ids: List[str]) -> Patient:
+    flag = lambda: rng.choice("yn")
+    insurance = flag()
+    specialist = flag()
+    return Patient(
+        patient_id="", name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", age=rng.randint(0, 99),
+        urgent_care=flag(), specialist_needed=specialist, regular_checkup=flag(), follow_up=flag(),
+        insurance=insurance, chronic_condition=flag(),
+        specific_doctor=rng.choice(doctor_ids) if specialist == 'y' else None,
+        insurance_type=rng.choice(("private", "public")) if insurance == 'y' else None,
+    )
+
+
+class Worker(threading.Thread):
+    """Registers and bills `operations` times; remembers what it stored."""
+
+    def __init__(self, system: HospitalSystem, seed: int, operations: int, doctor_ids: List[str],
+                 existing: List[str], start_gate: threading.Event):
+        super().__init__(name=f"desk-{seed}")
+        self.system = system
+        self.rng = random.Random(seed)
+        self.operations = operations
+        self.doctor_ids = doctor_ids
+        self.existing = existing
+        self.start_gate = start_gate
+        self.registered: List[str] = []
+        self.rows = Counter()  # expected payment history rows
+        self.error: Optional[BaseException] = None
+
+    def run(self):
+        system, rng = self.system, self.rng
+        self.start_gate.wait()
+        try:
+            for _ in range(self.operations):
+                if not self.registered or rng.random() < 0.5:
+                    patient = _random_patient(rng, self.doctor_ids)
+                    patient.patient_id = system.id_allocator.next_id()
+                    system.register_patient(patient)
+                    self.registered.append(patient.patient_id)
+                else:
+                    patient_id = rng.choice(self.registered if rng.random() < 0.7 else self.existing)
+                    patient = system.patients.get(patient_id)
+                    method = rng.choice(("cash", "card"))
+                    services, total, discounted, version = system.billing_system.charge(patient, method)
+                    for service, cost in services:
+                        self.rows[(patient_id, service, format_cents(cost), format_cents(total),
+                                   format_cents(discounted), method, version)] += 1
+        except BaseException as e:
+            self.error = e
+
+
+def _readers(system: HospitalSystem, stop: threading.Event, counts: Dict[str, int]):
+    rng = random.Random(7)
+    while not stop.is_set():
+        system.patients.search_name(rng.choice(FIRST_NAMES)[:3])
+        system.patients.find_by_name_prefix(rng.choice(LAST_NAMES)[:2])
+        system.patients.count("insurance=y")
+        system.sorter.sorted(rng.choice(("age", "name", ("-age", "name"))))
+        counts["reads"] += 4
+
+
+def _repricer(system: HospitalSystem, stop: threading.Event, counts: Dict[str, int]):
+    billing = system.billing_system
+    base = dict(billing.services)
+    raised = {service: price + 500 for service, price in base.items()}
+    while not stop.is_set():
+        billing.update_prices(raised if counts["swaps"] % 2 == 0 else base)
+        counts["swaps"] += 1
+        time.sleep(0.001)
+
+
+def run(storage_kind: str, layout: str, threads: int, operations: int, readers: int, patients: int) -> List[str]:
+    """One stress run in a fresh data directory; returns the failed checks."""
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = os.path.join(tmp, "data")
+        os.makedirs(directory)
+        data = Dataset(directory, patients)
+        os.remove(data.history_path)
+        if storage_kind == "sqlite":
+            storage = SqliteBackend(os.path.join(directory, "hospital.db"))
+            migrate_csv_to_sqlite(CsvBackend(sources=data.sources, snapshot_path=data.snapshot_path,
+                                             history_path=data.history_path), storage)
+            reopen = lambda: SqliteBackend(storage.db_path)
+        else:
+            if layout == "legacy":
+                add_price_version_column(data.history_path)  # opt in, so the re-bill check has versions
+            paths = dict(sources=data.sources, snapshot_path=data.snapshot_path, history_path=data.history_path,
+                         summary_path=os.path.join(directory, "patient_summary.json"), ledger_layout=layout)
+            storage = CsvBackend(**paths)
+            reopen = lambda: CsvBackend(**paths)
+
+        cwd = os.getcwd()
+        os.chdir(tmp)  # data/patients.seq
+        try:
+            system = HospitalSystem(storage=storage)
+            doctor_ids = [doctor.doctor_id for doctor in data.doctors]
+            gate = threading.Event()
+            workers = [Worker(system, seed, operations, doctor_ids, data.ids, gate) for seed in range(threads)]
+            stop = threading.Event()
+            counts = Counter()
+            background = [threading.Thread(target=_readers, args=(system, stop, counts)) for _ in range(readers)]
+            background.append(threading.Thread(target=_repricer, args=(system, stop, counts)))
+            for thread in workers + background:
+                thread.start()
+            started = time.perf_counter()
+            gate.set()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - started
+            stop.set()
+            for thread in background:
+                thread.join()
+            system.close()
+        finally:
+            os.chdir(cwd)
+
+        for worker in workers:
+            if worker.error is not None:
+                failures.append(f"{worker.name} failed: {worker.error!r}")
+        registered = [patient_id for worker in workers for patient_id in worker.registered]
+        expected_rows = sum((worker.rows for worker in workers), Counter())
+        print(f"{storage_kind}/{layout}: {threads} threads, {len(registered):,} registrations and "
+              f"{sum(expected_rows.values()):,} payment rows in {elapsed:.2f} s "
+              f"({threads * operations / elapsed:,.0f} ops/s), {counts['reads']:,} reads, "
+              f"{counts['swaps']:,} price swaps")
+
+        stored = reopen()
+        table = stored.load_state().patients
+        ids = table.patient_ids
+        total = patients + len(registered)
+        if len(registered) != len(set(registered)):
+            failures.append("the ID allocator handed out a duplicate ID")
+        if len(ids) != total:
+            failures.append(f"{len(ids):,} patients stored, expected {total:,}")
+        duplicates = [patient_id for patient_id, n in Counter(ids).items() if n > 1]
+        if duplicates:
+            failures.append(f"{len(duplicates):,} patient IDs stored twice, e.g. {duplicates[0]}")
+        missing = set(registered) - set(ids)
+        if missing:
+            failures.append(f"{len(missing):,} registered patients missing, e.g. {min(missing)}")
+        if len(system.patients) != total or system.summary.count != total:
+            failures.append(f"registry has {len(system.patients):,} and summary {system.summary.count:,} "
+                            f"patients, expected {total:,}")
+
+        rows = Counter(
+            (row['PatientID'], row['Service'], row['Cost'], row['Total'], row['DiscountedTotal'],
+             row['PaymentMethod'], row['PriceVersion'])
+            for row in stored.iter_payments()
+        ) if stored.has_payments() else Counter()
+        lost = expected_rows - rows
+        extra = rows - expected_rows
+        if lost:
+            failures.append(f"{sum(lost.values()):,} payment rows lost, e.g. {next(iter(lost))}")
+        if extra:
+            failures.append(f"{sum(extra.values()):,} unexpected or duplicated payment rows, e.g. {next(iter(extra))}")
+        if stored.has_payments():
+            catalog = ServiceCatalog(stored)
+            rebilled = list(rebill_payments(catalog, PatientRegistry(table), stored.iter_payments()))
+            wrong = [payment for payment in rebilled if payment["rebilled"] != payment["recorded"]]
+            if wrong:
+                failures.append(f"{len(wrong):,} of {len(rebilled):,} payments do not re-bill to their recorded "
+                                f"totals with their price list version, e.g. {wrong[0]}")
+        stored.close()
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Many threads registering and billing on one HospitalSystem")
+    parser.add_argument("--threads", type=int, default=16, help="registering / billing threads")
+    parser.add_argument("--operations", type=int, default=500, help="operations per thread")
+    parser.add_argument("--readers", type=int, default=2, help="searching / listing threads")
+    parser.add_argument("--patients", type=int, default=2000, help="patients on file before the run")
+    parser.add_argument("--storage", choices=("csv", "sqlite", "all"), default="all")
+    args = parser.parse_args(argv)
+
+    runs = []
+    if args.storage in ("csv", "all"):
+        runs += [("csv", "legacy"), ("csv", "normalized")]
+    if args.storage in ("sqlite", "all"):
+        runs.append(("sqlite", "-"))
+    failed = False
+    for storage_kind, layout in runs:
+        failures = run(storage_kind, layout, args.threads, args.operations, args.readers, args.patients)
+        for failure in failures:
+            print(f"  FAIL {failure}")
+        failed = failed or bool(failures)
+    print("FAILED" if failed else "OK: no lost or duplicated rows")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+Benchmark suite over synthetic data at configurable scales, e.g.
+  python -m benchmarks.suite --scales 1k,100k,1M --out bench.json
+  python -m benchmarks.suite --scales 100k --groups sorts,filters --baseline bench.json
+Groups: loaders, savers, searches, sorts, filters, billing, summary.
+Quadratic / linear baselines (bubble sort, merge sort, linear search, truth-table
+filter) only run up to their size limits. 10M needs several GB of RAM.
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+from typing import Callable, Dict, List
+from benchmarks.generators import (
+    format_scale, generate_doctors, generate_patients, generate_payments, parse_scale,
+    write_billing_csv, write_doctors_csv, write_payment_history_csv
+)
+from benchmarks.harness import Harness, compare
+from billing import BillingSystem
+from billing_rules import CompiledBillingRules
+from doctors import read_doctors_csv
+from ledger import PaymentLedger
+from patient_table import PatientTable
+from payment_history import iter_payment_history
+from registry import PatientRegistry
+from snapshot import load_state, read_snapshot
+from sorting import MERGE_LIMIT, run_sorts
+from storage import CsvBackend
+from summary import PatientSummary
+from utilities import (
+    PATIENT_FIELDS, binary_search_patient_by_name, filter_patients_truth_table,
+    linear_search_patient_by_id, load_patients_from_csv, load_services_csv, merge_sort_patients_by_name,
+    patient_to_row
+)
+from writers import CsvAppendWriter
+
+GROUPS = ("loaders", "savers", "searches", "sorts", "filters", "billing", "summary")
+LINEAR_LIMIT = 1_000_000
+LOOKUPS = 1_000
+
+
+class Dataset:
+    """Synthetic doctors, prices, patients and payment history for one scale, in a temp dir."""
+
+    def __init__(self, directory: str, scale: int, seed: int = 42):
+        self.directory = directory
+        self.scale = scale
+        self.sources = {name: os.path.join(directory, f"{name}.csv") for name in ("billing", "doctors", "patients")}
+        self.snapshot_path = os.path.join(directory, "hospital.snapshot")
+        self.history_path = os.path.join(directory, "payment_history.csv")
+
+        self.doctors = generate_doctors(20, seed)
+        write_doctors_csv(self.sources["doctors"], self.doctors)
+        write_billing_csv(self.sources["billing"])
+        with open(self.sources["patients"], 'w', newline='') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(PATIENT_FIELDS)
+            writer.writerows(patient_to_row(p) for p in generate_patients(scale, self.doctors, seed))
+        self.patients = load_patients_from_csv(self.sources["patients"])
+        self.ids = [p.patient_id for p in self.patients]
+        write_payment_history_csv(self.history_path, generate_payments(max(1, scale // 2), self.ids, seed=seed))
+
+        rng = random.Random(seed)
+        self.sample = [rng.choice(self.patients) for _ in range(min(LOOKUPS, scale))]
+
+
+def run_loaders(harness: Harness, data: Dataset):
+    n = data.scale
+    harness.bench("loaders", "patients_csv", lambda: load_patients_from_csv(data.sources["patients"]), n, ops=n)
+    harness.bench("loaders", "services_csv", lambda: load_services_csv(data.sources["billing"]), n)
+    harness.bench("loaders", "doctors_csv", lambda: read_doctors_csv(data.sources["doctors"]), n)
+
+    def drop_snapshot():
+        if os.path.exists(data.snapshot_path):
+            os.remove(data.snapshot_path)
+    harness.bench("loaders", "snapshot_cold", lambda _: load_state(data.snapshot_path, data.sources), n, ops=n,
+                  setup=drop_snapshot)
+    harness.bench("loaders", "snapshot_hot", lambda: read_snapshot(data.snapshot_path, data.sources), n, ops=n)
+    harness.bench("loaders", "payment_history_stream", lambda: sum(1 for _ in iter_payment_history(data.history_path)),
+                  n, ops=max(1, n // 2))
+
+
+def run_savers(harness: Harness, data: Dataset):
+    n = data.scale
+    rows = [patient_to_row(p) for p in data.patients]
+    payments = list(generate_payments(max(1, n // 2), data.ids))
+    counter = iter(range(1_000_000))
+
+    def fresh_path(name):
+        def setup():
+            path = os.path.join(data.directory, f"{name}-{next(counter)}.csv")
+            return path
+        return setup
+
+    def write_patients(path):
+        writer = CsvAppendWriter(path, PATIENT_FIELDS)
+        writer.write_rows(rows)
+        writer.close()
+    harness.bench("savers", "patients_append", write_patients, n, ops=n, setup=fresh_path("patients"))
+
+    def record_payments(path):
+        ledger = PaymentLedger(path)
+        for payment in payments:
+            ledger.record(*payment)
+        ledger.close()
+    harness.bench("savers", "ledger_record", record_payments, n, ops=len(payments), setup=fresh_path("history"))
+
+
+def run_searches(harness: Harness, data: Dataset):
+    n = data.scale
+    registry = PatientRegistry(data.patients)
+    sample = data.sample
+    harness.bench("searches", "registry_get", lambda: [registry.get(p.patient_id) for p in sample], n, ops=len(sample))
+    harness.bench("searches", "registry_find_by_name", lambda: [registry.find_by_name(p.name) for p in sample],
+                  n, ops=len(sample))
+    registry.trigrams  # built once, outside the timings below
+    terms = [p.name.split()[-1][:6] for p in sample[:100]]
+    harness.bench("searches", "trigram_substring", lambda: [registry.search_name(t) for t in terms], n, ops=len(terms))
+    typos = [t[:2] + t[3:] for t in terms]
+    harness.bench("searches", "trigram_fuzzy", lambda: [registry.search_name_fuzzy(t, 5) for t in typos],
+                  n, ops=len(typos))
+    if n <= LINEAR_LIMIT:
+        few = sample[:10]
+        harness.bench("searches", "baseline_linear_search_id",
+                      lambda: [linear_search_patient_by_id(data.patients, p.patient_id) for p in few], n, ops=len(few))
+    if n <= MERGE_LIMIT:
+        by_name = merge_sort_patients_by_name(data.patients)
+        harness.bench("searches", "baseline_binary_search_name",
+                      lambda: [binary_search_patient_by_name(by_name, p.name) for p in sample], n, ops=len(sample))
+
+
+def run_filters(harness: Harness, data: Dataset):
+    n = data.scale
+    registry = PatientRegistry(data.patients)
+    expression = "urgent_care AND NOT insurance"
+    harness.bench("filters", "bitmap_build", lambda _: registry.bitmaps, n, ops=n,
+                  setup=lambda: setattr(registry, "_bitmaps", None))
+    registry.bitmaps
+    harness.bench("filters", "bitmap_count", lambda: registry.count(expression), n, ops=n)
+    harness.bench("filters", "bitmap_count_complex",
+                  lambda: registry.count("(age_group=elderly OR chronic_condition) AND insurance_type=public"), n, ops=n)
+    harness.bench("filters", "bitmap_list", lambda: registry.filter(expression), n, ops=n)
+    harness.bench("filters", "baseline_truth_table", lambda: filter_patients_truth_table(data.patients, 'y', 'n'),
+                  n, ops=n)
+
+
+def run_billing(harness: Harness, data: Dataset):
+    n = data.scale
+    rules = CompiledBillingRules(load_services_csv(data.sources["billing"]))
+    table = PatientTable.from_patients(data.patients)
+    harness.bench("billing", "bill_many_table", lambda: rules.bill_many(table), n, ops=n)
+    harness.bench("billing", "bill_many_objects", lambda: rules.bill_many(data.patients), n, ops=n)
+    billing = BillingSystem(CsvBackend(sources=data.sources, history_path=data.history_path),
+                            services=rules.services)
+    registry = PatientRegistry(data.patients)
+    harness.bench("billing", "bill_many_registry", lambda: billing.bill_many(registry), n, ops=n)
+    harness.bench("billing", "bill_each", lambda: [rules.bill(p) for p in data.patients], n, ops=n)
+
+
+def run_summary(harness: Harness, data: Dataset):
+    n = data.scale
+
+    def fold():
+        summary = PatientSummary()
+        summary.fold_csv(data.sources["patients"])
+        return summary
+    harness.bench("summary", "fold_csv", fold, n, ops=n)
+    summary = fold()
+    harness.bench("summary", "add_each", lambda: [PatientSummary().add(p) for p in data.sample], n,
+                  ops=len(data.sample))
+
+    def report():
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary.print_report()
+    harness.bench("summary", "print_report", report, n)
+
+
+RUNNERS: Dict[str, Callable] = {
+    "loaders": run_loaders,
+    "savers": run_savers,
+    "searches": run_searches,
+    "sorts": lambda harness, data: run_sorts(harness.bench, data.patients),
+    "filters": run_filters,
+    "billing": run_billing,
+    "summary": run_summary,
+}
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Hospital system benchmark suite")
+    parser.add_argument("--scales", default="1k,10k,100k", help="comma separated, e.g. 1k,100k,1M,10M")
+    parser.add_argument("--groups", default="all", help=f"comma separated subset of {', '.join(GROUPS)}")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="p50 slowdown flagged as regression")
+    args = parser.parse_args(argv)
+
+    groups = GROUPS if args.groups == "all" else tuple(g.strip() for g in args.groups.split(","))
+    unknown = [g for g in groups if g not in RUNNERS]
+    if unknown:
+        parser.error(f"unknown group(s): {', '.join(unknown)}")
+    harness = Harness(args.warmup, args.repeat)
+    for scale in (parse_scale(s) for s in args.scales.split(",")):
+        print(f"\n== scale {format_scale(scale)} ==")
+        with tempfile.TemporaryDirectory() as tmp:
+            data = Dataset(tmp, scale)
+            for group in groups:
+                RUNNERS[group](harness, data)
+
+    if args.out:
+        harness.save(args.out)
+        print(f"\nResults written to {args.out}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(harness.to_dict(), baseline, args.threshold)
+        print(f"\n== vs {args.baseline} (p50) ==")
+        for row in rows:
+            flag = "  REGRESSION" if row["regression"] else ""
+            print(f"{row['key']:<52} x{row['ratio']:6.2f}{flag}")
+        if any(row["regression"] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
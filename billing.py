@@ -1,99 +1,142 @@
-import csv
-import os
-import time
-from typing import Dict, Tuple, List
-from utilities import get_valid_input
-from patient import Patient
+import sys
+from datetime import date
+from time import perf_counter
+from typing import Dict, Optional
+from utilities import get_valid_input, load_services_csv
+from registry import PatientRegistry
+from billing_rules import CompiledBillingRules
+from money import format_cents
+from payment_history import paginate
+from storage import CsvBackend, StorageBackend
+from metrics import METRICS
+from service_catalog import ServiceCatalog
 
 class BillingSystem:
     """
     - load_services(): reads data/billing.csv into {service: (min, max)}
+    - catalog: service_catalog.ServiceCatalog, the versioned price list (reloaded
+      when data/billing.csv changes once HospitalSystem starts watching it)
+    - rules: the live version, billing_rules.SERVICE_RULES / COPAY_RATIOS compiled
+      against it; an immutable snapshot, so bills are computed without locks from
+      whichever version was current when they started, and every payment is stored
+      with that version (PriceVersion). update_prices() publishes a new version
     - process_billing(patients): 
         * Prompt for patient ID
-        * Sum services automatically based on patient attributes:
+        * Sum services automatically based on patient attributes (see SERVICE_RULES):
             • regular_checkup -> "Regular Checkup"
             • urgent_care -> "Emergency Services"
             • specialist_needed -> "Specialist Consultation"
+            • chronic_condition -> "Blood Test", "Laboratory Services"
+            • follow_up -> "Imaging Services"
         * Apply discount: private = 90%, public = 80%
         * Print:
             Your total is €X.XX.
             With insurance (type) it comes down to €Y.YY.
         * Prompt payment method: only accept 'cash' or 'card' (case‑insensitive)
-        * Save each service to data/payment_history.csv
-    - display_payment_history(): prints each row in data/payment_history.csv
+        * Save the payment through the storage backend (payment_history.csv by default)
+    - bill_many(patients): totals for a whole cohort in one pass (a PatientRegistry
+      is billed from its columnar table)
+    - end_of_day(patients): totals of the whole registry, also as
+      `python billing.py end-of-day`
+    - charge(patient, method): bill and record one payment without prompting (any thread)
+    - save_payments(payments): batched save_payment_history (see batch_admission)
+    - display_payment_history(): pages through the payment history with optional filters
     """
     
-    def __init__(self):
-        self.services = self.load_services()
-        
-    def load_services(self, filepath="data/billing.csv") -> Dict[str, float]:
+    def __init__(self, storage: Optional[StorageBackend] = None, services: Optional[Dict[str, int]] = None):
+        # Payments and prices go through the storage backend (CSV files by default)
+        self.storage = storage if storage is not None else CsvBackend()
+        # Prices may come pre-loaded (e.g. from the binary snapshot)
+        self.catalog = ServiceCatalog(self.storage, services)
+
+    @property
+    def rules(self) -> CompiledBillingRules:
+        """The live price list version; read it once per bill."""
+        return self.catalog.current
+
+    @property
+    def services(self) -> Dict[str, int]:
+        return self.catalog.current.services
+
+    def update_prices(self, services: Dict[str, int]) -> CompiledBillingRules:
         """
-        Reads data/billing.csv into {service: price}
+        Publish a new price list version; bills already being computed finish on
+        the version they started with.
         """
-        services = {}
-        try:
-            # Ensure directory exists
-            os.makedirs(os.path.dirname(filepath), exist_ok=True)
-                
-            # Read the existing billing.csv file
-            with open(filepath, 'r', newline='') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    service_name = row['Service']
-                    price = float(row['Price'])
-                    services[service_name] = price
-            return services
-            
-        except Exception as e:
-            print(f"Error loading services: {e}")
-            return {}
+        return self.catalog.publish(services)
+
+    @staticmethod
+    def load_services(filepath="data/billing.csv") -> Dict[str, int]:
+        """
+        Reads data/billing.csv into {service: price in cents}
+        """
+        return load_services_csv(filepath)
             
-    def calculate_patient_bill(self, patient):
-        """
-        Calculate (total, discounted_total) for a patient (no printing or I/O)
-        """
-        total = 0.0
-        if patient.regular_checkup == 'y':
-            service = "Regular Checkup"
-            cost = self.services.get(service, 0.0)
-            total += cost
-        if patient.urgent_care == 'y':
-            service = "Emergency Services"
-            cost = self.services.get(service, 0.0)
-            total += cost
-        if patient.specialist_needed == 'y':
-            service = "Specialist Consultation"
-            cost = self.services.get(service, 0.0)
-            total += cost
-        discounted_total = total
-        if patient.insurance == 'y':
-            if patient.insurance_type == 'private':
-                discounted_total = total * 0.1  # Patient pays 10%
-            elif patient.insurance_type == 'public':
-                discounted_total = total * 0.2  # Patient pays 20%
-        return total, discounted_total
+    @METRICS.timed("operation_seconds", op="bill_patient")
+    def calculate_patient_bill(self, patient, rules: Optional[CompiledBillingRules] = None):
+        """
+        Calculate (total, discounted_total) for a patient (no printing or I/O) with
+        `rules` (default: the live version). Pass the same rules on to
+        process_payment_for_patient so a price reload in between cannot split the bill.
+        """
+        return (rules or self.rules).bill(patient)
 
-    def process_payment_for_patient(self, patient, total, discounted, payment_method):
+    @METRICS.timed("operation_seconds", op="bill_many")
+    def bill_many(self, patients):
+        """
+        (totals, discounted_totals) for every patient in one pass, e.g. end-of-day
+        billing of the whole registry. A PatientRegistry or PatientTable takes the
+        packed (vectorized with NumPy) path; other iterables are billed one by one.
+        """
+        rules = self.rules
+        if isinstance(patients, PatientRegistry):
+            # Registrations wait until the columns have been read
+            with patients.lock.read():
+                return rules.bill_many(patients.table)
+        return rules.bill_many(patients)
+
+    def end_of_day(self, patients: PatientRegistry):
+        """Print what billing every registered patient with the current prices comes to."""
+        started = perf_counter()
+        totals, discounted = self.bill_many(patients)
+        elapsed = perf_counter() - started
+        if hasattr(totals, "sum"):  # NumPy arrays
+            billable, total, discounted_total = int((totals > 0).sum()), int(totals.sum()), int(discounted.sum())
+        else:
+            billable, total, discounted_total = sum(1 for t in totals if t), sum(totals), sum(discounted)
+        print(f"\n=== End of Day Billing (price list {self.rules.version}) ===")
+        print(f"Patients billed : {billable:,} of {len(totals):,}")
+        print(f"Total           : €{format_cents(total)}")
+        print(f"After insurance : €{format_cents(discounted_total)}")
+        print(f"Computed in {elapsed * 1000:.1f} ms")
+
+    def charge(self, patient, payment_method):
+        """
+        Bill one patient and store the payment; returns (services_used, total,
+        discounted_total, price_version). Line items and totals come from the same
+        price list version.
+        """
+        rules = self.rules
+        total, discounted = rules.bill(patient)
+        services_used = rules.services_for(patient)
+        self.save_payment_history(patient.patient_id, services_used, total, discounted, payment_method,
+                                  rules.version)
+        return services_used, total, discounted, rules.version
+
+    def process_payment_for_patient(self, patient, total, discounted, payment_method,
+                                    rules: Optional[CompiledBillingRules] = None):
         """
         Build services_used from patient and save payment history, then print confirmation.
+        `rules` must be the version total/discounted were computed with (default: the
+        live one, only safe when no reload can have happened since the bill).
         """
-        services_used = []
-        if patient.regular_checkup == 'y':
-            service = "Regular Checkup"
-            cost = self.services.get(service, 0.0)
-            services_used.append((service, cost))
-        if patient.urgent_care == 'y':
-            service = "Emergency Services"
-            cost = self.services.get(service, 0.0)
-            services_used.append((service, cost))
-        if patient.specialist_needed == 'y':
-            service = "Specialist Consultation"
-            cost = self.services.get(service, 0.0)
-            services_used.append((service, cost))
-        self.save_payment_history(patient.patient_id, services_used, total, discounted, payment_method)
+        rules = rules or self.rules
+        services_used = rules.services_for(patient)
+        self.save_payment_history(patient.patient_id, services_used, total, discounted, payment_method,
+                                  rules.version)
         print("Payment processed successfully.")
 
-    def process_billing(self, patients: List[Patient]):
+    def process_billing(self, patients: PatientRegistry):
         """
         Process billing for a patient
         """
@@ -109,51 +152,21 @@ class BillingSystem:
         # Prompt for patient ID
         patient_id = input("\nEnter patient ID: ")
         
-        # Find patient
-        patient = None
-        for p in patients:
-            if p.patient_id == patient_id:
-                patient = p
-                break
+        # Find patient (O(1) via the registry's id index)
+        patient = patients.get(patient_id.strip())
                 
         if not patient:
             print("Patient not found.")
             return
             
-        # Calculate total based on patient attributes
-        total = 0.0
-        services_used = []
-        
-        if patient.regular_checkup == 'y':
-            service = "Regular Checkup"
-            cost = self.services.get(service, 0.0)
-            total += cost
-            services_used.append((service, cost))
-        
-        if patient.urgent_care == 'y':
-            service = "Emergency Services"
-            cost = self.services.get(service, 0.0)
-            total += cost
-            services_used.append((service, cost))
-        
-        if patient.specialist_needed == 'y':
-            service = "Specialist Consultation"
-            cost = self.services.get(service, 0.0)
-            total += cost
-            services_used.append((service, cost))
-            
-        # Apply insurance discount if applicable
-        discounted_total = total
-        if patient.insurance == 'y':
-            if patient.insurance_type == 'private':
-                discounted_total = total * 0.1  # 90% discount for private
-            elif patient.insurance_type == 'public':
-                discounted_total = total * 0.2  # 80% discount for public
+        # Calculate total based on patient attributes (one price list version for the whole bill)
+        rules = self.rules
+        total, discounted_total = self.calculate_patient_bill(patient, rules)
                 
         # Display totals
-        print(f"\nYour total is €{total:.2f}.")
+        print(f"\nYour total is €{format_cents(total)}.")
         if patient.insurance == 'y':
-            print(f"With insurance ({patient.insurance_type}) it comes down to €{discounted_total:.2f}.")
+            print(f"With insurance ({patient.insurance_type}) it comes down to €{format_cents(discounted_total)}.")
             
         # Prompt for payment method
         payment_method = ""
@@ -161,61 +174,76 @@ class BillingSystem:
             payment_method = input("Payment method (cash/card): ")
             
         # Save to payment history
-        self.save_payment_history(patient.patient_id, services_used, total, discounted_total, payment_method)
+        self.process_payment_for_patient(patient, total, discounted_total, payment_method, rules)
         
-        print("Payment processed successfully.")
-        
-    def save_payment_history(self, patient_id, services_used, total, discounted_total, payment_method, filepath="data/payment_history.csv"):
+    def save_payment_history(self, patient_id, services_used, total, discounted_total, payment_method,
+                             price_version=None):
         """
-        Save payment history to CSV
+        Store a payment through the storage backend (cost/total/discounted_total in cents),
+        tagged with the price list version it was billed with
         """
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        
-        # Check if file exists
-        file_exists = os.path.isfile(filepath) and os.path.getsize(filepath) > 0
-        
-        with open(filepath, 'a', newline='') as csvfile:
-            fieldnames = ['PatientID', 'Service', 'Cost', 'Total', 'DiscountedTotal', 'PaymentMethod', 'Date']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            
-            # Write header if file is new
-            if not file_exists:
-                writer.writeheader()
-                
-            # Get current date
-            current_date = time.strftime("%Y-%m-%d")
-            
-            # Write each service as a row
-            for service, cost in services_used:
-                writer.writerow({
-                    'PatientID': patient_id,
-                    'Service': service,
-                    'Cost': f"{cost:.2f}",
-                    'Total': f"{total:.2f}",
-                    'DiscountedTotal': f"{discounted_total:.2f}",
-                    'PaymentMethod': payment_method,
-                    'Date': current_date
-                })
+        # The archive must know the version before any stored payment carries it
+        self.catalog.ensure_archived(price_version)
+        with METRICS.timer("operation_seconds", op="save_payment"):
+            self.storage.record_payment(patient_id, services_used, total, discounted_total, payment_method,
+                                        price_version)
+        METRICS.inc("payments_recorded_total", method=payment_method.lower())
+        METRICS.inc("payments_billed_cents_total", discounted_total)
                 
-    def display_payment_history(self, filepath="data/payment_history.csv"):
+    @METRICS.timed("operation_seconds", op="save_payments")
+    def save_payments(self, payments):
         """
-        Prints each row in data/payment_history.csv
+        Store a batch of (patient_id, services_used, total, discounted_total,
+        payment_method, price_version) in one storage call (one transaction / one flush)
         """
-        if not os.path.exists(filepath):
+        payments = list(payments)
+        if not payments:
+            return []
+        for version in {payment[5] for payment in payments}:
+            self.catalog.ensure_archived(version)
+        payment_ids = self.storage.record_payments(payments)
+        if METRICS.enabled:
+            METRICS.inc("payments_billed_cents_total", sum(payment[3] for payment in payments))
+            for payment in payments:
+                METRICS.inc("payments_recorded_total", method=payment[4].lower())
+        return payment_ids
+
+    def display_payment_history(self, page_size=20):
+        """
+        Page through the payment history, optionally filtered by
+        PatientID, date range and payment method (blank = no filter).
+        Rows are streamed lazily; the backend uses its indexes for PatientID/date filters.
+        """
+        if not self.storage.has_payments():
             print("No payment history found.")
             return
-            
+
+        patient_id = input("Filter by patient ID (Enter for all): ").strip() or None
+        date_from = _optional_date("From date YYYY-MM-DD (Enter for none): ")
+        date_to = _optional_date("To date YYYY-MM-DD (Enter for none): ")
+        payment_method = None
+        while True:
+            method = input("Payment method cash/card (Enter for any): ").strip().lower()
+            if method in ('', 'cash', 'card'):
+                payment_method = method or None
+                break
+            print("Please enter 'cash', 'card' or just press Enter.")
+
+        filters = dict(patient_id=patient_id, date_from=date_from, date_to=date_to, payment_method=payment_method)
         try:
-            with open(filepath, 'r', newline='') as csvfile:
-                reader = csv.DictReader(csvfile)
-                
-                print("\n=== Payment History ===")
+            rows = self.storage.iter_payments(**filters)
+
+            print("\n=== Payment History ===")
+            shown = 0
+            for page_number, page in enumerate(paginate(rows, page_size), 1):
+                if page_number > 1:
+                    more = input("-- Enter for next page, q to stop: ").strip().lower()
+                    if more == 'q':
+                        break
                 print("{:<10} {:<20} {:<10} {:<10} {:<15} {:<15} {:<12}".format(
                     "PatientID", "Service", "Cost", "Total", "Discounted", "Payment", "Date"))
                 print("-" * 90)
-                
-                for row in reader:
+                for row in page:
                     print("{:<10} {:<20} €{:<9} €{:<9} €{:<14} {:<15} {:<12}".format(
                         row['PatientID'], 
                         row['Service'], 
@@ -225,6 +253,45 @@ class BillingSystem:
                         row['PaymentMethod'], 
                         row['Date']
                     ))
+                shown += len(page)
+            if not shown:
+                print("No matching payments found.")
                     
         except Exception as e:
-            print(f"Error displaying payment history: {e}")
\ No newline at end of file
+            print(f"Error displaying payment history: {e}")
+
+
+def _optional_date(prompt: str) -> Optional[str]:
+    """Prompt for an ISO date; blank input means no bound."""
+    while True:
+        value = input(prompt).strip()
+        if not value:
+            return None
+        try:
+            return date.fromisoformat(value).isoformat()
+        except ValueError:
+            print("Please enter a date as YYYY-MM-DD or just press Enter.")
+
+
+def main(argv) -> int:
+    import argparse
+    from storage import open_storage
+
+    parser = argparse.ArgumentParser(description="Billing reports")
+    parser.add_argument("--storage", choices=("csv", "sqlite"), help="backend (default: $HOSPITAL_STORAGE or csv)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("end-of-day", help="bill every registered patient with the current prices")
+    args = parser.parse_args(argv)
+
+    storage = open_storage(args.storage)
+    try:
+        state = storage.load_state()
+        billing = BillingSystem(storage, state.services)
+        billing.end_of_day(PatientRegistry(state.patients))
+        return 0
+    finally:
+        storage.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
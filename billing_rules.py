@@ -0,0 +1,136 @@
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from patient_table import FLAG_BITS, FLAG_FIELDS, PatientTable
+from money import BASIS_POINTS, apply_ratio
+
+# Patient flag -> services (names from data/billing.csv) billed when the flag is 'y'
+SERVICE_RULES: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("regular_checkup", ("Regular Checkup",)),
+    ("urgent_care", ("Emergency Services",)),
+    ("specialist_needed", ("Specialist Consultation",)),
+    ("chronic_condition", ("Blood Test", "Laboratory Services")),
+    ("follow_up", ("Imaging Services",)),
+)
+
+# insurance_type -> share of the total the patient still pays, in basis points
+# (only when insurance == 'y'): private pays 10%, public pays 20%
+COPAY_RATIOS: Dict[str, int] = {
+    "private": 1000,
+    "public": 2000,
+}
+
+_numpy = None
+
+
+def _load_numpy():
+    """Import NumPy on first batch use only; returns None when it is not installed."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy or None
+
+
+class CompiledBillingRules:
+    """
+    SERVICE_RULES / COPAY_RATIOS compiled against a price list in integer cents.
+    Every combination of the six y/n flags is a bitmask (patient_table.FLAG_BITS), so
+    line items and totals are precomputed for all 64 masks and billing a patient is
+    one mask computation plus a table lookup.
+    Instances are immutable snapshots (read-only mappings, tuples), so any number
+    of threads bill from one without locking; new prices mean a new instance
+    (BillingSystem.update_prices).
+    """
+
+    def __init__(self, services: Dict[str, int],
+                 rules=SERVICE_RULES, copay_ratios=COPAY_RATIOS, version: Optional[str] = None):
+        # Price list version (service_catalog) payments billed with these rules are tagged with
+        self.version = version
+        self.services = MappingProxyType(dict(services))
+        self.copay_ratios = MappingProxyType(dict(copay_ratios))
+        self.missing_services = sorted({
+            service for _, names in rules for service in names if service not in services
+        })
+
+        per_flag: List[Tuple[int, Tuple[Tuple[str, int], ...]]] = [
+            (FLAG_BITS[flag], tuple((name, services.get(name, 0)) for name in names))
+            for flag, names in rules
+        ]
+        size = 1 << len(FLAG_FIELDS)
+        self.line_items: Tuple[Tuple[Tuple[str, int], ...], ...] = tuple(
+            tuple(item for bit, flag_items in per_flag if mask & bit for item in flag_items)
+            for mask in range(size)
+        )
+        self.totals: Tuple[int, ...] = tuple(sum(cost for _, cost in items) for items in self.line_items)
+
+    @staticmethod
+    def mask_of(patient) -> int:
+        mask = 0
+        for field, bit in FLAG_BITS.items():
+            if getattr(patient, field) == 'y':
+                mask |= bit
+        return mask
+
+    def copay_ratio(self, patient) -> Optional[int]:
+        """Share the patient pays in basis points, or None when no insurance discount applies."""
+        if patient.insurance != 'y':
+            return None
+        return self.copay_ratios.get(patient.insurance_type)
+
+    def services_for(self, patient) -> Tuple[Tuple[str, int], ...]:
+        return self.line_items[self.mask_of(patient)]
+
+    def bill(self, patient) -> Tuple[int, int]:
+        """(total, discounted_total) in cents for one patient."""
+        total = self.totals[self.mask_of(patient)]
+        ratio = self.copay_ratio(patient)
+        return total, (total if ratio is None else apply_ratio(total, ratio))
+
+    def bill_many(self, patients) -> Tuple[Sequence[int], Sequence[int]]:
+        """
+        (totals, discounted_totals) in cents for a whole cohort in one pass.
+        A PatientTable is billed straight from its packed flag/insurance columns
+        (vectorized when NumPy is installed); other iterables fall back to a
+        single Python pass over the patients.
+        """
+        if isinstance(patients, PatientTable):
+            return self._bill_table(patients)
+        return self._bill_iterable(patients)
+
+    def _bill_iterable(self, patients: Iterable) -> Tuple[List[int], List[int]]:
+        totals_by_mask = self.totals
+        mask_of = self.mask_of
+        copay_ratio = self.copay_ratio
+        totals = []
+        discounted = []
+        for patient in patients:
+            total = totals_by_mask[mask_of(patient)]
+            ratio = copay_ratio(patient)
+            totals.append(total)
+            discounted.append(total if ratio is None else apply_ratio(total, ratio))
+        return totals, discounted
+
+    def _table_ratios(self, table: PatientTable) -> List[int]:
+        """Copay ratio per insurance_type code (BASIS_POINTS = pays everything)."""
+        return [self.copay_ratios.get(value, BASIS_POINTS) for value in table.insurance_type_values]
+
+    def _bill_table(self, table: PatientTable):
+        ratios = self._table_ratios(table)
+        insured_bit = FLAG_BITS["insurance"]
+        np = _load_numpy()
+        if np is not None:
+            flags = np.frombuffer(table.flags, dtype=np.uint8)
+            codes = np.frombuffer(table.insurance_types, dtype=table.insurance_types.typecode)
+            totals = np.asarray(self.totals, dtype=np.int64)[flags]
+            ratio = np.where(flags & insured_bit, np.asarray(ratios, dtype=np.int64)[codes], BASIS_POINTS)
+            return totals, (totals * ratio + BASIS_POINTS // 2) // BASIS_POINTS
+        totals_by_mask = self.totals
+        totals = [totals_by_mask[mask] for mask in table.flags]
+        discounted = [
+            apply_ratio(total, ratios[code]) if mask & insured_bit else total
+            for total, mask, code in zip(totals, table.flags, table.insurance_types)
+        ]
+        return totals, discounted
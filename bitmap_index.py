@@ -0,0 +1,234 @@
+import re
+from operator import attrgetter
+from typing import Dict, Iterable, Iterator, List, Optional
+from patient_table import FLAG_FIELDS
+
+AGE_GROUPS = (("kids", 15), ("adults", 64), ("elderly", 255))  # (name, highest age)
+BITMAP_FIELDS = FLAG_FIELDS + ("insurance_type", "age_group", "age_decade")
+
+# Set bit numbers of every byte value, for walking a bitmap a byte at a time
+_BYTE_BITS = tuple(tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256))
+_TOKEN = re.compile(r"\s*(?:(\()|(\))|(!=|=)|([A-Za-z0-9_]+))")
+
+
+def age_group(age: int) -> str:
+    for name, highest in AGE_GROUPS:
+        if age <= highest:
+            return name
+    return AGE_GROUPS[-1][0]
+
+
+def _normalize(value: Optional[str]) -> str:
+    return (value or "").strip().lower()
+
+
+# Age bucket lookups for the valid age range (0-150, stored in a byte)
+_AGE_GROUPS = tuple(age_group(age) for age in range(256))
+_AGE_DECADES = tuple(str(age // 10 * 10) for age in range(256))
+
+
+_RAW_FIELDS = FLAG_FIELDS + ("insurance_type",)  # indexed as stored; the age fields are derived
+
+
+def _columns(patients: List) -> List[List]:
+    """Raw indexed values in BITMAP_FIELDS order, one list per field (age buckets computed)."""
+    columns = [list(map(attrgetter(field), patients)) for field in _RAW_FIELDS]
+    ages = list(map(attrgetter("age"), patients))
+    try:
+        columns.append(list(map(_AGE_GROUPS.__getitem__, ages)))
+        columns.append(list(map(_AGE_DECADES.__getitem__, ages)))
+    except IndexError:
+        columns.append([age_group(age) for age in ages])
+        columns.append([str(age // 10 * 10) for age in ages])
+    return columns
+
+
+def iter_positions(bitmap: int) -> Iterator[int]:
+    """Positions of the set bits, ascending."""
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+    for index, byte in enumerate(data):
+        if byte:
+            base = index * 8
+            for bit in _BYTE_BITS[byte]:
+                yield base + bit
+
+
+class BitmapIndex:
+    """
+    One bitmap per (field, value) stored as a Python int (bit i = patient at
+    position i), over the y/n flags, insurance_type, age_group (kids <= 15,
+    adults 16-64, elderly >= 65) and age_decade ("0", "10", ... "90").
+    Boolean filters are word-level int operations (&, |, ~ against the all-rows
+    mask) and counts are int.bit_count(), so no Patient is touched until the
+    matching positions are actually listed.
+    Expressions (see evaluate):
+        urgent_care AND NOT insurance
+        (age_group=elderly OR chronic_condition) AND insurance_type=public
+    """
+
+    FIELDS = BITMAP_FIELDS
+
+    def __init__(self, patients: Iterable = ()):
+        self.size = 0
+        self.bitmaps: Dict[str, Dict[str, int]] = {field: {} for field in self.FIELDS}
+        self.extend(patients)
+
+    # --- building ---
+
+    def extend(self, patients: Iterable):
+        """Append patients; each touched bitmap is OR-ed once per batch."""
+        patients = list(patients)
+        if not patients:
+            return
+        start = self.size
+        count = len(patients)
+        for field, column in zip(self.FIELDS, _columns(patients)):
+            bitmaps = self.bitmaps[field]
+            # Normalize once per distinct raw value, not per row
+            normalized = {raw: _normalize(raw) for raw in set(column)}
+            values = sorted(set(normalized.values()))
+            if len(values) == 1:
+                bitmaps[values[0]] = bitmaps.get(values[0], 0) | ((1 << count) - 1) << start
+                continue
+            if len(values) > 256:
+                raise ValueError(f"{field} has too many distinct values to index ({len(values)})")
+            # One byte code per value, then a C-level bytes.translate per value to an
+            # ASCII "0"/"1" string parsed as a base-2 int (highest position first);
+            # the last value is whatever the others did not cover
+            codes = {raw: values.index(value) for raw, value in normalized.items()}
+            encoded = bytes(map(codes.__getitem__, reversed(column)))
+            covered = 0
+            for code, value in enumerate(values[:-1]):
+                table = bytearray(b"0" * 256)
+                table[code] = ord("1")
+                bits = int(encoded.translate(table), 2)
+                covered |= bits
+                bitmaps[value] = bitmaps.get(value, 0) | bits << start
+            rest = ((1 << count) - 1) ^ covered
+            bitmaps[values[-1]] = bitmaps.get(values[-1], 0) | rest << start
+        self.size += count
+
+    def add(self, patient):
+        """Append one patient: set its bit in the bitmap of each field's value."""
+        bit = 1 << self.size
+        bitmaps = self.bitmaps
+        for field in _RAW_FIELDS:
+            value = _normalize(getattr(patient, field))
+            bitmaps[field][value] = bitmaps[field].get(value, 0) | bit
+        age = patient.age
+        if 0 <= age < len(_AGE_GROUPS):
+            group, decade = _AGE_GROUPS[age], _AGE_DECADES[age]
+        else:
+            group, decade = age_group(age), str(age // 10 * 10)
+        for field, value in (("age_group", group), ("age_decade", decade)):
+            bitmaps[field][value] = bitmaps[field].get(value, 0) | bit
+        self.size += 1
+
+    # --- queries ---
+
+    @property
+    def all(self) -> int:
+        return (1 << self.size) - 1
+
+    def bitmap(self, field: str, value: Optional[str] = 'y') -> int:
+        """Rows where field == value (flags default to 'y')."""
+        if field not in self.bitmaps:
+            raise KeyError(f"{field} is not an indexed field ({', '.join(self.FIELDS)})")
+        return self.bitmaps[field].get("" if value is None else str(value).strip().lower(), 0)
+
+    def evaluate(self, expression: str) -> int:
+        """
+        Bitmap of the rows matching a boolean expression (blank = every row).
+        Grammar: OR of ANDs of [NOT] terms; a term is `field`, `field=value`,
+        `field!=value` or a parenthesized expression. AND/OR/NOT are case-insensitive
+        (and &, |, ! are not supported to keep the syntax unambiguous).
+        Raises ValueError on syntax errors or unknown fields.
+        """
+        tokens = self._tokenize(expression)
+        if not tokens:
+            return self.all
+        parser = _Parser(self, tokens)
+        result = parser.expression()
+        if parser.position != len(tokens):
+            raise ValueError(f"Unexpected {tokens[parser.position]!r} in filter")
+        return result
+
+    def count(self, expression: str) -> int:
+        return self.evaluate(expression).bit_count()
+
+    def positions(self, expression: str) -> List[int]:
+        return list(iter_positions(self.evaluate(expression)))
+
+    @staticmethod
+    def _tokenize(expression: str) -> List[str]:
+        tokens = []
+        position = 0
+        expression = expression.rstrip()
+        while position < len(expression):
+            match = _TOKEN.match(expression, position)
+            if match is None:
+                raise ValueError(f"Cannot parse filter near {expression[position:]!r}")
+            tokens.append(match.group(match.lastindex))
+            position = match.end()
+        return tokens
+
+
+class _Parser:
+    """Recursive descent over BitmapIndex tokens; NOT binds tighter than AND, AND than OR."""
+
+    def __init__(self, index: BitmapIndex, tokens: List[str]):
+        self.index = index
+        self.tokens = tokens
+        self.position = 0
+
+    def _peek(self) -> Optional[str]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _next(self) -> str:
+        token = self._peek()
+        if token is None:
+            raise ValueError("Filter ends unexpectedly")
+        self.position += 1
+        return token
+
+    def expression(self) -> int:
+        result = self.conjunction()
+        while (self._peek() or "").upper() == "OR":
+            self.position += 1
+            result |= self.conjunction()
+        return result
+
+    def conjunction(self) -> int:
+        result = self.negation()
+        while (self._peek() or "").upper() == "AND":
+            self.position += 1
+            result &= self.negation()
+        return result
+
+    def negation(self) -> int:
+        if (self._peek() or "").upper() == "NOT":
+            self.position += 1
+            return self.index.all & ~self.negation()
+        return self.term()
+
+    def term(self) -> int:
+        token = self._next()
+        if token == "(":
+            result = self.expression()
+            if self._next() != ")":
+                raise ValueError("Missing ')' in filter")
+            return result
+        if token in (")", "=", "!=") or token.upper() in ("AND", "OR", "NOT"):
+            raise ValueError(f"Unexpected {token!r} in filter")
+        field = token.lower()
+        if field not in self.index.bitmaps:
+            raise ValueError(f"Unknown filter field {token!r} (expected one of {', '.join(self.index.FIELDS)})")
+        operator = self._peek()
+        if operator not in ("=", "!="):
+            if field not in FLAG_FIELDS:
+                raise ValueError(f"{field} needs a value, e.g. {field}=...")
+            return self.index.bitmap(field, 'y')
+        self.position += 1
+        value = self._next()
+        bitmap = self.index.bitmap(field, value)
+        return bitmap if operator == "=" else self.index.all & ~bitmap
@@ -0,0 +1,150 @@
+"""
+Locking helpers for sharing one HospitalSystem between threads.
+- RWLock: many readers or one writer (PatientRegistry.lock)
+- read_locked / write_locked: method decorators taking self.lock
+- locked_cached_property: cached_property whose first computation runs once
+  even when several threads ask for it at the same time
+Files are not locked here: every CSV has a single owner thread (writers.CsvAppendWriter).
+"""
+import threading
+from functools import cached_property, wraps
+from threading import get_ident
+
+_MISSING = object()
+
+
+class RWLock:
+    """
+    Reader-writer lock.
+    - read(): shared; any number of threads at once while nobody writes
+    - write(): exclusive; waits for the current readers to leave
+    - writer preferring: once a writer waits, new readers queue behind it, so a
+      steady stream of searches cannot starve registrations
+    - the writer may take write() again or read() its own data; reads must not
+      nest and a reader cannot upgrade to write (both would deadlock)
+    Uncontended, a read is one short critical section on a plain mutex each way.
+    """
+
+    __slots__ = ("_mutex", "_cond", "_readers", "_writer", "_writer_depth", "_waiting_writers")
+
+    def __init__(self):
+        self._mutex = threading.Lock()
+        self._cond = threading.Condition(self._mutex)
+        self._readers = 0
+        self._writer = None  # thread ident holding the write lock
+        self._writer_depth = 0
+        self._waiting_writers = 0
+
+    def acquire_read(self):
+        with self._mutex:
+            if self._writer is None and not self._waiting_writers:
+                self._readers += 1
+                return
+            if self._writer == get_ident():
+                return  # reading under our own write lock
+            while self._writer is not None or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._mutex:
+            if self._writer is not None and self._writer == get_ident():
+                return
+            self._readers -= 1
+            if not self._readers and self._waiting_writers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        me = get_ident()
+        with self._mutex:
+            if self._writer == me:
+                self._writer_depth += 1
+                return
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+            self._writer_depth = 1
+
+    def release_write(self):
+        with self._mutex:
+            if self._writer != get_ident():
+                raise RuntimeError("write lock released by a thread that does not hold it")
+            self._writer_depth -= 1
+            if not self._writer_depth:
+                self._writer = None
+                self._cond.notify_all()
+
+    def read(self) -> "_Held":
+        """with lock.read(): ..."""
+        return _Held(self.acquire_read, self.release_read)
+
+    def write(self) -> "_Held":
+        """with lock.write(): ..."""
+        return _Held(self.acquire_write, self.release_write)
+
+
+class _Held:
+    __slots__ = ("_acquire", "_release")
+
+    def __init__(self, acquire, release):
+        self._acquire = acquire
+        self._release = release
+
+    def __enter__(self):
+        self._acquire()
+
+    def __exit__(self, *exc):
+        self._release()
+
+
+def read_locked(method):
+    """Run the method holding self.lock for reading."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        lock = self.lock
+        lock.acquire_read()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            lock.release_read()
+    return wrapper
+
+
+def write_locked(method):
+    """Run the method holding self.lock for writing."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        lock = self.lock
+        lock.acquire_write()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            lock.release_write()
+    return wrapper
+
+
+class locked_cached_property(cached_property):
+    """
+    functools.cached_property that computes the value once under a lock; threads
+    racing to the first access all get that one value (the stdlib version stopped
+    locking in Python 3.12). Cached reads do not touch the lock.
+    """
+
+    def __init__(self, func):
+        super().__init__(func)
+        self._lock = threading.RLock()
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        value = instance.__dict__.get(self.attrname, _MISSING)
+        if value is _MISSING:
+            with self._lock:
+                value = instance.__dict__.get(self.attrname, _MISSING)
+                if value is _MISSING:
+                    value = super().__get__(instance, owner)
+        return value
@@ -0,0 +1,239 @@
+"""
+Thin desk client for desk_server: the usual HospitalSystem menus, with every
+read and write answered by the shared server instead of local files.
+    python hospital_system.py --connect [host:port | unix:/path]
+"""
+import socket
+from functools import cached_property
+from typing import Dict, Iterator, List, Optional
+from billing import BillingSystem
+from bitmap_index import BitmapIndex
+from desk_protocol import DeskError, decode, encode, parse_address, patient_from_dict, patient_to_dict
+from doctors import DoctorDirectory
+from hospital_system import HospitalSystem
+from patient import Doctor, Patient
+from summary import PatientSummary
+
+PAGE_SIZE = 1000
+
+
+class DeskClient:
+    """Blocking client: call(op, **args) sends one request and waits for its answer."""
+
+    def __init__(self, address: str, timeout: float = 10.0):
+        kind, host, port = parse_address(address)
+        if kind == "unix":
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            sock.connect(host)
+        else:
+            sock = socket.create_connection((host, port), timeout)
+        sock.settimeout(None)  # the timeout only bounds connecting; big answers may take a while
+        self.address = address
+        self._socket = sock
+        self._file = sock.makefile('rwb')
+        self._next_id = 0
+
+    def call(self, op: str, **args):
+        self._next_id += 1
+        request_id = self._next_id
+        try:
+            self._file.write(encode({"id": request_id, "op": op, "args": args}))
+            self._file.flush()
+            while True:
+                line = self._file.readline()
+                if not line:
+                    raise DeskError(f"connection to {self.address} closed")
+                response = decode(line)
+                if response.get("id") == request_id:
+                    break
+        except OSError as e:
+            raise DeskError(f"connection to {self.address} failed: {e}") from None
+        if not response.get("ok"):
+            raise DeskError(response.get("error") or "request failed")
+        return response.get("result")
+
+    def pages(self, op: str, **args) -> List[Patient]:
+        """Every patient of a paged answer ({"total", "patients"})."""
+        patients = []
+        offset = 0
+        while True:
+            result = self.call(op, offset=offset, limit=PAGE_SIZE, **args)
+            patients += map(patient_from_dict, result["patients"])
+            offset += PAGE_SIZE
+            if offset >= result["total"]:
+                return patients
+
+    def close(self):
+        try:
+            self._file.close()
+        finally:
+            self._socket.close()
+
+
+class RemotePatients:
+    """The PatientRegistry lookups the menus use, answered by the server."""
+
+    INDEXED_FIELDS = BitmapIndex.FIELDS
+
+    def __init__(self, client: DeskClient):
+        self.client = client
+
+    def get(self, patient_id: str) -> Optional[Patient]:
+        data = self.client.call("get", patient_id=patient_id)
+        return patient_from_dict(data) if data else None
+
+    def search_name(self, term: str) -> List[Patient]:
+        return self.client.pages("search", name=term)
+
+    def search_name_fuzzy(self, term: str, limit: int = 10) -> List[Patient]:
+        result = self.client.call("search", name=term, mode="fuzzy", limit=limit)
+        return [patient_from_dict(p) for p in result["patients"]]
+
+    def find_by_name(self, name: str) -> List[Patient]:
+        return self.client.pages("search", name=name, mode="exact")
+
+    def find_by_name_prefix(self, prefix: str) -> List[Patient]:
+        return self.client.pages("search", name=prefix, mode="prefix")
+
+    def find_by_name_range(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Patient]:
+        return self.client.pages("search", name=start, end=end, mode="range")
+
+    def filter(self, expression: str) -> List[Patient]:
+        return self.client.pages("filter", expression=expression)
+
+    def count(self, expression: str) -> int:
+        try:
+            return self.client.call("filter", expression=expression, limit=0)["total"]
+        except DeskError as e:
+            raise ValueError(str(e)) from None
+
+    def __len__(self) -> int:
+        return self.client.call("stats")["patients"]
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __iter__(self) -> Iterator[Patient]:
+        return iter(self.client.pages("list"))
+
+
+class RemoteSorter:
+    def __init__(self, client: DeskClient):
+        self.client = client
+
+    def sorted(self, keys) -> List[Patient]:
+        return self.client.pages("sorted", keys=[keys] if isinstance(keys, str) else list(keys))
+
+
+class RemoteIdAllocator:
+    """IDs come from the server's sequence, so desks never hand out the same one."""
+
+    def __init__(self, client: DeskClient):
+        self.client = client
+
+    def allocate(self, count: int = 1) -> List[str]:
+        return self.client.call("allocate", count=count)["ids"]
+
+    def next_id(self) -> str:
+        return self.allocate(1)[0]
+
+
+class RemoteStorage:
+    """The storage calls the menus make directly (payment history, reports)."""
+
+    def __init__(self, client: DeskClient):
+        self.client = client
+
+    def has_payments(self) -> bool:
+        return self.client.call("history", limit=0)["has_payments"]
+
+    def iter_payments(self, patient_id=None, date_from=None, date_to=None,
+                      payment_method=None) -> Iterator[Dict[str, str]]:
+        filters = dict(patient_id=patient_id, date_from=date_from, date_to=date_to, payment_method=payment_method)
+        offset = 0
+        while True:
+            rows = self.client.call("history", offset=offset, limit=PAGE_SIZE, **filters)["rows"]
+            yield from rows
+            if len(rows) < PAGE_SIZE:
+                return
+            offset += PAGE_SIZE
+
+    def pandas_summary(self):
+        print("The full pandas recompute only runs on the server (python hospital_system.py there).")
+
+    def save_summary(self, summary: PatientSummary):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.client.close()
+
+
+class RemoteBilling(BillingSystem):
+    """Bills are computed and recorded by the server (its price list is the only one)."""
+
+    catalog = None
+    rules = None  # the server bills with one version per request
+
+    def __init__(self, client: DeskClient, storage: RemoteStorage):
+        self.client = client
+        self.storage = storage
+
+    def calculate_patient_bill(self, patient, rules=None):
+        result = self.client.call("quote", patient_id=patient.patient_id)
+        return result["total"], result["discounted"]
+
+    def process_payment_for_patient(self, patient, total, discounted, payment_method, rules=None):
+        self.client.call("bill", patient_id=patient.patient_id, payment_method=payment_method)
+        print("Payment processed successfully.")
+
+
+class DeskClientSystem(HospitalSystem):
+    """
+    HospitalSystem whose registry, doctors, IDs, billing, history and summary
+    live in a desk_server; the menus and prompts are the same as the local app.
+    """
+
+    def __init__(self, client: DeskClient, profiler=None):
+        self.client = client
+        super().__init__(profiler, storage=RemoteStorage(client))
+
+    @cached_property
+    def doctors(self) -> DoctorDirectory:
+        return DoctorDirectory(Doctor(d["doctor_id"], d["name"], d["department"])
+                               for d in self.client.call("doctors"))
+
+    @cached_property
+    def patients(self) -> RemotePatients:
+        return RemotePatients(self.client)
+
+    @cached_property
+    def sorter(self) -> RemoteSorter:
+        return RemoteSorter(self.client)
+
+    @cached_property
+    def id_allocator(self) -> RemoteIdAllocator:
+        return RemoteIdAllocator(self.client)
+
+    @cached_property
+    def billing_system(self) -> RemoteBilling:
+        return RemoteBilling(self.client, self.storage)
+
+    @property
+    def summary(self) -> PatientSummary:
+        # Always the server's current aggregates
+        return PatientSummary.from_dict(self.client.call("summary"))
+
+    def register_patient(self, patient: Patient):
+        self.client.call("register", **patient_to_dict(patient))
+
+    def run(self):
+        """The local menu loop; a failed request is reported and the main menu shown again."""
+        while True:
+            try:
+                return super().run()
+            except DeskError as e:
+                print(f"\nDesk server error: {e}")
@@ -0,0 +1,55 @@
+"""
+Wire format shared by desk_server and desk_client: one JSON object per line.
+    request:  {"id": 7, "op": "search", "args": {"name": "ann"}}
+    response: {"id": 7, "ok": true, "result": [...]}
+              {"id": 7, "ok": false, "error": "patient P1234 not found"}
+Requests on one connection may be pipelined (sent without waiting for the
+previous response); responses can come back out of order and are matched by id.
+Patients travel as dicts of PATIENT_FIELDS, amounts as integer cents.
+Addresses: "host:port" for TCP or "unix:/path/to.sock".
+"""
+import json
+from typing import Dict, Optional, Tuple
+from patient import Patient
+
+ENV_SERVER = "HOSPITAL_SERVER"
+DEFAULT_ADDRESS = "127.0.0.1:7400"
+MAX_LINE = 1 << 20  # bytes per request / response line
+
+PATIENT_FIELDS = (
+    "patient_id", "name", "age", "urgent_care", "specialist_needed", "regular_checkup",
+    "follow_up", "insurance", "chronic_condition", "specific_doctor", "insurance_type"
+)
+
+
+class DeskError(Exception):
+    """An error response from the server (or a broken connection to it)."""
+
+
+def parse_address(address: str) -> Tuple[str, Optional[str], Optional[int]]:
+    """"host:port" -> ("tcp", host, port); "unix:/path" -> ("unix", path, None)."""
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):], None
+    host, _, port = address.rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(f"invalid address {address!r} (expected host:port or unix:/path)")
+    return "tcp", host.strip("[]"), int(port)
+
+
+def patient_to_dict(patient) -> Dict:
+    return {field: getattr(patient, field) for field in PATIENT_FIELDS}
+
+
+def patient_from_dict(data: Dict) -> Patient:
+    return Patient(*(data.get(field) for field in PATIENT_FIELDS))
+
+
+def encode(message: Dict) -> bytes:
+    return json.dumps(message, separators=(",", ":")).encode('utf-8') + b"\n"
+
+
+def decode(line: bytes) -> Dict:
+    message = json.loads(line)
+    if not isinstance(message, dict):
+        raise ValueError("expected a JSON object")
+    return message
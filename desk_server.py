@@ -0,0 +1,445 @@
+"""
+Shared front-desk server: one process owns the registry, the ID sequence and
+the files, and every reception desk talks to it (desk_protocol, JSON lines):
+    python desk_server.py [--listen 127.0.0.1:7400 | --listen unix:/run/hospital.sock]
+    python hospital_system.py --connect 127.0.0.1:7400     # a desk (thin client)
+Operations (args -> result):
+  reads, answered from memory on the event loop (a stale sorted view is rebuilt
+  on the index thread):
+    ping; stats; doctors; summary
+    get {patient_id} -> patient or null
+    search {name, mode=substring|fuzzy|exact|prefix|range, end, limit}
+    filter {expression, limit}; list {offset, limit}; sorted {keys, offset, limit}
+      -> {"total": n, "patients": [...]}
+    quote {patient_id} -> {total, discounted, services}
+  writes, serialized through one queue and committed in groups:
+    allocate {count} -> {"ids": [...]}
+    register {patient fields as in batch_admission, optional patient_id (one
+              this server handed out through allocate) and payment_method}
+      -> {patient, total, discounted, payment_method}
+    bill {patient_id, payment_method} -> {patient_id, total, discounted, services}
+    history {patient_id, date_from, date_to, payment_method, offset, limit}
+      -> {"has_payments": bool, "rows": [...]}  (reads the payment files, so it
+      is ordered with the writes)
+"""
+import argparse
+import asyncio
+import os
+import signal
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, List, Optional
+from batch_admission import PAYMENT_METHODS, validate_admission
+from desk_protocol import (
+    DEFAULT_ADDRESS, ENV_SERVER, MAX_LINE, DeskError, decode, encode, parse_address, patient_to_dict
+)
+from hospital_system import HospitalSystem
+from metrics import METRICS
+from utilities import validate_input
+
+MAX_BATCH = 256  # write requests committed together (one flush / fsync)
+MAX_IN_FLIGHT = 128  # pipelined requests per connection before reading pauses
+DEFAULT_LIMIT = 1000
+MAX_ALLOCATE = 1000
+
+
+def _limit(args: Dict, default: int = DEFAULT_LIMIT) -> int:
+    limit = args.get("limit", default)
+    if not isinstance(limit, int) or limit < 0:
+        raise DeskError("limit must be a non-negative integer")
+    return limit
+
+
+def _page(patients, args: Dict) -> Dict:
+    offset = args.get("offset", 0)
+    if not isinstance(offset, int) or offset < 0:
+        raise DeskError("offset must be a non-negative integer")
+    limit = _limit(args)
+    return {"total": len(patients), "patients": [patient_to_dict(p) for p in patients[offset:offset + limit]]}
+
+
+def _text_arg(args: Dict, name: str) -> str:
+    value = args.get(name)
+    if not isinstance(value, str) or not value.strip():
+        raise DeskError(f"{name} is required")
+    return value.strip()
+
+
+class _WriteJob:
+    __slots__ = ("op", "args", "future", "result")
+
+    def __init__(self, op: str, args: Dict, future: asyncio.Future):
+        self.op = op
+        self.args = args
+        self.future = future
+        self.result = None
+
+
+class DeskServer:
+    """
+    asyncio front-end over one HospitalSystem (its lazily loaded registry,
+    billing, doctors, summary and storage backend).
+    - Reads run on the event loop against the in-memory registry; they never wait
+      for disk, so any number of desks can search while writes are committing.
+      warm_up() builds the lazy indexes (trigrams, bitmaps) before the first
+      connection, and a sorted listing whose cached view is stale is rebuilt on
+      the index thread, so no read pays for an O(n) build on the loop.
+    - Writes go through one queue. The writer task takes up to MAX_BATCH queued
+      jobs, reserves their IDs with one PatientIdAllocator.allocate(n), stores
+      patients and payments with one add_patients / save_payments and a single
+      storage.flush() on a dedicated storage thread, and only then adds the
+      patients to the registry and summary (on the index thread) and answers: a
+      registration is visible to searches once it is on disk.
+    - register only takes a client patient_id that allocate issued and no
+      registration has used yet (`issued`), so client IDs never collide with
+      the sequence; other IDs get a fresh one from the allocator.
+    - Each connection may pipeline up to MAX_IN_FLIGHT requests; answers carry the
+      request id and are written as soon as they are ready.
+    """
+
+    def __init__(self, system: Optional[HospitalSystem] = None, max_batch: int = MAX_BATCH,
+                 max_in_flight: int = MAX_IN_FLIGHT):
+        self.system = system if system is not None else HospitalSystem()
+        self.max_batch = max_batch
+        self.max_in_flight = max_in_flight
+        self.storage_thread = ThreadPoolExecutor(1, thread_name_prefix="desk-storage")
+        # Registry updates and sort view rebuilds, kept off the event loop
+        self.index_thread = ThreadPoolExecutor(1, thread_name_prefix="desk-index")
+        self.queue: Optional[asyncio.Queue] = None
+        # IDs handed out by allocate and not yet used by a register
+        self.issued = set()
+        self.connections = 0
+        self.requests = 0
+        self.reads = {
+            "ping": lambda args: "pong",
+            "stats": self.stats,
+            "doctors": self.doctors,
+            "summary": lambda args: self.system.summary.to_dict(),
+            "get": self.get,
+            "search": self.search,
+            "filter": self.filter,
+            "list": lambda args: _page(self.system.patients, args),
+            "sorted": self.sorted,
+            "quote": self.quote,
+        }
+        self.writes = {"allocate", "register", "bill", "history"}
+
+    # --- reads ---
+
+    def stats(self, args: Dict) -> Dict:
+        return {"patients": len(self.system.patients), "connections": self.connections,
+                "requests": self.requests, "queued": self.queue.qsize() if self.queue else 0}
+
+    def doctors(self, args: Dict) -> List[Dict]:
+        return [{"doctor_id": d.doctor_id, "name": d.name, "department": d.department}
+                for d in self.system.doctors]
+
+    def get(self, args: Dict) -> Optional[Dict]:
+        patient = self.system.patients.get(_text_arg(args, "patient_id"))
+        return patient_to_dict(patient) if patient is not None else None
+
+    def search(self, args: Dict) -> Dict:
+        patients = self.system.patients
+        name = _text_arg(args, "name") if args.get("mode") != "range" else (args.get("name") or None)
+        mode = args.get("mode", "substring")
+        if mode == "substring":
+            found = patients.search_name(name)
+        elif mode == "fuzzy":
+            found = patients.search_name_fuzzy(name, limit=_limit(args, 10))
+        elif mode == "exact":
+            found = patients.find_by_name(name)
+        elif mode == "prefix":
+            found = patients.find_by_name_prefix(name)
+        elif mode == "range":
+            found = patients.find_by_name_range(name, args.get("end") or None)
+        else:
+            raise DeskError(f"unknown search mode {mode!r}")
+        return _page(found, args)
+
+    def filter(self, args: Dict) -> Dict:
+        return _page(self.system.patients.filter(args.get("expression") or ""), args)
+
+    async def sorted(self, args: Dict) -> Dict:
+        keys = tuple(args.get("keys") or ["name"])
+        sorter = self.system.sorter
+        try:
+            view = sorter.cached(keys)
+            if view is None:
+                view = await asyncio.get_running_loop().run_in_executor(self.index_thread, sorter.sorted, keys)
+        except KeyError as e:
+            raise DeskError(e.args[0]) from None
+        return _page(view, args)
+
+    def _bill(self, patient) -> Dict:
+        rules = self.system.billing_system.rules
+        total, discounted = rules.bill(patient)
+        return {"patient_id": patient.patient_id, "total": total, "discounted": discounted,
+                "services": [list(item) for item in rules.services_for(patient)], "price_version": rules.version}
+
+    def quote(self, args: Dict) -> Dict:
+        patient_id = _text_arg(args, "patient_id")
+        patient = self.system.patients.get(patient_id)
+        if patient is None:
+            raise DeskError(f"patient {patient_id} not found")
+        return self._bill(patient)
+
+    # --- writes ---
+
+    async def submit(self, op: str, args: Dict):
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait(_WriteJob(op, args, future))
+        return await future
+
+    async def _write_loop(self):
+        while True:
+            jobs = [await self.queue.get()]
+            while len(jobs) < self.max_batch and not self.queue.empty():
+                jobs.append(self.queue.get_nowait())
+            try:
+                await self._commit(jobs)
+            except Exception as e:
+                # Nothing in a failed batch is reported as stored
+                for job in jobs:
+                    if not job.future.done():
+                        job.future.set_exception(DeskError(f"write failed: {e}"))
+            finally:
+                for _ in jobs:
+                    self.queue.task_done()
+
+    def _fail(self, job: _WriteJob, message: str):
+        job.future.set_exception(DeskError(message))
+
+    async def _commit(self, jobs: List[_WriteJob]):
+        loop = asyncio.get_running_loop()
+        system = self.system
+        wanted = 0
+        for job in jobs:
+            if job.op == "allocate":
+                count = job.args.get("count", 1)
+                if not isinstance(count, int) or not 1 <= count <= MAX_ALLOCATE:
+                    self._fail(job, f"count must be between 1 and {MAX_ALLOCATE}")
+                    continue
+                wanted += count
+            elif job.op == "register" and not job.args.get("patient_id"):
+                wanted += 1
+        ids = iter(await loop.run_in_executor(self.storage_thread, system.id_allocator.allocate, wanted)
+                   if wanted else ())
+
+        # Validate and bill on the loop thread; nothing is visible yet
+        new_patients = []
+        pending: Dict[str, object] = {}  # registered in this batch, by ID
+        payments = []
+        history = []
+        allocated = []
+        for job in jobs:
+            if job.future.done():
+                continue
+            try:
+                if job.op == "allocate":
+                    job.result = {"ids": list(islice(ids, job.args.get("count", 1)))}
+                    allocated += job.result["ids"]
+                elif job.op == "register":
+                    patient, method, _ = validate_admission(job.args, system.doctors)
+                    patient_id = job.args.get("patient_id")
+                    if patient_id:
+                        patient_id = str(patient_id)
+                        if system.patients.get(patient_id) is not None or patient_id in pending:
+                            raise DeskError(f"patient {patient_id} already exists")
+                        if patient_id not in self.issued:
+                            raise DeskError(f"patient_id {patient_id} was not allocated by this server")
+                    patient.patient_id = patient_id or next(ids)
+                    pending[patient.patient_id] = patient
+                    new_patients.append(patient)
+                    bill = self._bill(patient)
+                    if method:
+                        payments.append((patient.patient_id, tuple(map(tuple, bill["services"])),
+                                         bill["total"], bill["discounted"], method, bill["price_version"]))
+                    job.result = {"patient": patient_to_dict(patient), "total": bill["total"],
+                                  "discounted": bill["discounted"], "payment_method": method,
+                                  "price_version": bill["price_version"]}
+                elif job.op == "bill":
+                    patient_id = _text_arg(job.args, "patient_id")
+                    patient = pending.get(patient_id) or system.patients.get(patient_id)
+                    if patient is None:
+                        raise DeskError(f"patient {patient_id} not found")
+                    method = validate_input(str(job.args.get("payment_method") or "").lower(), "choice",
+                                            PAYMENT_METHODS)
+                    job.result = dict(self._bill(patient), payment_method=method)
+                    payments.append((patient_id, tuple(map(tuple, job.result["services"])),
+                                     job.result["total"], job.result["discounted"], method,
+                                     job.result["price_version"]))
+                elif job.op == "history":
+                    offset = job.args.get("offset", 0)
+                    if not isinstance(offset, int) or offset < 0:
+                        raise DeskError("offset must be a non-negative integer")
+                    filters = {key: job.args.get(key) or None for key in ("patient_id", "date_from", "date_to")}
+                    method = job.args.get("payment_method")
+                    filters["payment_method"] = str(method).lower() if method else None
+                    job.result = (filters, offset, _limit(job.args))
+                    history.append(job)
+            except (DeskError, ValueError) as e:
+                self._fail(job, str(e))
+
+        await loop.run_in_executor(self.storage_thread, self._persist, new_patients, payments, history)
+        # Only a stored batch uses up its IDs (a failed one can be retried with them)
+        self.issued.update(allocated)
+        self.issued.difference_update(patient.patient_id for patient in new_patients)
+
+        if new_patients:
+            await loop.run_in_executor(self.index_thread, self._publish, new_patients)
+            METRICS.inc("patients_registered_total", len(new_patients))
+            METRICS.set("patients", len(system.patients))
+        for job in jobs:
+            if job.future.done():
+                continue
+            if isinstance(job.result, Exception):
+                job.future.set_exception(job.result)
+            else:
+                job.future.set_result(job.result)
+
+    def _publish(self, patients: List):
+        """Index thread: make a stored batch visible to every read at once."""
+        system = self.system
+        with system.patients.lock.write():
+            for patient in patients:
+                system.patients.add(patient)
+                system.summary.add(patient)
+
+    def _persist(self, patients: List, payments: List, history: List[_WriteJob]):
+        """Storage thread: one write per kind and one flush for the whole batch, then the history reads."""
+        storage = self.system.storage
+        if patients:
+            with METRICS.timer("operation_seconds", op="save_patient"):
+                storage.add_patients(patients)
+        if payments:
+            self.system.billing_system.save_payments(payments)
+        storage.flush()
+        for job in history:
+            filters, offset, limit = job.result
+            try:
+                has_payments = storage.has_payments()
+                rows = list(islice(storage.iter_payments(**filters), offset, offset + limit)) if has_payments else []
+                job.result = {"has_payments": has_payments, "rows": rows}
+            except (OSError, ValueError) as e:
+                job.result = DeskError(f"could not read the payment history: {e}")
+
+    # --- connections ---
+
+    async def _answer(self, line: bytes, writer: asyncio.StreamWriter, write_lock: asyncio.Lock,
+                      in_flight: asyncio.Semaphore):
+        request_id = None
+        try:
+            try:
+                request = decode(line)
+                request_id = request.get("id")
+                op = request.get("op")
+                args = request.get("args") or {}
+                if not isinstance(args, dict):
+                    raise DeskError("args must be an object")
+                with METRICS.timer("desk_request_seconds", op=str(op)):
+                    if op in self.reads:
+                        result = self.reads[op](args)
+                        if asyncio.iscoroutine(result):
+                            result = await result
+                    elif op in self.writes:
+                        result = await self.submit(op, args)
+                    else:
+                        raise DeskError(f"unknown op {op!r}")
+                response = {"id": request_id, "ok": True, "result": result}
+            except (DeskError, ValueError) as e:
+                response = {"id": request_id, "ok": False, "error": str(e)}
+            except Exception as e:
+                print(f"Error handling request {request_id!r}: {e!r}", file=sys.stderr)
+                response = {"id": request_id, "ok": False, "error": f"internal error: {e}"}
+            async with write_lock:
+                writer.write(encode(response))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.requests += 1
+            in_flight.release()
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        write_lock = asyncio.Lock()
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        tasks = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, ValueError):
+                    break  # reset, or a line over MAX_LINE
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                await in_flight.acquire()
+                task = asyncio.create_task(self._answer(line, writer, write_lock, in_flight))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    def warm_up(self):
+        """Load everything a request can touch, and build the lazy indexes, before accepting connections."""
+        system = self.system
+        system.patients, system.doctors, system.billing_system, system.summary, system.id_allocator
+        system.patients.trigrams, system.patients.bitmaps, system.sorter
+
+    async def start(self, address: str):
+        self.warm_up()
+        self.queue = asyncio.Queue()
+        self._writer = asyncio.create_task(self._write_loop())
+        kind, host, port = parse_address(address)
+        if kind == "unix":
+            if os.path.exists(host):
+                os.unlink(host)  # stale socket from a previous run
+            return await asyncio.start_unix_server(self._serve_client, host, limit=MAX_LINE)
+        return await asyncio.start_server(self._serve_client, host, port, limit=MAX_LINE)
+
+    async def run(self, address: str):
+        server = await self.start(address)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # e.g. Windows: Ctrl+C still raises KeyboardInterrupt
+        print(f"Desk server listening on {address} ({len(self.system.patients)} patients)")
+        await stop.wait()
+        server.close()
+        await self.queue.join()
+        self._writer.cancel()
+        await loop.run_in_executor(self.storage_thread, self.system.close)
+        self.storage_thread.shutdown()
+        self.index_thread.shutdown()
+        print("Desk server stopped.")
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Serve one shared HospitalSystem to every desk")
+    parser.add_argument("--listen", default=os.environ.get(ENV_SERVER) or DEFAULT_ADDRESS,
+                        help=f"host:port or unix:/path (default: ${ENV_SERVER} or {DEFAULT_ADDRESS})")
+    args = parser.parse_args(argv)
+    try:
+        parse_address(args.listen)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    METRICS.start()
+    try:
+        asyncio.run(DeskServer().run(args.listen))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
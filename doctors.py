@@ -1,32 +1,98 @@
 import csv
-from typing import Dict, List
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from patient import Doctor
 
-def load_doctors(file="data/doctors.csv") -> Dict[str, List[Dict]]:
+
+def _name_key(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+class DoctorDirectory:
+    """
+    Every doctor, in doctors.csv order, indexed for the front desk:
+    - get(doctor_id): O(1) by DoctorID (patients store only the ID)
+    - in_department(department): that department's doctors, as a tuple
+    - find_by_name(name): case- and whitespace-insensitive exact match
+    - departments: tuple of department names in first-seen order, for the menus
+    Duplicate DoctorIDs keep the first row and are counted in a warning.
+    """
+
+    def __init__(self, doctors: Iterable[Doctor] = ()):
+        self._doctors: List[Doctor] = []
+        self._by_id: Dict[str, Doctor] = {}
+        self._by_department: Dict[str, Tuple[Doctor, ...]] = {}
+        self._by_name: Dict[str, Tuple[Doctor, ...]] = {}
+        self.departments: Tuple[str, ...] = ()
+        self.duplicates = 0
+        for doctor in doctors:
+            self.add(doctor)
+
+    def add(self, doctor: Doctor) -> bool:
+        """Index a doctor; returns False (and ignores it) if the ID is already taken."""
+        if doctor.doctor_id in self._by_id:
+            self.duplicates += 1
+            return False
+        doctor.doctor_id = sys.intern(doctor.doctor_id)
+        self._doctors.append(doctor)
+        self._by_id[doctor.doctor_id] = doctor
+        department = doctor.department
+        if department not in self._by_department:
+            self.departments += (department,)
+        self._by_department[department] = self._by_department.get(department, ()) + (doctor,)
+        key = _name_key(doctor.name)
+        self._by_name[key] = self._by_name.get(key, ()) + (doctor,)
+        return True
+
+    def get(self, doctor_id: Optional[str]) -> Optional[Doctor]:
+        return self._by_id.get(doctor_id)
+
+    def in_department(self, department: str) -> Tuple[Doctor, ...]:
+        return self._by_department.get(department, ())
+
+    def find_by_name(self, name: str) -> List[Doctor]:
+        return list(self._by_name.get(_name_key(name), ()))
+
+    def name_of(self, doctor_id: Optional[str]) -> str:
+        """DoctorName for an ID, "" when unknown (e.g. a doctor since removed from the CSV)."""
+        doctor = self._by_id.get(doctor_id)
+        return doctor.name if doctor is not None else ""
+
+    def __contains__(self, doctor_id) -> bool:
+        return doctor_id in self._by_id
+
+    def __len__(self) -> int:
+        return len(self._doctors)
+
+    def __iter__(self) -> Iterator[Doctor]:
+        return iter(self._doctors)
+
+
+def load_doctors(file="data/doctors.csv", storage=None) -> DoctorDirectory:
     """
-    Returns a dict mapping Department -> list of doctors:
-      { "Cardiology": [ { "DoctorID": "D001", "DoctorName": "Alice Hart" }, ... ], ... }
+    Returns a DoctorDirectory of every doctor (see DoctorDirectory for the lookups).
+    Read from `storage` (a storage.StorageBackend) when given, else from the CSV file.
     """
-    doctors_by_dept = {}
-    
+    if storage is not None:
+        return storage.load_doctors()
+    return read_doctors_csv(file)
+
+def read_doctors_csv(file="data/doctors.csv") -> DoctorDirectory:
+    """load_doctors() for the CSV file itself (columns DoctorID, DoctorName, Department)."""
+    directory = DoctorDirectory()
+
     try:
         with open(file, 'r', newline='') as csvfile:
             reader = csv.DictReader(csvfile)
             for row in reader:
-                department = row["Department"]
-                doctor_info = {
-                    "DoctorID": row["DoctorID"],
-                    "DoctorName": row["DoctorName"]
-                }
-                
-                if department not in doctors_by_dept:
-                    doctors_by_dept[department] = []
-                    
-                doctors_by_dept[department].append(doctor_info)
-        
-        if not doctors_by_dept:
+                directory.add(Doctor(row["DoctorID"], row["DoctorName"], row["Department"]))
+
+        if not directory:
             print(f"Warning: No doctors found in {file}. Please check the file format.")
-            
-        return doctors_by_dept
+        if directory.duplicates:
+            print(f"Warning: ignored {directory.duplicates} duplicate DoctorID row(s) in {file}.")
+
+        return directory
     except FileNotFoundError:
         print(f"Warning: {file} not found. Please create this file with DoctorID, DoctorName, Department columns.")
-        return {}
\ No newline at end of file
+        return DoctorDirectory()
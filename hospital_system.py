@@ -1,23 +1,117 @@
-from utilities import get_valid_input, load_patients_from_csv, save_patient_to_csv, pandas_patient_summary
+import sys
+from startup_profile import StartupProfiler, phase
+
+# Installed before the application imports below so --profile-startup sees them
+PROFILER = StartupProfiler.from_argv(sys.argv) if __name__ == "__main__" else None
+
+from concurrency import locked_cached_property
+from utilities import get_valid_input
 from billing import BillingSystem
-from doctors import load_doctors
+from snapshot import HospitalState
+from doctors import DoctorDirectory
+from storage import StorageBackend, open_storage
 from patient import Patient
+from registry import PatientRegistry
+from sorting import SortService, compare_sort_performance
+from id_allocator import PatientIdAllocator
+from money import format_cents
+from summary import PatientSummary
+from metrics import METRICS
+from service_catalog import watch_interval
+import os
 import random
+import shutil
 
 class HospitalSystem:
-    def __init__(self):
-        # Initialize the BillingSystem first (needed for patient registration)
-        self.billing_system = BillingSystem()
-        
-        # Load doctors from CSV
-        self.doctors = load_doctors("data/doctors.csv")
-        if not self.doctors:
+    """
+    Front-desk application. Price list, doctors, patient registry, ID sequence,
+    writers and summary are materialized lazily on first use, so the main menu
+    is shown without loading any data; close() only touches what was loaded.
+    All reads and writes go through a storage backend (storage.open_storage:
+    the CSV files with their binary snapshot by default, or SQLite with
+    HOSPITAL_STORAGE=sqlite). Loads, saves, searches and billing are timed into
+    metrics.METRICS (off unless HOSPITAL_METRICS=1; see Algorithm Tools > Dump Metrics).
+    One instance may be shared by many threads: each lazy part is built once, the
+    registry has a reader-writer lock, each CSV is written by its own thread and
+    bills come from immutable price snapshots (see concurrency.py).
+    """
+
+    def __init__(self, profiler: StartupProfiler = None, storage: StorageBackend = None):
+        self.profiler = profiler
+        self.storage = storage if storage is not None else open_storage()
+
+    @locked_cached_property
+    def state(self) -> HospitalState:
+        # Prices, doctors and patients (CSV backend: the binary snapshot, rebuilt
+        # from the CSVs when they changed)
+        with phase(self.profiler, "load state"), METRICS.timer("operation_seconds", op="load_state"):
+            return self.storage.load_state()
+
+    @locked_cached_property
+    def billing_system(self) -> BillingSystem:
+        services = self.state.services
+        with phase(self.profiler, "load billing"):
+            billing = BillingSystem(storage=self.storage, services=services)
+        # Pick up edits to the price list without a restart ($HOSPITAL_PRICE_WATCH=0: never)
+        billing.catalog.watch(watch_interval())
+        return billing
+
+    @locked_cached_property
+    def doctors(self) -> DoctorDirectory:
+        doctors = self.state.doctors
+        if not doctors:
             print("\nWarning: No doctors found. Please check your doctors.csv file.")
             print("Make sure it has columns: DoctorID, DoctorName, Department")
             print("The file should be located at: data/doctors.csv")
-        
-        # Load patients last, after other systems are ready
-        self.patients = load_patients_from_csv("data/patients.csv")
+        return doctors
+
+    @locked_cached_property
+    def patients(self) -> PatientRegistry:
+        table = self.state.patients
+        with phase(self.profiler, "index patients"), METRICS.timer("operation_seconds", op="index_patients"):
+            registry = PatientRegistry(table)
+        METRICS.set("patients", len(registry))
+        return registry
+
+    @locked_cached_property
+    def sorter(self) -> SortService:
+        # Cached sorted listings, rebuilt only after the registry changes
+        return SortService(self.patients)
+
+    @locked_cached_property
+    def id_allocator(self) -> PatientIdAllocator:
+        # Persistent ID sequence, never behind the highest ID already on file
+        allocator = PatientIdAllocator("data/patients.seq")
+        allocator.reconcile(self.patients.max_id_number)
+        return allocator
+
+    @locked_cached_property
+    def summary(self) -> PatientSummary:
+        # Running report aggregates (CSV backend: restored from their checkpoint)
+        with phase(self.profiler, "load summary"), METRICS.timer("operation_seconds", op="load_summary"):
+            return self.storage.load_summary()
+
+    def register_patient(self, patient: Patient):
+        """Add a new patient to the registry and store it through the backend."""
+        patients, summary = self.patients, self.summary
+        # Registry and report aggregates change together under the write lock
+        with patients.lock.write():
+            patients.add(patient)
+            summary.add(patient)
+        with METRICS.timer("operation_seconds", op="save_patient"):
+            self.storage.add_patient(patient)
+        METRICS.inc("patients_registered_total")
+        METRICS.set("patients", len(self.patients))
+
+    def close(self):
+        """Flush pending writes before exiting, then the final metrics export."""
+        if "billing_system" in vars(self) and self.billing_system.catalog is not None:
+            self.billing_system.catalog.stop()
+        if "summary" in vars(self):
+            with METRICS.timer("operation_seconds", op="save_summary"):
+                self.storage.save_summary(self.summary)
+        self.storage.close()
+        METRICS.stop()
 
     def display_main_menu(self):
         print("\n=== Welcome to Melitina Memorial Hospital ===")
@@ -53,7 +147,7 @@ class HospitalSystem:
         insurance_type = None
         if insurance == 'y':
             insurance_type = get_valid_input("Insurance Type (private/public): ", "choice", ["private", "public"])
-        new_id = f"P{1000 + len(self.patients) + 1}"
+        new_id = self.id_allocator.next_id()
         emergency_patient = Patient(
             patient_id=new_id,
             name=name,
@@ -67,8 +161,7 @@ class HospitalSystem:
             specific_doctor=None,
             insurance_type=insurance_type
         )
-        self.patients.append(emergency_patient)
-        save_patient_to_csv(emergency_patient)
+        self.register_patient(emergency_patient)
         print(f"\nEmergency patient registered with ID: {new_id}")
         print("Patient has been taken to Emergency Services.")
 
@@ -79,7 +172,7 @@ class HospitalSystem:
           - follow_up? (y/n)
           - chronic_condition? (y/n)
           - insurance? (y/n) → private/public
-        Create Patient(...), append & save_patient_to_csv.
+        Create Patient(...) and register_patient() it.
         Process billing immediately for new patients.
         """
         print("\n--- Register New Patient ---")
@@ -89,7 +182,6 @@ class HospitalSystem:
         urgent_care = get_valid_input("Urgent Care Needed (y/n): ", "yes_no")
         
         # Save/copy face image as <name>.jpg if provided
-        import os, shutil
         if face_img_path:
             faces_dir = "faces"
             os.makedirs(faces_dir, exist_ok=True)
@@ -113,7 +205,7 @@ class HospitalSystem:
             insurance_type = None
             if insurance == 'y':
                 insurance_type = get_valid_input("Insurance Type (private/public): ", "choice", ["private", "public"])
-            new_id = f"P{1000 + len(self.patients) + 1}"
+            new_id = self.id_allocator.next_id()
             new_patient = Patient(
                 patient_id=new_id,
                 name=name,
@@ -127,8 +219,7 @@ class HospitalSystem:
                 specific_doctor=None,
                 insurance_type=insurance_type
             )
-            self.patients.append(new_patient)
-            save_patient_to_csv(new_patient)
+            self.register_patient(new_patient)
             print(f"\nPatient registered successfully with ID: {new_id}")
             room_number = random.randint(100, 199)
             print(f"Please proceed to Room #{room_number} for your checkup.")
@@ -150,7 +241,7 @@ class HospitalSystem:
                 else:
                     # Display departments
                     print("\nAvailable Departments:")
-                    departments = list(self.doctors.keys())
+                    departments = self.doctors.departments
                     for i, dept in enumerate(departments, 1):
                         print(f"{i}. {dept}")
                         
@@ -159,20 +250,17 @@ class HospitalSystem:
                     selected_dept = departments[dept_choice - 1]
                     
                     # Display doctors in selected department
-                    doctors_in_dept = self.doctors[selected_dept]
+                    doctors_in_dept = self.doctors.in_department(selected_dept)
                     print(f"\nDoctors in {selected_dept}:")
                     for i, doctor in enumerate(doctors_in_dept, 1):
-                        print(f"{i}. {doctor['DoctorName']} ({doctor['DoctorID']})")
+                        print(f"{i}. {doctor.name} ({doctor.doctor_id})")
                         
                     # Choose doctor
                     doctor_choice = get_valid_input("Select Doctor (number): ", "number", [1, len(doctors_in_dept)])
                     selected_doctor = doctors_in_dept[doctor_choice - 1]
                     
-                    # Set specific doctor
-                    specific_doctor = {
-                        "DoctorID": selected_doctor["DoctorID"],
-                        "DoctorName": selected_doctor["DoctorName"]
-                    }
+                    # Patients keep only the DoctorID (resolved through self.doctors)
+                    specific_doctor = selected_doctor.doctor_id
                     
         follow_up = get_valid_input("Follow-up Appointment (y/n): ", "yes_no")
         chronic_condition = get_valid_input("Has Chronic Condition (y/n): ", "yes_no")
@@ -182,7 +270,7 @@ class HospitalSystem:
             insurance_type = get_valid_input("Insurance Type (private/public): ", "choice", ["private", "public"])
         
         # Generate a new patient ID
-        new_id = f"P{1000 + len(self.patients) + 1}"
+        new_id = self.id_allocator.next_id()
         
         # Create patient
         new_patient = Patient(
@@ -200,8 +288,7 @@ class HospitalSystem:
         )
         
         # Add to patients list and save
-        self.patients.append(new_patient)
-        save_patient_to_csv(new_patient)
+        self.register_patient(new_patient)
         
         print(f"\nPatient registered successfully with ID: {new_id}")
         
@@ -223,27 +310,12 @@ class HospitalSystem:
         for patient in self.patients:
             print(patient)
 
-    def search_patient_by_name(self):
-        """Prefix search on patient.name."""
-        if not self.patients:
-            print("\nNo patients in the system.")
-            return
-            
-        search_term = get_valid_input("\nEnter name to search: ", "text").lower()
-        
-        found_patients = [p for p in self.patients if search_term in p.name.lower()]
-        
-        if not found_patients:
-            print("No patients found matching that name.")
-        else:
-            print("\n=== Matching Patients ===")
-            for patient in found_patients:
-                print(patient)
-
     def run(self):
         """Loop display_main_menu → call correct submenu or exit."""
         while True:
             self.display_main_menu()
+            if self.profiler is not None:
+                self.profiler.report()
             try:
                 choice = get_valid_input("Enter your choice (1-5): ", "number", [1, 5])
             except Exception as e:
@@ -256,11 +328,13 @@ class HospitalSystem:
             elif choice == 3:
                 self.run_algorithm_tools()
             elif choice == 4:
+                # qrcode is only imported when this option is used
                 from qr_cool import show_qr
                 show_qr()
                 input("\nPress Enter to return to the menu...")
             elif choice == 5:
                 print("\nThank you for using Melitina Memorial Hospital System.")
+                self.close()
                 break
 
     def run_algorithm_tools(self):
@@ -268,70 +342,66 @@ class HospitalSystem:
         while True:
             print("\n=== Algorithm Tools ===")
             print("1. Show Patient Summary Report")
-            print("2. Bubble Sort Patients by Age")
-            print("3. Merge Sort Patients by Name")
-            print("4. Linear Search Patient by ID")
+            print("2. Sort Patients by Age")
+            print("3. Sort Patients by Name")
+            print("4. Search Patient by ID")
             print("5. Binary Search Patient by Name")
-            print("6. Filter Patients (Truth Table)")
+            print("6. Filter Patients")
             print("7. Compare Sort Performance")
-            print("8. Return to Main Menu")
-            choice = get_valid_input("Choose option (1-8): ", "number", [1, 8])
+            print("8. Dump Metrics")
+            print("9. Return to Main Menu")
+            choice = get_valid_input("Choose option (1-9): ", "number", [1, 9])
             if choice == 1:
-                from utilities import pandas_patient_summary
-                pandas_patient_summary()
+                self.summary.print_report()
+                verify = get_valid_input("Run full pandas recompute to verify (with charts)? (y/n): ", "yes_no")
+                if verify == 'y':
+                    self.storage.pandas_summary()
             elif choice == 2:
-                from utilities import bubble_sort_patients_by_age
-                sorted_patients = bubble_sort_patients_by_age(self.patients)
-                print("\nSorted by Age (Bubble Sort):")
-                for p in sorted_patients:
+                print("\nSorted by Age (then Name):")
+                for p in self.sorter.sorted(("age", "name")):
                     print(p)
             elif choice == 3:
-                from utilities import merge_sort_patients_by_name
-                sorted_patients = merge_sort_patients_by_name(self.patients)
-                print("\nSorted by Name (Merge Sort):")
-                for p in sorted_patients:
+                print("\nSorted by Name (then Age):")
+                for p in self.sorter.sorted(("name", "age")):
                     print(p)
             elif choice == 4:
                 pid = get_valid_input("Enter patient ID: ", "text")
-                from utilities import linear_search_patient_by_id
-                patient = linear_search_patient_by_id(self.patients, pid)
+                patient = self.patients.get(pid.strip())
                 print(str(patient) if patient else "Not found.")
             elif choice == 5:
-                name = get_valid_input("Enter patient name: ", "text")
-                from utilities import merge_sort_patients_by_name, binary_search_patient_by_name
-                sorted_patients = merge_sort_patients_by_name(self.patients)
-                patient = binary_search_patient_by_name(sorted_patients, name)
-                print(str(patient) if patient else "Not found.")
+                # Binary search over the registry's maintained name index:
+                # "name" = exact, "pre*" = prefix, "from..to" = inclusive range
+                query = get_valid_input("Enter patient name (name, prefix* or from..to): ", "text").strip()
+                if ".." in query:
+                    start, _, end = query.partition("..")
+                    matches = self.patients.find_by_name_range(start or None, end or None)
+                elif query.endswith("*"):
+                    matches = self.patients.find_by_name_prefix(query[:-1])
+                else:
+                    matches = self.patients.find_by_name(query)
+                if not matches:
+                    print("Not found.")
+                for p in matches:
+                    print(p)
             elif choice == 6:
-                # Get 'urgent' input and validate it
+                # Boolean filter over the registry's bitmap index
+                print("Fields: " + ", ".join(self.patients.INDEXED_FIELDS))
+                print("e.g. urgent_care AND NOT insurance, (age_group=elderly OR chronic_condition) AND insurance_type=public")
                 while True:
-                    urgent = input("Urgent care? (y/n, press Enter to leave blank): ").strip().lower()
-                    if urgent == '':
-                        urgent = None
-                        break
-                    elif urgent in ['y', 'n']:
-                        break
-                    else:
-                        print("Please input valid option: 'y', 'n' or just press Enter to leave blank.")
-                # Get 'insured' input and validate it
-                while True:
-                    insured = input("Insured? (y/n, press Enter to leave blank): ").strip().lower()
-                    if insured == '':
-                        insured = None
-                        break
-                    elif insured in ['y', 'n']:
+                    expression = input("Filter (Enter for all patients): ").strip()
+                    try:
+                        count = self.patients.count(expression)
                         break
-                    else:
-                        print("Please input valid option: 'y', 'n' or just press Enter to leave blank.")
-                from utilities import filter_patients_truth_table
-                filtered = filter_patients_truth_table(self.patients, urgent, insured)
-                print("\nFiltered Patients:")
-                for p in filtered:
+                    except ValueError as e:
+                        print(f"Invalid filter: {e}")
+                print(f"\nFiltered Patients ({count}):")
+                for p in self.patients.filter(expression):
                     print(p)
             elif choice == 7:
-                from utilities import compare_sort_performance
                 compare_sort_performance(self.patients)
             elif choice == 8:
+                METRICS.dump()
+            elif choice == 9:
                 break
 
     def run_patient_services(self):
@@ -342,7 +412,7 @@ class HospitalSystem:
             if choice == 1:                
                 name = get_valid_input("Enter patient name: ", "text")
                 age = get_valid_input("Enter patient age: ", "number", [0, 120])
-                patient_id = f"P{1000 + len(self.patients) + 1}"
+                patient_id = self.id_allocator.next_id()
                 insurance = None
                 insurance_type = None
                 urgent_care = get_valid_input("Needs urgent care? (y/n): ", "yes_no")
@@ -350,20 +420,20 @@ class HospitalSystem:
                 specific_doctor = None
                 if specialist_needed == 'y':
                     # Show departments
-                    departments = list(self.doctors.keys())
+                    departments = self.doctors.departments
                     print("\nAvailable Departments:")
                     for i, dept in enumerate(departments, 1):
                         print(f"{i}. {dept}")
                     dept_choice = get_valid_input("Select Department (number): ", "number", [1, len(departments)])
                     selected_dept = departments[dept_choice - 1]
                     # Show doctors
-                    doctors_in_dept = self.doctors[selected_dept]
+                    doctors_in_dept = self.doctors.in_department(selected_dept)
                     print(f"\nDoctors in {selected_dept}:")
                     for i, doctor in enumerate(doctors_in_dept, 1):
-                        print(f"{i}. {doctor['DoctorName']} ({doctor['DoctorID']})")
+                        print(f"{i}. {doctor.name} ({doctor.doctor_id})")
                     doc_choice = get_valid_input("Select Doctor (number): ", "number", [1, len(doctors_in_dept)])
                     selected_doctor = doctors_in_dept[doc_choice - 1]
-                    specific_doctor = selected_doctor
+                    specific_doctor = selected_doctor.doctor_id
                 regular_checkup = get_valid_input("Needs regular checkup? (y/n): ", "yes_no")
                 follow_up = get_valid_input("Needs follow up? (y/n): ", "yes_no")
                 chronic_condition = get_valid_input("Chronic condition? (y/n): ", "yes_no")
@@ -371,7 +441,6 @@ class HospitalSystem:
                 insurance_type = None
                 if insurance == 'y':
                     insurance_type = get_valid_input("Insurance Type (private/public): ", "choice", ["private", "public"])
-                from patient import Patient
                 new_patient = Patient(
                     patient_id=patient_id,
                     name=name,
@@ -385,17 +454,16 @@ class HospitalSystem:
                     specific_doctor=specific_doctor,
                     insurance_type=insurance_type
                 )
-                self.patients.append(new_patient)
-                from utilities import save_patient_to_csv
-                save_patient_to_csv(new_patient)
+                self.register_patient(new_patient)
                 print(f"Patient {name} registered with ID {patient_id}.")
 
-                # Calculate and display billing
-                total, discounted = self.billing_system.calculate_patient_bill(new_patient)
+                # Calculate and display billing (one price list version for the whole bill)
+                rules = self.billing_system.rules
+                total, discounted = self.billing_system.calculate_patient_bill(new_patient, rules)
                 if insurance_type:
-                    print(f"The total is €{total:.2f} but with {insurance_type} insurance reduction it is: €{discounted:.2f}")
+                    print(f"The total is €{format_cents(total)} but with {insurance_type} insurance reduction it is: €{format_cents(discounted)}")
                 else:
-                    print(f"The total is €{total:.2f}")
+                    print(f"The total is €{format_cents(total)}")
 
                 # Prompt for payment method
                 payment_method = ""
@@ -403,13 +471,14 @@ class HospitalSystem:
                     payment_method = get_valid_input("Payment method (cash/card): ", "choice", ["cash", "card"])
 
                 # Process payment via billing system
-                self.billing_system.process_payment_for_patient(new_patient, total, discounted, payment_method)
+                self.billing_system.process_payment_for_patient(new_patient, total, discounted, payment_method,
+                                                                rules)
                 # Calculate billing
-                total, discounted = self.billing_system.calculate_patient_bill(new_patient)
+                total, discounted = self.billing_system.calculate_patient_bill(new_patient, rules)
                 if insurance_type:
-                    print(f"The total is €{total:.2f} but with {insurance_type} insurance reduction it is: €{discounted:.2f}")
+                    print(f"The total is €{format_cents(total)} but with {insurance_type} insurance reduction it is: €{format_cents(discounted)}")
                 else:
-                    print(f"The total is €{total:.2f}")
+                    print(f"The total is €{format_cents(total)}")
                 return
 
             elif choice == 2:
@@ -424,167 +493,42 @@ class HospitalSystem:
                 break
 
     def search_patient_by_name(self):
-        """Prefix search on patient.name."""
+        """
+        Substring search on patient.name through the registry's trigram index;
+        when nothing contains the term, offer the closest (typo-tolerant) matches.
+        """
         if not self.patients:
             print("\nNo patients in the system.")
             return
-        search_term = get_valid_input("\nEnter name to search: ", "text").lower()
-        found_patients = [p for p in self.patients if search_term in p.name.lower()]
-        if not found_patients:
-            print("No patients found matching that name.")
-        else:
+        search_term = get_valid_input("\nEnter name to search: ", "text")
+        found_patients = self.patients.search_name(search_term)
+        if found_patients:
             print("\n=== Matching Patients ===")
             for patient in found_patients:
                 print(patient)
-
-def run(self):
-    """Loop display_main_menu → call correct submenu or exit."""
-    while True:
-        self.display_main_menu()
-        try:
-            choice = get_valid_input("Enter your choice (1-5): ", "number", [1, 5])
-        except Exception as e:
-            print(f"Input error: {e}")
-            continue
-        if choice == 1:
-            self.run_patient_services()
-        elif choice == 2:
-            self.handle_emergency()
-            print("3. By Insurance Type")
-            filter_choice = get_valid_input("Choose filter (1-3): ", "number", [1, 3])
-            if filter_choice == 1:
-                from utilities import print_age_group_summary
-                print_age_group_summary(self.patients)
-            elif filter_choice == 2:
-                from utilities import print_urgency_group_summary
-                print_urgency_group_summary(self.patients)
-            elif filter_choice == 3:
-                insurance_type = get_valid_input("Insurance type (private/public): ", "choice", ["private", "public"])
-                from utilities import print_insurance_group_summary
-        elif choice == 3:
-            self.run_algorithm_tools()
-        elif choice == 4:
-            from qr_cool import show_qr
-            show_qr()
-            input("\nPress Enter to return to the menu...")
-        elif choice == 5:
-            print("\nThank you for using Melitina Memorial Hospital System.")
-            break
-
-def run_algorithm_tools(self):
-    """Display algorithm tools submenu and handle actions."""
-    while True:
-        print("\n=== Algorithm Tools ===")
-        print("1. Show Patient Age Group Summary")
-        print("2. Return to Main Menu")
-        algo_choice = get_valid_input("Choose option (1-2): ", "number", [1, 2])
-        if algo_choice == 1:
-            pandas_patient_summary()
-        elif algo_choice == 2:
-            break
-
-def run_patient_services(self):
-    """Handle patient services submenu"""
-    while True:
-        self.display_patient_services_menu()
-        choice = get_valid_input("Choose option (1-6): ", "number", [1, 6])
-        if choice == 1:                
-            name = get_valid_input("Enter patient name: ", "text")
-            age = get_valid_input("Enter patient age: ", "number", [0, 120])
-            patient_id = f"P{1000 + len(self.patients) + 1}"
-            insurance = None
-            insurance_type = None
-            urgent_care = get_valid_input("Needs urgent care? (y/n): ", "yes_no")
-            specialist_needed = get_valid_input("Needs specialist? (y/n): ", "yes_no")
-            specific_doctor = None
-            if specialist_needed == 'y':
-                # Show departments
-                departments = list(self.doctors.keys())
-                print("\nAvailable Departments:")
-                for i, dept in enumerate(departments, 1):
-                    print(f"{i}. {dept}")
-                dept_choice = get_valid_input("Select Department (number): ", "number", [1, len(departments)])
-                selected_dept = departments[dept_choice - 1]
-                # Show doctors
-                doctors_in_dept = self.doctors[selected_dept]
-                print(f"\nDoctors in {selected_dept}:")
-                for i, doctor in enumerate(doctors_in_dept, 1):
-                    print(f"{i}. {doctor['DoctorName']} ({doctor['DoctorID']})")
-                doc_choice = get_valid_input("Select Doctor (number): ", "number", [1, len(doctors_in_dept)])
-                selected_doctor = doctors_in_dept[doc_choice - 1]
-                specific_doctor = selected_doctor
-            regular_checkup = get_valid_input("Needs regular checkup? (y/n): ", "yes_no")
-            follow_up = get_valid_input("Needs follow up? (y/n): ", "yes_no")
-            chronic_condition = get_valid_input("Chronic condition? (y/n): ", "yes_no")
-            insurance = get_valid_input("Has insurance? (y/n): ", "yes_no")
-            insurance_type = None
-            if insurance == 'y':
-                insurance_type = get_valid_input("Insurance Type (private/public): ", "choice", ["private", "public"])
-            from patient import Patient
-            new_patient = Patient(
-                patient_id=patient_id,
-                name=name,
-                age=age,
-                urgent_care=urgent_care,
-                specialist_needed=specialist_needed,
-                regular_checkup=regular_checkup,
-                follow_up=follow_up,
-                insurance=insurance,
-                chronic_condition=chronic_condition,
-                specific_doctor=specific_doctor,
-                insurance_type=insurance_type
-            )
-            self.patients.append(new_patient)
-            from utilities import save_patient_to_csv
-            save_patient_to_csv(new_patient)
-            print(f"Patient {name} registered with ID {patient_id}.")
-
-            # Calculate and display billing
-            total, discounted = self.billing_system.calculate_patient_bill(new_patient)
-            if insurance_type:
-                print(f"The total is €{total:.2f} but with {insurance_type} insurance reduction it is: €{discounted:.2f}")
-            else:
-                print(f"The total is €{total:.2f}")
-
-            # Prompt for payment method
-            payment_method = ""
-            while payment_method.lower() not in ['cash', 'card']:
-                payment_method = get_valid_input("Payment method (cash/card): ", "choice", ["cash", "card"])
-
-            # Process payment via billing system
-            self.billing_system.process_payment_for_patient(new_patient, total, discounted, payment_method)
-            # Calculate billing
-            total, discounted = self.billing_system.calculate_patient_bill(new_patient)
-            if insurance_type:
-                print(f"The total is €{total:.2f} but with {insurance_type} insurance reduction it is: €{discounted:.2f}")
-            else:
-                print(f"The total is €{total:.2f}")
             return
+        suggestions = self.patients.search_name_fuzzy(search_term, limit=5)
+        if not suggestions:
+            print("No patients found matching that name.")
+        else:
+            print("\nNo exact match. Did you mean:")
+            for patient in suggestions:
+                print(patient)
 
-        elif choice == 2:
-            self.display_all_patients()
-        elif choice == 3:
-            self.search_patient_by_name()
-        elif choice == 4:
-            self.billing_system.process_billing(self.patients)
-        elif choice == 5:
-            self.billing_system.display_payment_history()
-        elif choice == 6:
-            break
-
-def search_patient_by_name(self):
-    """Prefix search on patient.name."""
-    if not self.patients:
-        print("\nNo patients in the system.")
-        return
-    search_term = get_valid_input("\nEnter name to search: ", "text").lower()
-    found_patients = [p for p in self.patients if search_term in p.name.lower()]
-    if not found_patients:
-        print("No patients found matching that name.")
-    else:
-        print("\n=== Matching Patients ===")
-        for patient in found_patients:
-            print(patient)
 
 if __name__ == "__main__":
-    HospitalSystem().run()
\ No newline at end of file
+    METRICS.start()
+    if "--connect" in sys.argv:
+        # Thin client of a shared desk_server instead of the local files
+        from desk_client import DeskClient, DeskClientSystem
+        from desk_protocol import DEFAULT_ADDRESS, ENV_SERVER
+        i = sys.argv.index("--connect")
+        address = sys.argv[i + 1] if i + 1 < len(sys.argv) else os.environ.get(ENV_SERVER) or DEFAULT_ADDRESS
+        try:
+            client = DeskClient(address)
+        except (OSError, ValueError) as e:
+            print(f"Error: cannot connect to the desk server at {address}: {e}")
+            sys.exit(1)
+        DeskClientSystem(client, PROFILER).run()
+    else:
+        HospitalSystem(PROFILER).run()
\ No newline at end of file
@@ -0,0 +1,90 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def parse_patient_id(patient_id: str, prefix: str = "P") -> Optional[int]:
+    """'P1013' -> 1013, anything else -> None."""
+    if patient_id and patient_id.startswith(prefix):
+        number = patient_id[len(prefix):]
+        if number.isdigit():
+            return int(number)
+    return None
+
+
+class PatientIdAllocator:
+    """
+    Monotonic patient ID sequence persisted in a small sequence file next to the data
+    (data/patients.seq holds the last number handed out).
+    - next_id(): lock the file, read the last number, write number + 1, unlock  -> O(1)
+    - reconcile(max_existing): on startup make sure the sequence is never behind the
+      highest ID already in patients.csv (the registry tracks that while loading, so the
+      CSV is not read again)
+    The exclusive file lock makes allocation safe across several front-desk processes;
+    a thread lock in front of it serializes the threads of one process.
+    Other sequences (payment IDs) reuse it with their own seq_path/prefix.
+    """
+
+    def __init__(self, seq_path="data/patients.seq", prefix="P", start=1000):
+        self.seq_path = seq_path
+        self.prefix = prefix
+        self.start = start
+        self._thread_lock = threading.Lock()
+        directory = os.path.dirname(seq_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def _locked(self):
+        # 'a+' creates the file if missing without truncating an existing sequence
+        with self._thread_lock, open(self.seq_path, 'a+') as f:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield f
+            finally:
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _read(self, f) -> int:
+        f.seek(0)
+        content = f.read().strip()
+        return int(content) if content.isdigit() else self.start
+
+    def _write(self, f, value: int):
+        f.seek(0)
+        f.truncate()
+        f.write(str(value))
+        f.flush()
+        os.fsync(f.fileno())
+
+    def reconcile(self, max_existing: Optional[int]):
+        """Move the sequence forward if existing data already uses higher IDs."""
+        if max_existing is None:
+            return
+        with self._locked() as f:
+            if max_existing > self._read(f):
+                self._write(f, max_existing)
+
+    def allocate(self, count: int = 1) -> List[str]:
+        """Reserve `count` consecutive IDs with a single locked update."""
+        with self._locked() as f:
+            last = self._read(f)
+            self._write(f, last + count)
+        return [f"{self.prefix}{n}" for n in range(last + 1, last + count + 1)]
+
+    def next_id(self) -> str:
+        return self.allocate(1)[0]
@@ -0,0 +1,205 @@
+import csv
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from id_allocator import PatientIdAllocator
+from money import format_cents
+from writers import CsvAppendWriter, upgrade_header
+
+# Current payment_history.csv layout: one row per service, payment fields repeated
+LEGACY_FIELDS = ['PatientID', 'Service', 'Cost', 'Total', 'DiscountedTotal', 'PaymentMethod', 'Date']
+# The same plus PriceVersion, the service_catalog version the payment was billed with
+# (empty on older payments). Only used once the file has been migrated on purpose
+# with add_price_version_column(); export_legacy() always writes LEGACY_FIELDS.
+VERSIONED_LEGACY_FIELDS = LEGACY_FIELDS + ['PriceVersion']
+# Normalized layout: one header row per payment plus its service line items
+PAYMENT_FIELDS = ['PaymentID', 'PatientID', 'Total', 'DiscountedTotal', 'PaymentMethod', 'Date', 'PriceVersion']
+ITEM_FIELDS = ['PaymentID', 'Service', 'Cost']
+
+
+def read_header(filepath: str) -> List[str]:
+    """First row of a CSV file ([] if it is missing or empty)."""
+    if not os.path.isfile(filepath):
+        return []
+    with open(filepath, 'r', newline='') as f:
+        return next(csv.reader(f), [])
+
+
+def add_price_version_column(filepath="data/payment_history.csv") -> bool:
+    """
+    One-time migration of a legacy payment_history.csv to VERSIONED_LEGACY_FIELDS
+    (rewrites the file with an empty PriceVersion on every existing row). Run it
+    while nothing is writing the file: `python storage.py add-price-version`.
+    A missing or empty file is created with the versioned header. Returns False
+    if the file already has the column.
+    """
+    if not read_header(filepath):
+        with open(filepath, 'w', newline='') as f:
+            csv.writer(f, lineterminator='\n').writerow(VERSIONED_LEGACY_FIELDS)
+        return True
+    return bool(upgrade_header(filepath, VERSIONED_LEGACY_FIELDS))
+
+
+class DailyDate:
+    """Today's date as "%Y-%m-%d", recomputed only once local midnight has passed."""
+
+    def __init__(self):
+        self._today = ""
+        self._next_midnight = 0.0
+
+    def __call__(self) -> str:
+        now = time.time()
+        if now >= self._next_midnight:
+            today = date.today()
+            self._today = today.isoformat()
+            self._next_midnight = datetime.combine(today + timedelta(days=1), datetime.min.time()).timestamp()
+        return self._today
+
+
+class PaymentLedger:
+    """
+    Long-lived payment history writer shared by all billing paths.
+    Layouts:
+      - "legacy": data/payment_history.csv, one row per service (the format
+        display_payment_history and existing reports read); the price version is
+        only written if the file already has the PriceVersion column (see
+        add_price_version_column), the file is never rewritten on open
+      - "normalized": data/payments.csv (one row per payment) +
+        data/payment_items.csv (one row per service), linked by PaymentID;
+        export_legacy() rebuilds the legacy CSV from them
+    Rows are batched across payments through CsvAppendWriter (one writer thread
+    per file) and the date string is computed once per day. Safe to share between
+    threads: a payment's rows are queued in one call and PaymentIDs are handed
+    out under a lock.
+    """
+
+    def __init__(self, filepath="data/payment_history.csv", layout="legacy",
+                 payments_path="data/payments.csv", items_path="data/payment_items.csv",
+                 max_rows=256, max_delay=1.0):
+        if layout not in ("legacy", "normalized"):
+            raise ValueError(f"Unknown ledger layout: {layout}")
+        self.layout = layout
+        self.filepath = filepath
+        self.payments_path = payments_path
+        self.items_path = items_path
+        self.today = DailyDate()
+        self._writers: List[CsvAppendWriter] = []
+        if layout == "legacy":
+            self.versioned = read_header(filepath) == VERSIONED_LEGACY_FIELDS
+            fields = VERSIONED_LEGACY_FIELDS if self.versioned else LEGACY_FIELDS
+            self._history = CsvAppendWriter(filepath, fields, max_rows, max_delay)
+            self._writers.append(self._history)
+        else:
+            self._payments = CsvAppendWriter(payments_path, PAYMENT_FIELDS, max_rows, max_delay)
+            self._items = CsvAppendWriter(items_path, ITEM_FIELDS, max_rows, max_delay)
+            self._writers += [self._payments, self._items]
+            seq_path = os.path.join(os.path.dirname(payments_path), "payments.seq")
+            self._payment_ids = PatientIdAllocator(seq_path, prefix="PAY", start=0)
+            self._reserved: List[str] = []
+            self._reserve_lock = threading.Lock()
+
+    def _next_payment_id(self) -> str:
+        # Reserve IDs in blocks so the sequence file is touched once per 1000 payments
+        with self._reserve_lock:
+            if not self._reserved:
+                self._reserved = self._payment_ids.allocate(1000)
+                self._reserved.reverse()
+            return self._reserved.pop()
+
+    def record(self, patient_id: str, services_used: Sequence[Tuple[str, int]],
+               total: int, discounted_total: int, payment_method: str,
+               price_version: Optional[str] = None) -> Optional[str]:
+        """Queue one payment (amounts in cents). Returns the PaymentID in the normalized layout."""
+        current_date = self.today()
+        total_str = format_cents(total)
+        discounted_str = format_cents(discounted_total)
+        version = price_version or ''
+        if self.layout == "legacy":
+            tail = (current_date, version) if self.versioned else (current_date,)
+            self._history.write_rows([
+                (patient_id, service, format_cents(cost), total_str, discounted_str, payment_method) + tail
+                for service, cost in services_used
+            ])
+            return None
+        payment_id = self._next_payment_id()
+        self._payments.write_row((payment_id, patient_id, total_str, discounted_str, payment_method, current_date,
+                                  version))
+        self._items.write_rows([(payment_id, service, format_cents(cost)) for service, cost in services_used])
+        return payment_id
+
+    def record_many(self, payments: Sequence[tuple]) -> List[Optional[str]]:
+        """
+        record() for a batch of (patient_id, services_used, total, discounted_total,
+        payment_method[, price_version]): each file gets a single write_rows call, so
+        a large batch goes out in one flush/fsync instead of one per max_rows rows.
+        """
+        current_date = self.today()
+        if self.layout == "legacy":
+            rows = []
+            for patient_id, services_used, total, discounted_total, payment_method, *version in payments:
+                total_str = format_cents(total)
+                discounted_str = format_cents(discounted_total)
+                tail = (current_date, (version[0] or '') if version else '') if self.versioned else (current_date,)
+                rows.extend((patient_id, service, format_cents(cost), total_str, discounted_str, payment_method) + tail
+                            for service, cost in services_used)
+            self._history.write_rows(rows)
+            return [None] * len(payments)
+        payment_ids, payment_rows, item_rows = [], [], []
+        for patient_id, services_used, total, discounted_total, payment_method, *version in payments:
+            payment_id = self._next_payment_id()
+            payment_ids.append(payment_id)
+            payment_rows.append((payment_id, patient_id, format_cents(total), format_cents(discounted_total),
+                                 payment_method, current_date, (version[0] or '') if version else ''))
+            item_rows.extend((payment_id, service, format_cents(cost)) for service, cost in services_used)
+        self._payments.write_rows(payment_rows)
+        self._items.write_rows(item_rows)
+        return payment_ids
+
+    def flush(self):
+        for writer in self._writers:
+            writer.flush()
+
+    def close(self):
+        for writer in self._writers:
+            writer.close()
+
+    def iter_legacy_rows(self) -> Iterator[Dict[str, str]]:
+        """Payment history as legacy-format dict rows, whichever layout is in use."""
+        self.flush()
+        if self.layout == "legacy":
+            if os.path.exists(self.filepath):
+                with open(self.filepath, 'r', newline='') as f:
+                    yield from csv.DictReader(f)
+            return
+        if not os.path.exists(self.payments_path):
+            return
+        with open(self.payments_path, 'r', newline='') as f:
+            payments = {row['PaymentID']: row for row in csv.DictReader(f)}
+        with open(self.items_path, 'r', newline='') as f:
+            for item in csv.DictReader(f):
+                payment = payments.get(item['PaymentID'])
+                if payment is None:
+                    continue
+                yield {
+                    'PatientID': payment['PatientID'],
+                    'Service': item['Service'],
+                    'Cost': item['Cost'],
+                    'Total': payment['Total'],
+                    'DiscountedTotal': payment['DiscountedTotal'],
+                    'PaymentMethod': payment['PaymentMethod'],
+                    'Date': payment['Date'],
+                    'PriceVersion': payment.get('PriceVersion') or '',
+                }
+
+    def export_legacy(self, dest_path: str) -> int:
+        """Write the history in the legacy payment_history.csv format (LEGACY_FIELDS); returns rows written."""
+        count = 0
+        with open(dest_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=LEGACY_FIELDS, lineterminator='\n', extrasaction='ignore')
+            writer.writeheader()
+            for row in self.iter_legacy_rows():
+                writer.writerow(row)
+                count += 1
+        return count
@@ -0,0 +1,402 @@
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+ENV_METRICS = "HOSPITAL_METRICS"
+ENV_METRICS_FILE = "HOSPITAL_METRICS_FILE"
+ENV_METRICS_INTERVAL = "HOSPITAL_METRICS_INTERVAL"
+ENV_CAPTURE = "HOSPITAL_PROFILE_CAPTURE"
+METRICS_PATH = "data/metrics.prom"
+PROFILE_PATH = "data/hospital.pstats"
+EXPORT_INTERVAL = 60.0
+PREFIX = "hospital_"
+
+# Seconds; an interactive kiosk spans sub-millisecond lookups to multi-second loads
+TIME_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# HELP lines of the metrics the application records (others get their name)
+DESCRIPTIONS = {
+    "operation_seconds": "Time spent loading, saving, sorting and billing, by operation",
+    "search_seconds": "Time spent in patient registry searches, by method",
+    "desk_request_seconds": "Time to answer desk server requests, by operation",
+    "patients": "Patients in the registry",
+    "patients_registered_total": "Patients registered in this session",
+    "payments_recorded_total": "Payments stored, by payment method",
+    "payments_billed_cents_total": "Sum of the (discounted) amounts of stored payments, in cents",
+    "price_list_swaps_total": "Price list versions that went live (at start and on reload)",
+    "process_start_time_seconds": "Start time of the process since the Unix epoch",
+    "process_uptime_seconds": "Seconds since the process started",
+    "traced_memory_bytes": "Memory currently traced by tracemalloc",
+    "traced_memory_peak_bytes": "Peak memory traced by tracemalloc",
+}
+
+_NULL_TIMER = nullcontext()
+
+
+class Counter:
+    """Incremented from any thread (worker, storage, desk threads), so += runs under a lock."""
+
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+
+class Histogram:
+    """
+    Per-bucket counts (made cumulative on export), sum and count. observe() and
+    snapshot() share a lock, so concurrent observations are never lost and an
+    export never sees buckets, sum and count from different moments.
+    """
+
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds: Sequence[float] = TIME_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        slot = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[slot] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        """(bucket counts, sum, count) as of one moment."""
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class _Timer:
+    """Context manager observing the elapsed seconds (perf_counter_ns) into a histogram."""
+
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe((time.perf_counter_ns() - self.start) / 1e9)
+        return False
+
+
+class Metrics:
+    """
+    Process-wide counters, gauges and histograms, exported in the Prometheus text
+    format (metric names get the hospital_ prefix, keyword arguments become labels):
+        with METRICS.timer("operation_seconds", op="load_state"): ...
+        @METRICS.timed("search_seconds", method="find_by_name")
+        METRICS.inc("payments_recorded_total")
+    When disabled (the default) timer() hands back one shared no-op context,
+    timed() returns the function undecorated and inc()/observe()/set() return at
+    once, so the instrumented hot paths cost a method call at most.
+    Enabled with HOSPITAL_METRICS=1 (or HOSPITAL_METRICS_FILE=path); start()
+    then exports to the file every HOSPITAL_METRICS_INTERVAL seconds (default 60,
+    0 = only on exit) and, with HOSPITAL_PROFILE_CAPTURE=cprofile,tracemalloc,
+    runs a ProfileCapture for the session.
+    """
+
+    def __init__(self, enabled: bool = False, path: Optional[str] = None, interval: float = EXPORT_INTERVAL,
+                 capture: Optional["ProfileCapture"] = None):
+        self.enabled = enabled
+        self.path = path
+        self.interval = interval
+        self.capture = capture
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._metrics: Dict[Tuple[str, Labels], object] = {}
+        self._help: Dict[str, Tuple[str, str]] = {}  # name -> (type, help)
+        self._stop = threading.Event()
+        self._exporter: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls, environ=os.environ) -> "Metrics":
+        path = environ.get(ENV_METRICS_FILE) or None
+        enabled = environ.get(ENV_METRICS, "") not in ("", "0") or path is not None
+        try:
+            interval = float(environ.get(ENV_METRICS_INTERVAL, EXPORT_INTERVAL))
+        except ValueError:
+            print(f"Warning: {ENV_METRICS_INTERVAL} must be a number of seconds; using {EXPORT_INTERVAL:g}")
+            interval = EXPORT_INTERVAL
+        capture = ProfileCapture.from_spec(environ.get(ENV_CAPTURE, ""))
+        return cls(enabled, path or (METRICS_PATH if enabled else None), interval, capture)
+
+    # --- metric objects ---
+
+    def _get(self, kind: str, factory: Callable, name: str, help_text: str, labels: Dict):
+        key = (PREFIX + name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = self._metrics[key] = factory()
+                    self._help.setdefault(key[0], (kind, help_text or DESCRIPTIONS.get(name, name)))
+        return metric
+
+    def counter(self, name: str, help_text: str = "", **labels) -> Counter:
+        return self._get("counter", Counter, name, help_text, labels)
+
+    def gauge(self, name: str, help_text: str = "", **labels) -> Gauge:
+        return self._get("gauge", Gauge, name, help_text, labels)
+
+    def histogram(self, name: str, help_text: str = "", buckets: Sequence[float] = TIME_BUCKETS,
+                  **labels) -> Histogram:
+        return self._get("histogram", lambda: Histogram(buckets), name, help_text, labels)
+
+    # --- recording (no-ops when disabled) ---
+
+    def inc(self, name: str, amount=1, **labels):
+        if self.enabled:
+            self.counter(name, **labels).inc(amount)
+
+    def set(self, name: str, value, **labels):
+        if self.enabled:
+            self.gauge(name, **labels).set(value)
+
+    def observe(self, name: str, value: float, **labels):
+        if self.enabled:
+            self.histogram(name, **labels).observe(value)
+
+    def timer(self, name: str, **labels):
+        """Context manager timing its block into the `name` histogram (seconds)."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self.histogram(name, **labels))
+
+    def timed(self, name: str, **labels):
+        """Decorator form of timer(); decided at import time, so disabled means undecorated."""
+        def decorate(func):
+            if not self.enabled:
+                return func
+            histogram = self.histogram(name, **labels)
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter_ns()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    histogram.observe((time.perf_counter_ns() - start) / 1e9)
+            return wrapper
+        return decorate
+
+    # --- export ---
+
+    def to_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        self._process_gauges()
+        with self._lock:
+            items = sorted(self._metrics.items(), key=lambda item: item[0])
+            helps = dict(self._help)
+        lines: List[str] = []
+        current = None
+        for (name, labels), metric in items:
+            if name != current:
+                current = name
+                kind, help_text = helps[name]
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+            if isinstance(metric, Histogram):
+                counts, total, count = metric.snapshot()
+                cumulative = 0
+                for bound, bucket in zip(metric.bounds + (float("inf"),), counts):
+                    cumulative += bucket
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {total:.9g}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+            else:
+                lines.append(f"{name}{_labels(labels)} {metric.value}")
+        return "\n".join(lines) + "\n"
+
+    def _process_gauges(self):
+        if not self.enabled:
+            return
+        self.set("process_start_time_seconds", round(self.started, 3))
+        self.set("process_uptime_seconds", round(time.time() - self.started, 3))
+        if self.capture is not None and self.capture.tracing:
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            self.set("traced_memory_bytes", current)
+            self.set("traced_memory_peak_bytes", peak)
+
+    def export(self, path: Optional[str] = None) -> Optional[str]:
+        """Write to_prometheus() to path (default: the configured file) atomically; returns the path."""
+        path = path or self.path
+        if not self.enabled or not path:
+            return None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+        return path
+
+    def start(self):
+        """Start the session capture and the periodic exporter thread (if enabled)."""
+        if self.capture is not None:
+            self.capture.start()
+        if self.enabled and self.path and self.interval > 0 and self._exporter is None:
+            self._exporter = threading.Thread(target=self._export_loop, name="metrics-export", daemon=True)
+            self._exporter.start()
+
+    def _export_loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.export()
+            except OSError as e:
+                print(f"Warning: could not export metrics to {self.path}: {e}", file=sys.stderr)
+
+    def stop(self):
+        """Stop the exporter, write the final export and the capture report."""
+        self._stop.set()
+        if self._exporter is not None:
+            self._exporter.join()
+            self._exporter = None
+        try:
+            self.export()
+        except OSError as e:
+            print(f"Warning: could not export metrics to {self.path}: {e}", file=sys.stderr)
+        if self.capture is not None:
+            self.capture.stop()
+
+    def dump(self, stream=None):
+        """Print the current metrics (and the capture's top entries) for the menu."""
+        stream = stream or sys.stdout
+        if not self.enabled and self.capture is None:
+            print(f"Metrics are disabled (set {ENV_METRICS}=1, optionally {ENV_CAPTURE}=cprofile,tracemalloc).",
+                  file=stream)
+            return
+        if self.enabled:
+            print(self.to_prometheus(), end="", file=stream)
+            path = self.export()
+            if path:
+                print(f"# written to {path}", file=stream)
+        if self.capture is not None:
+            self.capture.report(stream)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+class ProfileCapture:
+    """
+    Whole-session cProfile and/or tracemalloc, requested with
+    HOSPITAL_PROFILE_CAPTURE=cprofile, =tracemalloc or =cprofile,tracemalloc.
+    - report(): top functions by cumulative time / top allocation sites so far
+    - stop(): saves the cProfile stats to data/hospital.pstats (for pstats/snakeviz)
+    """
+
+    MODES = ("cprofile", "tracemalloc")
+
+    def __init__(self, cprofile: bool = False, tracemalloc: bool = False, stats_path: str = PROFILE_PATH,
+                 top: int = 15):
+        self.cprofile = cprofile
+        self.tracemalloc = tracemalloc
+        self.stats_path = stats_path
+        self.top = top
+        self.profile = None
+        self.tracing = False
+
+    @classmethod
+    def from_spec(cls, spec: str) -> Optional["ProfileCapture"]:
+        modes = {mode.strip().lower() for mode in spec.split(",") if mode.strip()}
+        unknown = modes - set(cls.MODES)
+        if unknown:
+            print(f"Warning: unknown {ENV_CAPTURE} mode(s) {', '.join(sorted(unknown))} "
+                  f"(expected {', '.join(cls.MODES)})")
+        if not modes & set(cls.MODES):
+            return None
+        return cls("cprofile" in modes, "tracemalloc" in modes)
+
+    def start(self):
+        if self.tracemalloc and not self.tracing:
+            import tracemalloc
+            tracemalloc.start()
+            self.tracing = True
+        if self.cprofile and self.profile is None:
+            import cProfile
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def report(self, stream=None):
+        stream = stream or sys.stdout
+        if self.tracing:
+            # Snapshot first, so the cProfile report below does not show up in it
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "*/cProfile.py"),
+                tracemalloc.Filter(False, "*/pstats.py"),
+            ])
+            print(f"\n--- tracemalloc: {current / 1e6:.1f} MB current, {peak / 1e6:.1f} MB peak; "
+                  f"top {self.top} allocation sites ---", file=stream)
+            for stat in snapshot.statistics("lineno")[:self.top]:
+                print(stat, file=stream)
+        if self.profile is not None:
+            import pstats
+            self.profile.disable()
+            try:
+                print(f"\n--- cProfile: top {self.top} by cumulative time ---", file=stream)
+                pstats.Stats(self.profile, stream=stream).sort_stats("cumulative").print_stats(self.top)
+            finally:
+                self.profile.enable()
+
+    def stop(self):
+        if self.profile is not None:
+            self.profile.disable()
+            directory = os.path.dirname(self.stats_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.profile.dump_stats(self.stats_path)
+            print(f"cProfile stats written to {self.stats_path}", file=sys.stderr)
+            self.profile = None
+        if self.tracing:
+            import tracemalloc
+            tracemalloc.stop()
+            self.tracing = False
+
+
+# The process-wide instance the application modules record into
+METRICS = Metrics.from_env()
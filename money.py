@@ -0,0 +1,41 @@
+# Money is handled as integer cents throughout billing: sums are exact and every
+# run produces the same figures regardless of summation order.
+
+BASIS_POINTS = 10_000  # ratios are expressed in 1/10000 (1000 = 10%)
+
+_TWO_DIGITS = tuple(f"{n:02d}" for n in range(100))
+
+
+def parse_cents(text: str) -> int:
+    """
+    Exact decimal string -> cents, without going through float.
+      "45" -> 4500, "85.5" -> 8550, "2550.00" -> 255000
+    Raises ValueError for anything that is not a plain amount with at most 2 decimals.
+    """
+    text = text.strip()
+    negative = text.startswith('-')
+    if negative:
+        text = text[1:]
+    whole, _, fraction = text.partition('.')
+    valid = (
+        (whole or fraction)
+        and (not whole or whole.isdigit())
+        and (not fraction or (fraction.isdigit() and len(fraction) <= 2))
+    )
+    if not valid:
+        raise ValueError(f"invalid amount: {text!r}")
+    cents = int(whole or "0") * 100 + (int(fraction.ljust(2, '0')) if fraction else 0)
+    return -cents if negative else cents
+
+
+def format_cents(cents: int) -> str:
+    """4550 -> "45.50" (same text as f"{45.5:.2f}", without float formatting)."""
+    if cents < 0:
+        return "-" + format_cents(-cents)
+    euros, rest = divmod(cents, 100)
+    return str(euros) + "." + _TWO_DIGITS[rest]
+
+
+def apply_ratio(cents: int, basis_points: int) -> int:
+    """cents * basis_points / 10000, rounded half up to the nearest cent."""
+    return (cents * basis_points + BASIS_POINTS // 2) // BASIS_POINTS
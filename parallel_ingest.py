@@ -0,0 +1,363 @@
+"""
+Chunked, multi-core parsing of the big append-only CSVs:
+    python parallel_ingest.py patients [data/patients.csv] [--workers N]
+    python parallel_ingest.py reconcile [data/payment_history.csv] [--workers N] [--by-day]
+Files are split into byte ranges that end on line boundaries and each range is
+parsed in a ProcessPoolExecutor worker. Workers send back compact columnar
+results (a PatientTable, or per-day payment aggregates) rather than pickled
+row objects, and the parent merges them in file order. Files under
+PARALLEL_MIN_BYTES (or workers=1) are parsed in-process with the same code.
+Rows must not contain line breaks inside quoted fields (the writers never
+produce them from prompt input).
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+from operator import itemgetter
+from typing import Dict, List, Optional, Sequence, Tuple
+from metrics import METRICS
+from money import format_cents, parse_cents
+from patient_table import FLAG_BITS, FLAG_FIELDS, PatientTable
+from payment_history import PAYMENT_KEY_FIELDS
+from utilities import _resolve_doctor_cell
+
+ENV_WORKERS = "HOSPITAL_INGEST_WORKERS"  # 1 disables the process pool
+PARALLEL_MIN_BYTES = 8 << 20  # below this, starting workers costs more than it saves
+MIN_CHUNK_BYTES = 1 << 20
+MAX_CHUNK_BYTES = 64 << 20
+CHUNKS_PER_WORKER = 4  # several chunks per worker keeps the pool busy to the end
+MISMATCH_SAMPLES = 20
+
+# Range = (start, end) byte offsets, end exclusive, both on line boundaries
+Range = Tuple[int, int]
+
+
+def default_workers() -> int:
+    value = os.environ.get(ENV_WORKERS, "")
+    if value.isdigit() and int(value) > 0:
+        return int(value)
+    return os.cpu_count() or 1
+
+
+def _read_header(f) -> Tuple[List[str], int]:
+    line = f.readline()
+    if not line:
+        return [], 0
+    return next(csv.reader([line.decode('utf-8')])), f.tell()
+
+
+def line_ranges(f, start: int, end: int, chunk_bytes: int) -> List[Range]:
+    """Split [start, end) of an open binary file into ranges of ~chunk_bytes ending after a newline."""
+    ranges = []
+    while start < end:
+        stop = start + chunk_bytes
+        if stop < end:
+            f.seek(stop)
+            f.readline()
+            stop = min(f.tell(), end)
+        else:
+            stop = end
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def _plan(filepath: str, offset: int, workers: Optional[int], chunk_bytes: Optional[int]):
+    """(header, ranges, workers) for the data rows from `offset` (0 = right after the header)."""
+    with open(filepath, 'rb') as f:
+        header, data_start = _read_header(f)
+        start = max(offset, data_start)
+        end = os.fstat(f.fileno()).st_size
+        workers = workers or default_workers()
+        if workers <= 1 or end - start < PARALLEL_MIN_BYTES:
+            return header, ([(start, end)] if start < end else []), 1
+        if chunk_bytes is None:
+            chunk_bytes = (end - start) // (workers * CHUNKS_PER_WORKER)
+            chunk_bytes = max(MIN_CHUNK_BYTES, min(MAX_CHUNK_BYTES, chunk_bytes))
+        return header, line_ranges(f, start, end, chunk_bytes), workers
+
+
+def _map_chunks(func, filepath: str, header: List[str], ranges: Sequence[Range], workers: int):
+    """func(filepath, start, end, header) over every range; results come back in file order."""
+    starts = [start for start, _ in ranges]
+    ends = [end for _, end in ranges]
+    if workers > 1 and len(ranges) > 1:
+        try:
+            with ProcessPoolExecutor(min(workers, len(ranges))) as pool:
+                return list(pool.map(func, repeat(filepath), starts, ends, repeat(header)))
+        except (OSError, BrokenProcessPool) as e:
+            print(f"Warning: parallel parsing unavailable ({e}); using a single process.")
+    return list(map(func, repeat(filepath), starts, ends, repeat(header)))
+
+
+def _read_text(filepath: str, start: int, end: int) -> io.StringIO:
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        return io.StringIO(f.read(end - start).decode('utf-8'), newline='')
+
+
+def _parse_patient_chunk(filepath: str, start: int, end: int, header: List[str]) -> Tuple[PatientTable, int]:
+    """Worker: rows in [start, end) -> (PatientTable, skipped rows), same rules as load_patients_from_csv."""
+    table = PatientTable()
+    skipped = 0
+    i_id, i_name, i_age, i_doctor, i_insurance_type = [
+        header.index(f) for f in ("patient_id", "name", "age", "specific_doctor", "insurance_type")
+    ]
+    flag_columns = [(header.index(field), FLAG_BITS[field]) for field in FLAG_FIELDS]
+    width = len(header)
+    resolved = {}  # raw specific_doctor cell -> shared DoctorID str (or None)
+    append = table.append_values
+    for row in csv.reader(_read_text(filepath, start, end)):
+        if len(row) < width:
+            skipped += 1
+            continue
+        try:
+            age = int(row[i_age])
+        except ValueError:
+            skipped += 1
+            continue
+        if not 0 <= age <= 255:
+            skipped += 1
+            continue
+        bits = 0
+        for column, bit in flag_columns:
+            if row[column] == 'y':
+                bits |= bit
+        cell = row[i_doctor]
+        if cell in resolved:
+            specific_doctor = resolved[cell]
+        else:
+            specific_doctor = resolved[cell] = _resolve_doctor_cell(cell)
+        append(row[i_id], row[i_name], age, bits, specific_doctor, row[i_insurance_type])
+    return table, skipped
+
+
+@METRICS.timed("operation_seconds", op="ingest_patients")
+def load_patient_table(filepath="data/patients.csv", offset=0, workers: Optional[int] = None,
+                       chunk_bytes: Optional[int] = None) -> PatientTable:
+    """
+    patients.csv -> PatientTable, parsed across `workers` processes (default: one
+    per core, or $HOSPITAL_INGEST_WORKERS). offset works as in load_patients_from_csv.
+    """
+    if not os.path.exists(filepath):
+        print(f"Warning: {filepath} not found. Starting with empty patient list.")
+        return PatientTable()
+    try:
+        header, ranges, workers = _plan(filepath, offset, workers, chunk_bytes)
+        table = PatientTable()
+        skipped = 0
+        for chunk, chunk_skipped in _map_chunks(_parse_patient_chunk, filepath, header, ranges, workers):
+            table.extend(chunk)
+            skipped += chunk_skipped
+    except (OSError, ValueError, UnicodeDecodeError, csv.Error) as e:
+        print(f"Error loading patients: {e}")
+        return PatientTable()
+    if skipped:
+        print(f"Warning: skipped {skipped} malformed row(s) in {filepath}.")
+    return table
+
+
+class PaymentReconciliation:
+    """
+    Nightly totals over the legacy payment_history.csv (one row per service, the
+    payment fields repeated on each of its rows):
+    - by_day: (Date, PaymentMethod) -> [rows, service cents, payments, total cents, discounted cents]
+    - by_service: Service -> [rows, cents]
+    - mismatches: payments whose service costs do not add up to their Total
+      (the first MISMATCH_SAMPLES are kept in samples)
+    Consecutive rows with the same payment_history.payment_key (PatientID, Total,
+    DiscountedTotal, PaymentMethod, Date and PriceVersion when the column is
+    present) form one payment, so a patient billed twice on one day at two price
+    versions counts as two payments. A chunk closes the payments that lie entirely inside
+    it; its first and last (possibly cut by the chunk edges) are kept open and
+    stitched to the neighbouring chunks by merge().
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.skipped = 0
+        self.payments = 0
+        self.mismatches = 0
+        self.samples: List[Tuple[str, str, int, int]] = []  # PatientID, Date, Total, service sum
+        self.by_day: Dict[Tuple[str, str], List[int]] = {}
+        self.by_service: Dict[str, List[int]] = {}
+        # open payments: [payment_key, service cents, total cents, discounted cents]
+        self.first: Optional[list] = None
+        self.last: Optional[list] = None
+
+    def close_payment(self, payment: Optional[list]):
+        if payment is None:
+            return
+        (patient_id, _, _, method, day, _), cost, total, discounted = payment
+        self.payments += 1
+        totals = self.by_day[(day, method.lower())]
+        totals[2] += 1
+        totals[3] += total
+        totals[4] += discounted
+        if cost != total:
+            self.mismatches += 1
+            if len(self.samples) < MISMATCH_SAMPLES:
+                self.samples.append((patient_id, day, total, cost))
+
+    def merge(self, chunk: "PaymentReconciliation"):
+        """Fold in the next chunk (in file order), joining a payment split across the boundary."""
+        self.rows += chunk.rows
+        self.skipped += chunk.skipped
+        self.payments += chunk.payments
+        self.mismatches += chunk.mismatches
+        self.samples += chunk.samples[:MISMATCH_SAMPLES - len(self.samples)]
+        for key, values in chunk.by_day.items():
+            totals = self.by_day.setdefault(key, [0, 0, 0, 0, 0])
+            for i, value in enumerate(values):
+                totals[i] += value
+        for service, (rows, cents) in chunk.by_service.items():
+            totals = self.by_service.setdefault(service, [0, 0])
+            totals[0] += rows
+            totals[1] += cents
+        if chunk.first is not None:
+            if self.last is not None and self.last[0] == chunk.first[0]:
+                self.last[1] += chunk.first[1]
+            else:
+                self.close_payment(self.last)
+                self.last = list(chunk.first)
+        if chunk.last is not None:
+            self.close_payment(self.last)
+            self.last = list(chunk.last)
+
+    def finish(self) -> "PaymentReconciliation":
+        self.close_payment(self.last)
+        self.last = None
+        return self
+
+    def report(self, by_day: bool = False, stream=None):
+        stream = stream or sys.stdout
+        methods: Dict[str, List[int]] = {}
+        for (_, method), values in self.by_day.items():
+            totals = methods.setdefault(method, [0, 0, 0, 0, 0])
+            for i, value in enumerate(values):
+                totals[i] += value
+        line = "{:<12} {:<8} {:>12} {:>12} {:>16} {:>16} {:>16}"
+        header = line.format("Date", "Method", "Rows", "Payments", "Services €", "Total €", "Discounted €")
+        print(header, file=stream)
+        print("-" * len(header), file=stream)
+        rows = sorted(self.by_day.items()) if by_day else []
+        rows += sorted((("all", method), values) for method, values in methods.items())
+        for (day, method), (count, cost, payments, total, discounted) in rows:
+            print(line.format(day, method, f"{count:,}", f"{payments:,}", format_cents(cost),
+                              format_cents(total), format_cents(discounted)), file=stream)
+        print(f"\n{self.rows:,} row(s), {self.payments:,} payment(s), {len(self.by_day):,} day/method group(s)",
+              file=stream)
+        if self.skipped:
+            print(f"Skipped {self.skipped:,} malformed row(s).", file=stream)
+        if self.mismatches:
+            print(f"{self.mismatches:,} payment(s) whose services do not add up to the Total, e.g.:", file=stream)
+            for patient_id, day, total, cost in self.samples:
+                print(f"  {patient_id} {day}: Total €{format_cents(total)}, services €{format_cents(cost)}",
+                      file=stream)
+        else:
+            print("Every payment's services add up to its Total.", file=stream)
+
+
+def _reconcile_chunk(filepath: str, start: int, end: int, header: List[str]) -> PaymentReconciliation:
+    """Worker: aggregate the payment rows in [start, end)."""
+    result = PaymentReconciliation()
+    i_service, i_cost, i_total, i_discounted, i_method, i_date = [
+        header.index(f) for f in ('Service', 'Cost', 'Total', 'DiscountedTotal', 'PaymentMethod', 'Date')
+    ]
+    # payment_key over list rows; files from before PriceVersion get ''
+    key_fields = [f for f in PAYMENT_KEY_FIELDS if f in header]
+    key_of = itemgetter(*[header.index(f) for f in key_fields])
+    pad = ('',) * (len(PAYMENT_KEY_FIELDS) - len(key_fields))
+    width = len(header)
+    by_day = result.by_day
+    by_service = result.by_service
+    amounts: Dict[str, int] = {}  # amount text -> cents, amounts repeat heavily
+    current = None  # open payment [key, service cents, total cents, discounted cents]
+    for row in csv.reader(_read_text(filepath, start, end)):
+        if len(row) != width:
+            result.skipped += 1
+            continue
+        try:
+            cost, total, discounted = [
+                amounts[text] if text in amounts else amounts.setdefault(text, parse_cents(text))
+                for text in (row[i_cost], row[i_total], row[i_discounted])
+            ]
+        except ValueError:
+            result.skipped += 1
+            continue
+        result.rows += 1
+        method = row[i_method].lower()
+        day = row[i_date]
+        totals = by_day.get((day, method))
+        if totals is None:
+            totals = by_day[(day, method)] = [0, 0, 0, 0, 0]
+        totals[0] += 1
+        totals[1] += cost
+        service = by_service.get(row[i_service])
+        if service is None:
+            service = by_service[row[i_service]] = [0, 0]
+        service[0] += 1
+        service[1] += cost
+
+        key = key_of(row) + pad if pad else key_of(row)
+        if current is not None and current[0] == key:
+            current[1] += cost
+            continue
+        if current is not None:
+            if result.first is None:
+                result.first = current
+            else:
+                result.close_payment(current)
+        current = [key, cost, total, discounted]
+    if result.first is None:
+        result.first = current
+    else:
+        result.last = current
+    return result
+
+
+@METRICS.timed("operation_seconds", op="reconcile_payments")
+def reconcile_payments(filepath="data/payment_history.csv", workers: Optional[int] = None,
+                       chunk_bytes: Optional[int] = None) -> PaymentReconciliation:
+    """Aggregate the whole legacy payment history across `workers` processes."""
+    result = PaymentReconciliation()
+    if not os.path.exists(filepath):
+        print(f"Warning: {filepath} not found.")
+        return result
+    header, ranges, workers = _plan(filepath, 0, workers, chunk_bytes)
+    for chunk in _map_chunks(_reconcile_chunk, filepath, header, ranges, workers):
+        result.merge(chunk)
+    return result.finish()
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Parse patients.csv / payment_history.csv on every core")
+    parser.add_argument("command", choices=("patients", "reconcile"))
+    parser.add_argument("path", nargs="?", help="default: data/patients.csv or data/payment_history.csv")
+    parser.add_argument("--workers", type=int, help=f"processes (default: ${ENV_WORKERS} or one per core)")
+    parser.add_argument("--by-day", action="store_true", help="reconcile: print every date/method group")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.command == "patients":
+        path = args.path or "data/patients.csv"
+        rows = len(load_patient_table(path, workers=args.workers))
+    else:
+        path = args.path or "data/payment_history.csv"
+        result = reconcile_payments(path, workers=args.workers)
+        result.report(by_day=args.by_day)
+        rows = result.rows
+    elapsed = time.perf_counter() - start
+    rate = rows / elapsed if elapsed else 0.0
+    print(f"\nParsed {rows:,} row(s) of {path} in {elapsed:.2f} s ({rate:,.0f} rows/sec)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,7 +1,9 @@
 from abc import ABC, abstractmethod
-from typing import Optional, Dict
+from typing import Optional
 
 class Person(ABC):
+    __slots__ = ("name", "age")
+
     def __init__(self, name: str, age: int):
         self.name = name
         self.age = age
@@ -22,16 +24,24 @@ class Patient(Person):
       follow_up: 'y'/'n'
       insurance: 'y'/'n'
       chronic_condition: 'y'/'n'
-      specific_doctor: dict or None
+      specific_doctor: DoctorID str (e.g. 'D012') or None; resolve it with doctors.DoctorDirectory
       insurance_type: str ('private'/'public') or None
     Attributes:
       total: float  # set when billing is processed
+    Uses __slots__ (no per-instance __dict__) to keep large registries small;
+    see patient_table.PatientTable for the columnar form.
     """
+    __slots__ = (
+        "patient_id", "urgent_care", "specialist_needed", "regular_checkup",
+        "follow_up", "insurance", "chronic_condition", "specific_doctor",
+        "insurance_type", "total"
+    )
+
     def __init__(self, patient_id: str, name: str, age: int,
                  urgent_care: str, specialist_needed: str,
                  regular_checkup: str, follow_up: str,
                  insurance: str, chronic_condition: str,
-                 specific_doctor: Optional[Dict], insurance_type: Optional[str]):
+                 specific_doctor: Optional[str], insurance_type: Optional[str]):
         super().__init__(name, age)
         self.patient_id = patient_id
         self.urgent_care = urgent_care
@@ -47,13 +57,19 @@ class Patient(Person):
     def __str__(self):
         doctor_info = ""
         if self.specific_doctor:
-            doctor_info = f", Doctor: {self.specific_doctor['DoctorID']}"
+            doctor_info = f", Doctor: {self.specific_doctor}"
         return f"Patient ID: {self.patient_id}, Name: {self.name}, Age: {self.age}, Urgent Care: {self.urgent_care}{doctor_info}"
     def get_summary(self):
         return str(self)
 
 class Doctor(Person):
-    def __init__(self, doctor_id: str, name: str, age: int, department: str):
+    """
+    One doctor from doctors.csv (which has no age column, so age is usually None).
+    Uses __slots__ like Patient; doctors.DoctorDirectory indexes them.
+    """
+    __slots__ = ("doctor_id", "department", "skills")
+
+    def __init__(self, doctor_id: str, name: str, department: str, age: Optional[int] = None):
         super().__init__(name, age)
         self.doctor_id = doctor_id
         self.department = department
@@ -0,0 +1,168 @@
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional
+from patient import Patient
+
+# Order defines the bit position in PatientTable.flags
+FLAG_FIELDS = (
+    "urgent_care", "specialist_needed", "regular_checkup",
+    "follow_up", "insurance", "chronic_condition"
+)
+FLAG_BITS = {field: 1 << i for i, field in enumerate(FLAG_FIELDS)}
+
+# insurance_type code arrays widen as distinct values are added (free text in the CSV)
+CODE_TYPECODES = ('B', 'H', 'I')
+
+
+class PatientTable:
+    """
+    Columnar patient storage for very large registries.
+    Columns:
+      patient_ids: list of str
+      names: list of interned str
+      ages: array('B')            # 0-255
+      flags: array('B')           # bit FLAG_BITS[field] set <=> field == 'y'
+      insurance_types: array('B') # code into insurance_type_values (interned);
+                                  # widened to 'H' / 'I' past 256 / 65536 values
+      doctors: list of DoctorID str (shared) or None
+    Flags are stored as a single bit, so any value other than 'y' reads back as 'n'.
+    append_values() checks every value before touching a column (ValueError for
+    an age outside 0-255), so a rejected row never leaves the columns uneven.
+    Rows are exposed as PatientRow views that behave like Patient for
+    __str__ / get_summary and attribute access.
+    """
+
+    def __init__(self):
+        self.patient_ids: List[str] = []
+        self.names: List[str] = []
+        self.ages = array('B')
+        self.flags = array('B')
+        self.insurance_types = array('B')
+        self.insurance_type_values: List[Optional[str]] = [None]
+        self._insurance_type_codes: Dict[Optional[str], int] = {None: 0}
+        self.doctors: List[Optional[str]] = []
+
+    @classmethod
+    def from_patients(cls, patients: Iterable) -> "PatientTable":
+        table = cls()
+        for patient in patients:
+            table.append(patient)
+        return table
+
+    def insurance_type_code(self, insurance_type: Optional[str]) -> int:
+        code = self._insurance_type_codes.get(insurance_type)
+        if code is None:
+            code = len(self.insurance_type_values)
+            if code >> (8 * self.insurance_types.itemsize):
+                typecode = CODE_TYPECODES[CODE_TYPECODES.index(self.insurance_types.typecode) + 1]
+                self.insurance_types = array(typecode, self.insurance_types)
+            insurance_type = sys.intern(insurance_type)
+            self.insurance_type_values.append(insurance_type)
+            self._insurance_type_codes[insurance_type] = code
+        return code
+
+    def append(self, patient):
+        """Add a Patient (or anything with the same attributes) as a new row."""
+        bits = 0
+        for field, bit in FLAG_BITS.items():
+            if getattr(patient, field) == 'y':
+                bits |= bit
+        self.append_values(patient.patient_id, patient.name, patient.age, bits,
+                           patient.specific_doctor, patient.insurance_type)
+
+    def append_values(self, patient_id: str, name: str, age: int, flags: int,
+                      specific_doctor: Optional[str], insurance_type: Optional[str]):
+        """Add a row from already packed values (flags as FLAG_BITS), without a Patient."""
+        if not 0 <= age <= 255:
+            raise ValueError(f"age {age} is outside 0-255")
+        if not 0 <= flags <= 255:
+            raise ValueError(f"flags {flags} are outside 0-255")
+        name = sys.intern(name)
+        code = self.insurance_type_code(insurance_type)
+        self.patient_ids.append(patient_id)
+        self.names.append(name)
+        self.ages.append(age)
+        self.flags.append(flags)
+        self.insurance_types.append(code)
+        self.doctors.append(specific_doctor)
+
+    def extend(self, other: "PatientTable"):
+        """
+        Append every row of another table (e.g. one parsed in a worker process).
+        Insurance type codes are remapped onto this table's values; names and
+        DoctorIDs are re-interned so they stay shared across the merged tables.
+        """
+        codes = [self.insurance_type_code(value) for value in other.insurance_type_values]
+        insurance_types = other.insurance_types
+        typecode = self.insurance_types.typecode
+        if codes != list(range(len(codes))):
+            if typecode == 'B':
+                remap = bytes(codes + [0] * (256 - len(codes)))
+                insurance_types = array('B', insurance_types.tobytes().translate(remap))
+            else:
+                insurance_types = array(typecode, map(codes.__getitem__, insurance_types))
+        elif insurance_types.typecode != typecode:
+            insurance_types = array(typecode, insurance_types)
+        intern = sys.intern
+        self.patient_ids += other.patient_ids
+        self.names += map(intern, other.names)
+        self.ages += other.ages
+        self.flags += other.flags
+        self.insurance_types += insurance_types
+        self.doctors += [None if doctor is None else intern(doctor) for doctor in other.doctors]
+
+    def to_patient(self, index: int) -> Patient:
+        """Materialize a full Patient object for one row."""
+        row = PatientRow(self, index)
+        return Patient(
+            row.patient_id, row.name, row.age,
+            row.urgent_care, row.specialist_needed, row.regular_checkup,
+            row.follow_up, row.insurance, row.chronic_condition,
+            row.specific_doctor, row.insurance_type
+        )
+
+    def __len__(self) -> int:
+        return len(self.patient_ids)
+
+    def __getitem__(self, index: int) -> "PatientRow":
+        if index < 0:
+            index += len(self.patient_ids)
+        if not 0 <= index < len(self.patient_ids):
+            raise IndexError("PatientTable index out of range")
+        return PatientRow(self, index)
+
+    def __iter__(self) -> Iterator["PatientRow"]:
+        for index in range(len(self.patient_ids)):
+            yield PatientRow(self, index)
+
+
+def _flag_property(bit: int):
+    return property(lambda self: 'y' if self._table.flags[self._index] & bit else 'n')
+
+
+class PatientRow:
+    """Read-only view of one PatientTable row with the Patient interface."""
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table: PatientTable, index: int):
+        self._table = table
+        self._index = index
+
+    patient_id = property(lambda self: self._table.patient_ids[self._index])
+    name = property(lambda self: self._table.names[self._index])
+    age = property(lambda self: self._table.ages[self._index])
+    specific_doctor = property(lambda self: self._table.doctors[self._index])
+    insurance_type = property(
+        lambda self: self._table.insurance_type_values[self._table.insurance_types[self._index]]
+    )
+    urgent_care = _flag_property(FLAG_BITS["urgent_care"])
+    specialist_needed = _flag_property(FLAG_BITS["specialist_needed"])
+    regular_checkup = _flag_property(FLAG_BITS["regular_checkup"])
+    follow_up = _flag_property(FLAG_BITS["follow_up"])
+    insurance = _flag_property(FLAG_BITS["insurance"])
+    chronic_condition = _flag_property(FLAG_BITS["chronic_condition"])
+
+    __str__ = Patient.__str__
+
+    def get_summary(self):
+        return str(self)
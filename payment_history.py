@@ -0,0 +1,375 @@
+import csv
+import os
+import struct
+import threading
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from itertools import accumulate
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+MAGIC = b"PAYINDEX"
+INDEX_VERSION = 2
+COMPACT_SEGMENTS = 4096
+
+_HEADER = struct.Struct("<8sIII")  # magic, version, generation, CSV header line length
+_SEGMENT = struct.Struct("<BQQII")  # kind, CSV bytes [start, end), payload length, crc32
+_KEYS = struct.Struct("<II")  # key count, keys blob length
+_ROW_COUNT = struct.Struct("<I")
+_BASE, _ROWS = 1, 2
+
+
+def _parse_line(line: bytes) -> List[str]:
+    text = line.decode('utf-8').rstrip('\r\n')
+    if '"' not in text:
+        return text.split(',')
+    return next(csv.reader([text]))
+
+
+def matches(row: Dict[str, str], patient_id=None, date_from=None, date_to=None, payment_method=None) -> bool:
+    """Filter predicate; dates are ISO strings so they compare lexicographically."""
+    if patient_id is not None and row['PatientID'] != patient_id:
+        return False
+    if date_from is not None and row['Date'] < date_from:
+        return False
+    if date_to is not None and row['Date'] > date_to:
+        return False
+    if payment_method is not None and row['PaymentMethod'].lower() != payment_method:
+        return False
+    return True
+
+
+# The columns of payment_key, in order (PriceVersion is '' in files without it)
+PAYMENT_KEY_FIELDS = ('PatientID', 'Total', 'DiscountedTotal', 'PaymentMethod', 'Date', 'PriceVersion')
+
+
+def payment_key(row: Dict[str, str]) -> tuple:
+    """
+    (PatientID, Total, DiscountedTotal, PaymentMethod, Date, PriceVersion): equal for
+    the consecutive legacy rows (one per service) that make up one payment.
+    """
+    return (row['PatientID'], row['Total'], row['DiscountedTotal'], row['PaymentMethod'], row['Date'],
+            row.get('PriceVersion') or '')
+
+
+def filter_rows(rows: Iterable[Dict[str, str]], **filters) -> Iterator[Dict[str, str]]:
+    return (row for row in rows if matches(row, **filters))
+
+
+def paginate(rows: Iterable, page_size: int = 20) -> Iterator[List]:
+    """Group any row iterator into lists of page_size without reading ahead."""
+    page = []
+    for row in rows:
+        page.append(row)
+        if len(page) == page_size:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+class PaymentHistoryIndex:
+    """
+    Offset index for payment_history.csv (PatientID and Date -> byte offsets of
+    their rows), held in memory and persisted as an append-only binary sidecar
+    (<file>.idx). Keep one instance per file (CsvBackend.history_index); its
+    threads share it.
+    - refresh() parses only the CSV rows appended since the last call and appends
+      them to the sidecar as one rows segment, so staying current costs O(new
+      rows) and a lookup O(matching rows)
+    - the rows are merged into a grouped base (offsets ordered by key, one span
+      per key) once they add up to a quarter of it, or after COMPACT_SEGMENTS
+      segments; loading the base does no per-row work
+    Sidecar layout (little endian):
+      header: magic, version, generation, CSV header line (length prefixed)
+      segments: kind, CSV byte range covered, payload length, crc32, then
+        base: for PatientID, then Date: keys blob, counts u32[k], offsets u64[n]
+        rows: row count, offsets u64[n], PatientIDs then Dates as one blob
+      (blobs are NUL-joined UTF-8)
+    The sidecar is flock-ed while it is read or extended, and segments another
+    process appended are merged on the next refresh. A changed CSV header (e.g.
+    an added column) or a shrunken CSV rebuilds the index, a torn last segment is
+    dropped, and every rewrite bumps the generation so other processes reload.
+    """
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.index_path = filepath + ".idx"
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self, header_line: bytes = b""):
+        self._header_line = header_line
+        self.header: List[str] = _parse_line(header_line) if header_line else []
+        self.size = len(header_line)  # CSV bytes covered
+        self._consumed = 0  # sidecar bytes merged so far (0 = nothing loaded)
+        self._segments = 0
+        self._patients = _GroupedOffsets()
+        self._dates = _GroupedOffsets()
+
+    def refresh(self):
+        """Bring the index up to date with the file (incrementally when possible)."""
+        try:
+            size = os.path.getsize(self.filepath)
+        except OSError:
+            return
+        with self._lock:
+            if size == self.size:
+                return
+            with _locked_sidecar(self.index_path) as sidecar:
+                self._catch_up(sidecar)
+                self._scan(sidecar)
+
+    def _catch_up(self, sidecar):
+        """Merge the segments written since we last looked (all of them on first use)."""
+        sidecar.seek(0, os.SEEK_END)
+        length = sidecar.tell()
+        sidecar.seek(0)
+        head = sidecar.read(_HEADER.size)
+        if len(head) < _HEADER.size:
+            self._reset()
+            return
+        magic, version, generation, header_length = _HEADER.unpack(head)
+        if magic != MAGIC or version != INDEX_VERSION:
+            self._reset()
+            return
+        position = self._consumed
+        if not position or generation != self._generation or length < position:
+            header_line = sidecar.read(header_length)
+            if len(header_line) < header_length:
+                self._reset()
+                return
+            self._reset(header_line)
+            self._generation = generation
+            position = _HEADER.size + header_length
+        sidecar.seek(position)
+        data = sidecar.read(length - position)
+        done = 0
+        while done + _SEGMENT.size <= len(data):
+            kind, start, end, payload_length, crc = _SEGMENT.unpack_from(data, done)
+            payload = data[done + _SEGMENT.size:done + _SEGMENT.size + payload_length]
+            if start != self.size or end < start or len(payload) < payload_length or zlib.crc32(payload) != crc:
+                break
+            if kind == _BASE:
+                self._dates.load(payload, self._patients.load(payload, 0))
+            else:
+                count, = _ROW_COUNT.unpack_from(payload)
+                offsets = array('Q')
+                offsets.frombytes(payload[_ROW_COUNT.size:_ROW_COUNT.size + count * 8])
+                keys = payload[_ROW_COUNT.size + count * 8:].decode('utf-8').split("\0") if count else []
+                self._add_rows(offsets, keys[:count], keys[count:])
+            self.size = end
+            self._segments += 1
+            done += _SEGMENT.size + payload_length
+        self._consumed = position + done
+        if self._consumed < length:
+            sidecar.truncate(self._consumed)  # torn or foreign tail, written again below
+
+    def _scan(self, sidecar):
+        """Index the CSV rows past self.size and persist them."""
+        with open(self.filepath, 'rb') as f:
+            header_line = f.readline()
+            if not header_line.endswith(b'\n'):
+                return  # header still being written
+            size = os.fstat(f.fileno()).st_size
+            rewrite = not self._consumed or header_line != self._header_line or size < self.size
+            if rewrite:
+                self._reset(header_line)
+            header = self.header
+            i_patient = header.index('PatientID')
+            i_date = header.index('Date')
+            width = len(header)
+            start = offset = self.size
+            f.seek(offset)
+            offsets, ids, days = [], [], []
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # incomplete last row, pick it up next time
+                fields = _parse_line(line)
+                if len(fields) == width:
+                    offsets.append(offset)
+                    ids.append(fields[i_patient])
+                    days.append(fields[i_date])
+                offset += len(line)
+        self._add_rows(offsets, ids, days)
+        self.size = offset
+        if rewrite or self._segments >= COMPACT_SEGMENTS or self._patients.tail_rows * 4 > self._patients.base_rows:
+            self._rewrite(sidecar)
+        elif offset > start:
+            payload = (_ROW_COUNT.pack(len(offsets)) + array('Q', offsets).tobytes()
+                       + "\0".join(ids + days).encode('utf-8'))
+            segment = _SEGMENT.pack(_ROWS, start, offset, len(payload), zlib.crc32(payload)) + payload
+            sidecar.write(segment)
+            sidecar.flush()
+            self._consumed += len(segment)
+            self._segments += 1
+
+    def _add_rows(self, offsets, ids: List[str], days: List[str]):
+        self._patients.add(ids, offsets)
+        self._dates.add(days, offsets)
+
+    def _rewrite(self, sidecar):
+        """Replace the sidecar with the whole index as one base segment (new generation)."""
+        self._patients.compact()
+        self._dates.compact()
+        payload = self._patients.pack() + self._dates.pack()
+        self._generation = (self._generation + 1) & 0xFFFFFFFF
+        data = (_HEADER.pack(MAGIC, INDEX_VERSION, self._generation, len(self._header_line)) + self._header_line
+                + _SEGMENT.pack(_BASE, len(self._header_line), self.size, len(payload), zlib.crc32(payload))
+                + payload)
+        sidecar.truncate(0)
+        sidecar.write(data)
+        sidecar.flush()
+        self._consumed = len(data)
+        self._segments = 1
+
+    def offsets(self, patient_id=None, date_from=None, date_to=None) -> Optional[List[int]]:
+        """Sorted row offsets matching the indexed filters, or None if none were given."""
+        with self._lock:
+            result = None
+            if patient_id is not None:
+                result = self._patients.get(patient_id)
+            if date_from is not None or date_to is not None:
+                days = sorted(self._dates.keys())
+                lo = bisect_left(days, date_from) if date_from is not None else 0
+                hi = bisect_right(days, date_to) if date_to is not None else len(days)
+                by_date = sorted(offset for day in days[lo:hi] for offset in self._dates.get(day))
+                result = by_date if result is None else sorted(set(result).intersection(by_date))
+            return result
+
+    def read_rows(self, offsets: Iterable[int]) -> Iterator[Dict[str, str]]:
+        """Seek straight to each offset and parse that one row."""
+        header = self.header
+        with open(self.filepath, 'rb') as f:
+            for offset in offsets:
+                f.seek(offset)
+                yield dict(zip(header, _parse_line(f.readline())))
+
+
+class _GroupedOffsets:
+    """
+    key -> ascending row offsets: a base array grouped by key with key -> (start,
+    end) spans, plus key -> [offsets] for the rows added since (all after the base).
+    """
+
+    def __init__(self):
+        self.offsets = array('Q')
+        self.spans: Dict[str, Tuple[int, int]] = {}
+        self.tail: Dict[str, List[int]] = {}
+        self.base_rows = 0
+        self.tail_rows = 0
+
+    def add(self, keys: List[str], offsets):
+        tail = self.tail
+        for key, offset in zip(keys, offsets):
+            rows = tail.get(key)
+            if rows is None:
+                tail[key] = [offset]
+            else:
+                rows.append(offset)
+        self.tail_rows += len(keys)
+
+    def get(self, key: str) -> List[int]:
+        span = self.spans.get(key)
+        rows = self.offsets[span[0]:span[1]].tolist() if span else []
+        rows += self.tail.get(key, ())
+        return rows
+
+    def keys(self):
+        return self.spans.keys() | self.tail.keys()
+
+    def compact(self):
+        """Fold the tail into the base: one pass over the keys, array copies per key."""
+        if not self.tail:
+            return
+        base, spans, tail = self.offsets, self.spans, self.tail
+        offsets = array('Q')
+        merged: Dict[str, Tuple[int, int]] = {}
+        for key in list(spans) + [key for key in tail if key not in spans]:
+            begin = len(offsets)
+            span = spans.get(key)
+            if span:
+                offsets += base[span[0]:span[1]]
+            rows = tail.get(key)
+            if rows:
+                offsets.extend(rows)
+            merged[key] = (begin, len(offsets))
+        self.offsets, self.spans, self.tail = offsets, merged, {}
+        self.base_rows += self.tail_rows
+        self.tail_rows = 0
+
+    def pack(self) -> bytes:
+        keys = "\0".join(self.spans).encode('utf-8')
+        counts = array('I', [end - begin for begin, end in self.spans.values()])
+        return _KEYS.pack(len(self.spans), len(keys)) + keys + counts.tobytes() + self.offsets.tobytes()
+
+    def load(self, payload: bytes, position: int) -> int:
+        """Replace the contents with a packed base; returns the position after it."""
+        count, length = _KEYS.unpack_from(payload, position)
+        position += _KEYS.size
+        keys = payload[position:position + length].decode('utf-8').split("\0") if count else []
+        position += length
+        counts = array('I')
+        counts.frombytes(payload[position:position + count * 4])
+        position += count * 4
+        ends = list(accumulate(counts))
+        total = ends[-1] if ends else 0
+        self.offsets = array('Q')
+        self.offsets.frombytes(payload[position:position + total * 8])
+        self.spans = dict(zip(keys, zip([0] + ends[:-1], ends)))
+        self.tail = {}
+        self.base_rows = total
+        self.tail_rows = 0
+        return position + total * 8
+
+
+@contextmanager
+def _locked_sidecar(path: str):
+    """The sidecar opened for reading and appending, exclusively locked across processes."""
+    # 'a+b' creates it if missing without truncating it
+    with open(path, 'a+b') as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield f
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def iter_payment_history(filepath="data/payment_history.csv", patient_id=None, date_from=None,
+                         date_to=None, payment_method=None, use_index=True,
+                         index: Optional[PaymentHistoryIndex] = None) -> Iterator[Dict[str, str]]:
+    """
+    Lazily yield payment_history.csv rows matching the filters.
+    With use_index and a PatientID/date filter the offset index is used to seek
+    directly to candidate rows; otherwise the file is streamed row by row.
+    Pass a long-lived `index` to keep it in memory between calls (otherwise the
+    sidecar is loaded for this one call).
+    """
+    if not os.path.exists(filepath):
+        return
+    filters = dict(patient_id=patient_id, date_from=date_from, date_to=date_to, payment_method=payment_method)
+    if use_index and (patient_id is not None or date_from is not None or date_to is not None):
+        if index is None:
+            index = PaymentHistoryIndex(filepath)
+        index.refresh()
+        offsets = index.offsets(patient_id, date_from, date_to)
+        yield from filter_rows(index.read_rows(offsets), **filters)
+        return
+    with open(filepath, 'r', newline='') as csvfile:
+        yield from filter_rows(csv.DictReader(csvfile), **filters)
@@ -0,0 +1,229 @@
+import threading
+import unicodedata
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, Iterator, List, Optional
+from patient import Patient
+from patient_table import PatientTable
+from id_allocator import parse_patient_id
+from trigram_index import TrigramIndex
+from bitmap_index import BitmapIndex, iter_positions
+from metrics import METRICS
+from concurrency import RWLock, read_locked, write_locked
+
+
+def normalize_name(name: str) -> str:
+    """
+    Key used by the name indexes: NFKC-normalized (compatibility forms such as
+    full-width letters fold to plain ones), surrounding/duplicate whitespace
+    removed, casefolded.
+      "Michael Jackson " -> "michael jackson"
+    """
+    return " ".join(unicodedata.normalize("NFKC", name).split()).casefold()
+
+
+class PatientRegistry:
+    """
+    In-memory patient store that replaces the flat HospitalSystem.patients list.
+    Indexes (all updated incrementally by add()):
+      - id index: patient_id -> Patient (first registration wins, like a linear scan)
+      - name index: sorted normalized names (bisect) for exact, prefix and range lookups
+      - trigram index: substring and fuzzy name search, built on first search
+      - bitmap index: y/n flags, insurance_type and age buckets for find_by(),
+        count() and boolean filter() expressions, built on first use
+    `table` holds the same rows as a PatientTable (row i = position i) for
+    whole-registry passes such as BillingSystem.bill_many; a registry built from
+    a PatientTable takes that table over and keeps appending to it.
+    Still behaves like the old list for iteration, len(), indexing and append().
+    Thread safety: `lock` is a reader-writer lock; add()/extend() take it for
+    writing and the index lookups for reading, so searches run in parallel and
+    never see a half-indexed patient. Hold lock.write() yourself to make several
+    changes visible at once (HospitalSystem.register_patient). get() (one dict
+    read), iteration, len() and indexing stay lock-free: the list is append-only.
+    """
+
+    INDEXED_FIELDS = BitmapIndex.FIELDS
+
+    def __init__(self, patients: Optional[Iterable[Patient]] = None):
+        self._patients: List[Patient] = []
+        # Columnar copy of every row, in position order
+        self.table = PatientTable()
+        self._by_id: Dict[str, Patient] = {}
+        # Normalized name per position, in registration order (used for substring scans)
+        self._names: List[str] = []
+        # Sorted name index: parallel lists of normalized name and position in _patients
+        self._name_keys: List[str] = []
+        self._name_positions: List[int] = []
+        # Trigram index over _names, built lazily by the first name search
+        self._trigrams: Optional[TrigramIndex] = None
+        # Bitmap index over the flag / category fields, built lazily by the first filter
+        self._bitmaps: Optional[BitmapIndex] = None
+        # Bumped on every mutation so callers can invalidate derived views
+        self.version = 0
+        # Highest numeric patient ID seen, used to reconcile the ID sequence
+        self.max_id_number: Optional[int] = None
+        self.lock = RWLock()
+        # Serializes the lazy index builds (readers share the read lock)
+        self._build_lock = threading.Lock()
+        if patients:
+            self.extend(patients)
+
+    # --- mutation ---
+
+    @write_locked
+    def add(self, patient: Patient):
+        """
+        Append one patient and update every index. The id and trigram updates are
+        O(1); the sorted name index finds its slot by bisection (O(log n)) but
+        list.insert shifts the entries after it, and a built bitmap index copies
+        one int per field, so an add is O(n) in the worst case (memory copies,
+        fast in practice). Use extend() for bulk loads.
+        """
+        position = len(self._patients)
+        self._index_patient(patient, position)
+        self.table.append(patient)
+        key = self._names[position]
+        i = bisect_right(self._name_keys, key)
+        self._name_keys.insert(i, key)
+        self._name_positions.insert(i, position)
+        self.version += 1
+
+    # Keep list-style call sites working
+    append = add
+
+    @write_locked
+    def extend(self, patients: Iterable[Patient]):
+        """Bulk add: index everything, then rebuild the name index with a single sort."""
+        start = len(self._patients)
+        if isinstance(patients, PatientTable):
+            if start:
+                self.table.extend(patients)
+            else:
+                self.table = patients  # its rows are ours now
+            for position, patient in enumerate(patients, start):
+                self._index_patient(patient, position)
+        else:
+            append = self.table.append
+            for position, patient in enumerate(patients, start):
+                self._index_patient(patient, position)
+                append(patient)
+        if len(self._patients) == start:
+            return
+        order = sorted(range(len(self._names)), key=self._names.__getitem__)
+        self._name_keys = [self._names[i] for i in order]
+        self._name_positions = order
+        self.version += 1
+
+    def _index_patient(self, patient: Patient, position: int):
+        self._patients.append(patient)
+        self._by_id.setdefault(patient.patient_id, patient)
+        number = parse_patient_id(patient.patient_id)
+        if number is not None and (self.max_id_number is None or number > self.max_id_number):
+            self.max_id_number = number
+        key = normalize_name(patient.name)
+        self._names.append(key)
+        if self._trigrams is not None:
+            self._trigrams.add(key)
+        if self._bitmaps is not None:
+            self._bitmaps.add(patient)
+
+    # --- lookups ---
+
+    def get(self, patient_id: str) -> Optional[Patient]:
+        """O(1) lookup by patient_id."""
+        return self._by_id.get(patient_id)
+
+    @METRICS.timed("search_seconds", method="find_by_name")
+    @read_locked
+    def find_by_name(self, name: str) -> List[Patient]:
+        """All patients whose normalized name equals `name`, in name order."""
+        key = normalize_name(name)
+        lo = bisect_left(self._name_keys, key)
+        hi = bisect_right(self._name_keys, key, lo)
+        return [self._patients[i] for i in self._name_positions[lo:hi]]
+
+    @METRICS.timed("search_seconds", method="find_by_name_prefix")
+    @read_locked
+    def find_by_name_prefix(self, prefix: str) -> List[Patient]:
+        """All patients whose normalized name starts with `prefix`, in name order."""
+        key = normalize_name(prefix)
+        lo = bisect_left(self._name_keys, key)
+        hi = lo
+        keys = self._name_keys
+        while hi < len(keys) and keys[hi].startswith(key):
+            hi += 1
+        return [self._patients[i] for i in self._name_positions[lo:hi]]
+
+    @METRICS.timed("search_seconds", method="find_by_name_range")
+    @read_locked
+    def find_by_name_range(self, start: Optional[str] = None, end: Optional[str] = None,
+                           inclusive: bool = True) -> List[Patient]:
+        """
+        All patients whose normalized name lies between `start` and `end`, in name
+        order (None = unbounded). With inclusive, names equal to `end` are included,
+        e.g. find_by_name_range("anna", "bob") includes "bob" but not "bobby".
+        """
+        keys = self._name_keys
+        lo = bisect_left(keys, normalize_name(start)) if start is not None else 0
+        if end is None:
+            hi = len(keys)
+        elif inclusive:
+            hi = bisect_right(keys, normalize_name(end), lo)
+        else:
+            hi = bisect_left(keys, normalize_name(end), lo)
+        return [self._patients[i] for i in self._name_positions[lo:hi]]
+
+    @property
+    def trigrams(self) -> TrigramIndex:
+        if self._trigrams is None:
+            with self._build_lock:
+                if self._trigrams is None:
+                    self._trigrams = TrigramIndex(self._names)
+        return self._trigrams
+
+    @METRICS.timed("search_seconds", method="search_name")
+    @read_locked
+    def search_name(self, term: str) -> List[Patient]:
+        """Substring match against the normalized names (trigram index), in registration order."""
+        return [self._patients[i] for i in self.trigrams.substring(normalize_name(term))]
+
+    @METRICS.timed("search_seconds", method="search_name_fuzzy")
+    @read_locked
+    def search_name_fuzzy(self, term: str, limit: int = 10) -> List[Patient]:
+        """Typo-tolerant name search, best match first (see TrigramIndex.fuzzy)."""
+        return [self._patients[i] for _, i in self.trigrams.fuzzy(normalize_name(term), limit)]
+
+    @property
+    def bitmaps(self) -> BitmapIndex:
+        if self._bitmaps is None:
+            with self._build_lock:
+                if self._bitmaps is None:
+                    self._bitmaps = BitmapIndex(self._patients)
+        return self._bitmaps
+
+    @read_locked
+    def find_by(self, field: str, value: Optional[str]) -> List[Patient]:
+        """Bitmap index lookup, e.g. find_by('insurance_type', 'private'), in registration order."""
+        return [self._patients[i] for i in iter_positions(self.bitmaps.bitmap(field, value))]
+
+    @METRICS.timed("search_seconds", method="filter")
+    @read_locked
+    def filter(self, expression: str) -> List[Patient]:
+        """Patients matching a boolean filter (see BitmapIndex.evaluate), in registration order."""
+        return [self._patients[i] for i in iter_positions(self.bitmaps.evaluate(expression))]
+
+    @METRICS.timed("search_seconds", method="count")
+    @read_locked
+    def count(self, expression: str) -> int:
+        """Number of patients matching a boolean filter, without building the list."""
+        return self.bitmaps.count(expression)
+
+    # --- list compatibility ---
+
+    def __len__(self) -> int:
+        return len(self._patients)
+
+    def __iter__(self) -> Iterator[Patient]:
+        return iter(self._patients)
+
+    def __getitem__(self, item):
+        return self._patients[item]
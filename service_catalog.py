@@ -0,0 +1,319 @@
+"""
+Versioned, hot-reloadable price list.
+    python service_catalog.py versions            # every price list payments were billed with
+    python service_catalog.py rebill [--patient P1001] [--from 2025-01-01] [--to ...]
+A version is a short hash of the price table, so the same prices get the same
+version in every process and after restarts. A version is archived through the
+storage backend (data/price_versions.csv or the price_versions table) when it is
+published explicitly or just before the first payment carrying it is stored, so
+merely loading the price list (e.g. `versions`, a dry run) writes nothing.
+"""
+import hashlib
+import os
+import select
+import struct
+import sys
+import threading
+from itertools import groupby
+from typing import Dict, Iterator, List, Optional, Tuple
+from billing_rules import CompiledBillingRules
+from metrics import METRICS
+from money import format_cents, parse_cents
+from payment_history import payment_key
+from utilities import load_services_csv
+
+ENV_WATCH = "HOSPITAL_PRICE_WATCH"  # seconds between price list checks, 0 = never reload
+WATCH_INTERVAL = 2.0
+
+# inotify(7) events for "the file in this directory was rewritten or replaced"
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_EVENT = struct.Struct("iIII")
+
+
+def price_version(services: Dict[str, int]) -> str:
+    """Short content hash of a price table (independent of service order)."""
+    text = "\n".join(f"{service}\t{price}" for service, price in sorted(services.items()))
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:10]
+
+
+def watch_interval() -> float:
+    """Seconds between price list checks from $HOSPITAL_PRICE_WATCH (0 turns reloading off)."""
+    value = os.environ.get(ENV_WATCH)
+    if not value:
+        return WATCH_INTERVAL
+    try:
+        return float(value)
+    except ValueError:
+        print(f"Warning: {ENV_WATCH}={value!r} is not a number of seconds; using {WATCH_INTERVAL}.")
+        return WATCH_INTERVAL
+
+
+def _file_stamp(path: Optional[str]) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _inotify(directory: str) -> Optional[int]:
+    """A non-blocking inotify descriptor watching `directory`, or None where unavailable (non-Linux)."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(directory), _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+
+def _changed_names(fd: int) -> Iterator[str]:
+    """Drain pending inotify events and yield the file names they are about."""
+    while True:
+        try:
+            data = os.read(fd, 4096)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            _, _, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            yield data[offset:offset + length].rstrip(b"\0").decode('utf-8', 'replace')
+            offset += length
+
+
+class ServiceCatalog:
+    """
+    The price list as a series of immutable versions.
+    - current: CompiledBillingRules in effect (with .version and .services); billing
+      reads it once per bill and never locks, publish() replaces it with one
+      assignment, so bills in flight finish on the version they started with
+    - publish(services): compile, archive (first time a version is seen) and go live;
+      the price list loaded on construction goes live without being archived
+    - ensure_archived(version): archive a live version before a payment carries it
+      (BillingSystem calls it on every save; O(1) once the version is archived)
+    - reload(): publish the price list file again if its mtime/size changed
+    - watch(): daemon thread calling reload() on inotify events for the file
+      (Linux) or every `interval` seconds (mtime polling) elsewhere
+    - rules_for(version): any archived version, compiled once and cached, for
+      re-billing past payments with the prices they were billed at
+    """
+
+    def __init__(self, storage, services: Optional[Dict[str, int]] = None, path: Optional[str] = None):
+        self.storage = storage
+        self.path = path if path is not None else storage.price_list_path
+        self._stamp = _file_stamp(self.path)
+        # Only publishers take the lock (reload vs. update_prices); billing never does
+        self._lock = threading.Lock()
+        # version -> compiled rules, filled from the archive on demand
+        self._versions: Dict[str, CompiledBillingRules] = {}
+        self._archive: Optional[Dict[str, Dict[str, int]]] = None
+        self._unknown = set()  # versions looked up and not in the archive
+        self._saved = set()  # versions known to be in the archive (ensure_archived fast path)
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.current: Optional[CompiledBillingRules] = None
+        self._go_live(services if services is not None else storage.load_services())
+
+    def publish(self, services: Dict[str, int]) -> CompiledBillingRules:
+        """Make `services` the live price list and archive it; returns its rules (the current ones if unchanged)."""
+        rules = self._go_live(services)
+        self.ensure_archived(rules.version)
+        return rules
+
+    def _go_live(self, services: Dict[str, int]) -> CompiledBillingRules:
+        version = price_version(services)
+        with self._lock:
+            current = self.current
+            if current is not None and current.version == version:
+                return current
+            rules = self._versions.get(version)
+            if rules is None:
+                rules = CompiledBillingRules(services, version=version)
+                if rules.missing_services:
+                    print(f"Warning: billing rules reference unknown services: {', '.join(rules.missing_services)}")
+                self._versions[version] = rules
+            self.current = rules
+        METRICS.inc("price_list_swaps_total")
+        return rules
+
+    def ensure_archived(self, version: Optional[str]):
+        """Archive a version this catalog compiled, unless the archive already has it."""
+        if not version or version in self._saved:
+            return
+        with self._lock:
+            rules = self._versions.get(version)
+            if rules is None:
+                return  # not ours to archive (rules_for only compiles archived versions)
+            if version not in self._archived_versions():
+                self.storage.save_price_version(version, rules.services)
+                self._archive[version] = dict(rules.services)
+            self._unknown.discard(version)
+            self._saved.add(version)
+
+    def _archived_versions(self) -> Dict[str, Dict[str, int]]:
+        if self._archive is None:
+            self._archive = self.storage.load_price_versions()
+        return self._archive
+
+    def versions(self) -> Dict[str, Dict[str, int]]:
+        """Every archived version -> its prices (cents), oldest first."""
+        with self._lock:
+            return {version: dict(services) for version, services in self._archived_versions().items()}
+
+    def rules_for(self, version: Optional[str]) -> Optional[CompiledBillingRules]:
+        """Rules of an archived version, or None for untagged payments and unknown versions."""
+        if not version:
+            return None
+        rules = self._versions.get(version)
+        if rules is not None or version in self._unknown:
+            return rules
+        with self._lock:
+            services = self._archived_versions().get(version)
+            if services is None:
+                # Another process may have archived it since we last looked
+                self._archive = self.storage.load_price_versions()
+                services = self._archive.get(version)
+                if services is None:
+                    self._unknown.add(version)
+                    return None
+            return self._versions.setdefault(version, CompiledBillingRules(services, version=version))
+
+    def reload(self) -> bool:
+        """Publish the price list file again if it changed; True when a new version went live."""
+        stamp = _file_stamp(self.path)
+        if stamp is None or stamp == self._stamp:
+            return False
+        services = load_services_csv(self.path)
+        if not services:
+            return False  # unreadable or mid-write; the next change triggers another try
+        self._stamp = stamp
+        before = self.current
+        rules = self.publish(services)
+        if rules is not before:
+            print(f"Price list {self.path} reloaded (version {rules.version}).")
+        return rules is not before
+
+    def watch(self, interval: float = WATCH_INTERVAL):
+        """Start the reload thread (no-op without a price list file or when already watching)."""
+        if self.path is None or interval <= 0 or self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="price list watcher",
+                                         daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        if self._watcher is not None:
+            self._stop.set()
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self, interval: float):
+        name = os.path.basename(self.path)
+        fd = _inotify(os.path.dirname(os.path.abspath(self.path)))
+        try:
+            while not self._stop.is_set():
+                if fd is None:
+                    self._stop.wait(interval)
+                else:
+                    # Woken by any change in the directory; the interval bounds how long stop() waits
+                    readable, _, _ = select.select([fd], [], [], interval)
+                    if readable and name not in set(_changed_names(fd)):
+                        continue
+                try:
+                    self.reload()
+                except Exception as e:
+                    print(f"Warning: could not reload the price list: {e}")
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+
+def rebill_payments(catalog: ServiceCatalog, patients, rows) -> Iterator[Dict]:
+    """
+    Re-bill past payments (legacy-format rows, one per service) with the price list
+    version each was billed with. Yields one dict per payment: patient_id, date,
+    version, recorded (total, discounted) and rebilled (total, discounted), the
+    latter None when the payment is untagged, its version unknown or the patient gone.
+    """
+    for key, group in groupby(rows, key=payment_key):
+        patient_id, total, discounted, method, day, version = key
+        services = [row['Service'] for row in group]
+        rules = catalog.rules_for(version)
+        patient = patients.get(patient_id)
+        rebilled = rules.bill(patient) if rules is not None and patient is not None else None
+        yield {
+            "patient_id": patient_id, "date": day, "payment_method": method, "version": version or None,
+            "services": services, "recorded": (parse_cents(total), parse_cents(discounted)), "rebilled": rebilled,
+        }
+
+
+def main(argv: List[str]) -> int:
+    import argparse
+    from registry import PatientRegistry
+    from storage import open_storage
+
+    parser = argparse.ArgumentParser(description="Versioned price lists")
+    parser.add_argument("--storage", choices=("csv", "sqlite"), help="backend (default: $HOSPITAL_STORAGE or csv)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("versions", help="list archived price list versions")
+    rebill = commands.add_parser("rebill", help="re-bill past payments with their own price list version")
+    rebill.add_argument("--patient", help="only this PatientID")
+    rebill.add_argument("--from", dest="date_from", help="first date, YYYY-MM-DD")
+    rebill.add_argument("--to", dest="date_to", help="last date, YYYY-MM-DD")
+    rebill.add_argument("--show", type=int, default=20, help="mismatches to print")
+    args = parser.parse_args(argv)
+
+    storage = open_storage(args.storage)
+    try:
+        catalog = ServiceCatalog(storage)
+        if args.command == "versions":
+            versions = catalog.versions()
+            current = catalog.current
+            archived = current.version in versions
+            if not archived:
+                versions[current.version] = current.services
+            for version, services in versions.items():
+                marker = ""
+                if version == current.version:
+                    marker = " (current)" if archived else " (current, archived with its first payment)"
+                prices = ", ".join(f"{service} {format_cents(price)}" for service, price in services.items())
+                print(f"{version}{marker}: {prices}")
+            return 0
+
+        patients = PatientRegistry(storage.load_state().patients)
+        rows = storage.iter_payments(patient_id=args.patient, date_from=args.date_from, date_to=args.date_to)
+        counts = {"payments": 0, "matching": 0, "mismatched": 0, "unversioned": 0}
+        for payment in rebill_payments(catalog, patients, rows if storage.has_payments() else ()):
+            counts["payments"] += 1
+            if payment["rebilled"] is None:
+                counts["unversioned"] += 1
+            elif payment["rebilled"] == payment["recorded"]:
+                counts["matching"] += 1
+            else:
+                counts["mismatched"] += 1
+                if counts["mismatched"] <= args.show:
+                    recorded, rebilled = payment["recorded"], payment["rebilled"]
+                    print(f"{payment['date']} {payment['patient_id']} version {payment['version']}: "
+                          f"recorded {format_cents(recorded[0])}/{format_cents(recorded[1])}, "
+                          f"rebilled {format_cents(rebilled[0])}/{format_cents(rebilled[1])}")
+        print(f"{counts['payments']:,} payments: {counts['matching']:,} match their price list, "
+              f"{counts['mismatched']:,} differ, {counts['unversioned']:,} untagged or unknown version")
+        return 1 if counts["mismatched"] else 0
+    finally:
+        storage.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
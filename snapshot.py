@@ -0,0 +1,233 @@
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from typing import Dict, List, Optional, Tuple
+from doctors import DoctorDirectory, read_doctors_csv
+from parallel_ingest import load_patient_table
+from patient import Doctor
+from patient_table import PatientTable
+from utilities import load_services_csv
+
+MAGIC = b"HOSPSNAP"
+VERSION = 2
+SNAPSHOT_PATH = "data/hospital.snapshot"
+SOURCES = {
+    "billing": "data/billing.csv",
+    "doctors": "data/doctors.csv",
+    "patients": "data/patients.csv",
+}
+
+# magic, version, then (size, mtime_ns, tail_crc) for billing, doctors, patients
+_HEADER = struct.Struct("<8sI" + "QqI" * 3)
+_COUNTS = struct.Struct("<III")  # services, doctors, patients
+_BLOB = struct.Struct("<II")  # string count, byte length
+_TAIL = 4096  # bytes hashed at the end of each source to detect rewrites
+_NO_DOCTOR = 0
+
+
+class HospitalState:
+    """Everything HospitalSystem needs at start: prices (cents), the doctor directory, patients."""
+
+    def __init__(self, services: Dict[str, int], doctors: DoctorDirectory, patients: PatientTable):
+        self.services = services
+        self.doctors = doctors
+        self.patients = patients
+
+
+def _fingerprint(path: str, size: Optional[int] = None) -> Tuple[int, int, int]:
+    """(size, mtime_ns, crc32 of the last 4 KiB before `size`) or zeros if missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return 0, 0, 0
+    size = stat.st_size if size is None else size
+    with open(path, 'rb') as f:
+        f.seek(max(0, size - _TAIL))
+        crc = zlib.crc32(f.read(min(size, _TAIL)))
+    return size, stat.st_mtime_ns, crc
+
+
+def _pack_strings(strings: List[str]) -> bytes:
+    blob = "\0".join(strings).encode('utf-8')
+    return _BLOB.pack(len(strings), len(blob)) + blob
+
+
+def _pad(out: bytearray, alignment: int = 4):
+    out.extend(b"\0" * (-len(out) % alignment))
+
+
+def write_snapshot(state: HospitalState, path: str = SNAPSHOT_PATH, sources: Dict[str, str] = SOURCES):
+    """
+    Layout (little endian):
+      header: magic, version, fingerprint of each source CSV
+      counts: services, doctors, patients
+      string blobs are NUL-joined UTF-8 (count and length prefixed), fixed-width
+      columns are raw arrays aligned to their item size:
+        services: names blob, prices int64[n]
+        doctors: ids, names, departments blobs
+        insurance type values blob
+        patients: ids blob, names blob, ages u8[n], flags u8[n],
+                  insurance type codes u8[n], doctor codes u32[n] (0 = none, else doctor index + 1)
+    Doctor IDs referenced by patients but missing from doctors.csv get trailing
+    entries (blank name and department) after the listed doctors.
+    """
+    table = state.patients
+    doctor_ids = [d.doctor_id for d in state.doctors]
+    doctor_names = [d.name for d in state.doctors]
+    departments = [d.department for d in state.doctors]
+    doctor_codes = {doctor_id: i + 1 for i, doctor_id in enumerate(doctor_ids)}
+    for doctor_id in set(table.doctors):
+        if doctor_id is not None and doctor_id not in doctor_codes:
+            doctor_ids.append(doctor_id)
+            doctor_codes[doctor_id] = len(doctor_ids)
+    doctor_names += [""] * (len(doctor_ids) - len(doctor_names))
+    departments += [""] * (len(doctor_ids) - len(departments))
+
+    out = bytearray()
+    fingerprints = []
+    for name in ("billing", "doctors", "patients"):
+        fingerprints.extend(_fingerprint(sources[name]))
+    out += _HEADER.pack(MAGIC, VERSION, *fingerprints)
+    n_listed = len(state.doctors)
+    out += _COUNTS.pack(len(state.services), n_listed, len(table))
+
+    out += _pack_strings(list(state.services))
+    _pad(out, 8)
+    out += array('q', state.services.values()).tobytes()
+
+    out += _pack_strings(doctor_ids)
+    out += _pack_strings(doctor_names)
+    out += _pack_strings(departments)
+
+    out += _pack_strings([v if v is not None else "" for v in table.insurance_type_values[1:]])
+    out += _pack_strings(table.patient_ids)
+    out += _pack_strings(table.names)
+    out += table.ages.tobytes()
+    out += table.flags.tobytes()
+    _pad(out, table.insurance_types.itemsize)  # no-op for the usual 'B' codes
+    out += table.insurance_types.tobytes()
+    _pad(out)
+    out += array('I', [doctor_codes[d] if d is not None else _NO_DOCTOR for d in table.doctors]).tobytes()
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(out)
+    os.replace(tmp_path, path)
+
+
+class _Reader:
+    def __init__(self, view: memoryview, offset: int):
+        self.view = view
+        self.offset = offset
+
+    def strings(self) -> List[str]:
+        """One NUL-joined blob -> list of str (a single decode and split, no per-row work)."""
+        count, length = _BLOB.unpack_from(self.view, self.offset)
+        start = self.offset + _BLOB.size
+        self.offset = start + length
+        if count == 0:
+            return []
+        strings = str(self.view[start:self.offset], 'utf-8').split("\0")
+        if len(strings) != count:
+            raise ValueError("corrupt snapshot string blob")
+        return strings
+
+    def array(self, typecode: str, count: int) -> array:
+        values = array(typecode)
+        self.offset += -self.offset % values.itemsize
+        start = self.offset
+        self.offset += count * values.itemsize
+        values.frombytes(self.view[start:self.offset])
+        return values
+
+
+def read_snapshot(path: str = SNAPSHOT_PATH, sources: Dict[str, str] = SOURCES) -> Optional[Tuple[HospitalState, int]]:
+    """
+    Map the snapshot and rebuild the state without parsing any rows.
+    Returns (state, patients_size) where patients_size is how much of patients.csv
+    the snapshot covers (rows after it still have to be read), or None when the
+    snapshot is missing, corrupt or its sources changed.
+    """
+    try:
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return _read(memoryview(mapped), sources)
+    except (OSError, ValueError, struct.error, UnicodeDecodeError):
+        return None
+
+
+def _read(view: memoryview, sources: Dict[str, str]):
+    try:
+        header = _HEADER.unpack_from(view, 0)
+        if header[0] != MAGIC or header[1] != VERSION:
+            return None
+        stored = [header[2 + i * 3: 5 + i * 3] for i in range(3)]
+        # billing and doctors must be unchanged; patients.csv may only have grown
+        for name, fingerprint in zip(("billing", "doctors"), stored):
+            if _fingerprint(sources[name]) != fingerprint:
+                return None
+        # patients.csv is append-only: accept it if it only grew and the bytes just
+        # before the covered size are unchanged; any other change invalidates
+        patients_size, _, patients_crc = stored[2]
+        current = _fingerprint(sources["patients"])
+        if current != stored[2]:
+            if current[0] <= patients_size or _fingerprint(sources["patients"], patients_size)[2] != patients_crc:
+                return None
+
+        n_services, n_listed, n_patients = _COUNTS.unpack_from(view, _HEADER.size)
+        reader = _Reader(view, _HEADER.size + _COUNTS.size)
+
+        services = dict(zip(reader.strings(), reader.array('q', n_services).tolist()))
+
+        doctor_ids = reader.strings()
+        doctor_names = reader.strings()
+        departments = reader.strings()
+        doctors = DoctorDirectory(map(Doctor, doctor_ids[:n_listed], doctor_names, departments))
+        doctor_list = [None] + list(map(sys.intern, doctor_ids))
+
+        table = PatientTable()
+        for value in reader.strings():
+            table.insurance_type_code(value)
+        table.patient_ids = reader.strings()
+        table.names = reader.strings()
+        table.ages = reader.array('B', n_patients)
+        table.flags = reader.array('B', n_patients)
+        # insurance_type_code() above widened the empty code array to fit the values
+        table.insurance_types = reader.array(table.insurance_types.typecode, n_patients)
+        table.doctors = list(map(doctor_list.__getitem__, reader.array('I', n_patients)))
+        return HospitalState(services, doctors, table), patients_size
+    finally:
+        view.release()
+
+
+def load_state(path: str = SNAPSHOT_PATH, sources: Dict[str, str] = SOURCES) -> HospitalState:
+    """
+    Hot start path: read the snapshot and only parse patients.csv rows appended since
+    it was written. Falls back to parsing all three CSVs (and writes a fresh
+    snapshot) when it is missing or stale; patients.csv is parsed on every core
+    when it is large (parallel_ingest.load_patient_table).
+    """
+    loaded = read_snapshot(path, sources)
+    if loaded is not None:
+        state, covered = loaded
+        if covered < _fingerprint(sources["patients"])[0]:
+            state.patients.extend(load_patient_table(sources["patients"], offset=covered))
+            _try_write(state, path, sources)
+        return state
+
+    services = load_services_csv(sources["billing"])
+    doctors = read_doctors_csv(sources["doctors"])
+    patients = load_patient_table(sources["patients"])
+    state = HospitalState(services, doctors, patients)
+    _try_write(state, path, sources)
+    return state
+
+
+def _try_write(state: HospitalState, path: str, sources: Dict[str, str]):
+    try:
+        write_snapshot(state, path, sources)
+    except OSError as e:
+        print(f"Warning: could not write snapshot {path}: {e}")
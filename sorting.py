@@ -0,0 +1,141 @@
+import statistics
+import threading
+import time
+from operator import attrgetter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+from registry import PatientRegistry, normalize_name
+from metrics import METRICS
+from utilities import bubble_sort_patients_by_age, merge_sort_patients_by_name
+
+# Sort keys by name: each is computed once per patient, never per comparison
+SORT_KEYS: Dict[str, Callable] = {
+    "age": attrgetter("age"),
+    "name": lambda patient: normalize_name(patient.name),
+    "patient_id": attrgetter("patient_id"),
+    "insurance_type": lambda patient: patient.insurance_type or "",
+}
+
+# The loop-based baselines are only timed up to these sizes
+BUBBLE_LIMIT = 2_000
+MERGE_LIMIT = 200_000
+
+
+def _parse_keys(keys: Union[str, Sequence[str]]) -> Tuple[Tuple[str, bool], ...]:
+    """"age" / ("-age", "name") -> ((field, descending), ...)"""
+    if isinstance(keys, str):
+        keys = (keys,)
+    parsed = []
+    for key in keys:
+        field = key.lstrip("-")
+        if field not in SORT_KEYS:
+            raise KeyError(f"Unknown sort key {field!r} (expected one of {', '.join(SORT_KEYS)})")
+        parsed.append((field, key.startswith("-")))
+    if not parsed:
+        raise ValueError("At least one sort key is required")
+    return tuple(parsed)
+
+
+class SortService:
+    """
+    Sorted patient listings over a PatientRegistry.
+    - key columns: every sort key is computed once per patient (casefolded names,
+      ages, ...) and kept; the registry is append-only, so only patients added
+      since the last call are keyed
+    - sorted(keys): Timsort (list.sort) over patient positions using those columns;
+      several keys ("age", "name") or descending ones ("-age") are applied as stable
+      passes from the last key to the first, so ties keep registration order
+    - views are cached per key tuple and rebuilt only when registry.version changes,
+      so repeated listings are O(1)
+    - a view is rebuilt under the registry's read lock plus the service's own lock
+      (key columns, view cache), so threads may share one SortService
+    The loop-based utilities.bubble_sort_patients_by_age / merge_sort_patients_by_name
+    stay as teaching and benchmark baselines.
+    """
+
+    def __init__(self, registry: PatientRegistry):
+        self.registry = registry
+        self._columns: Dict[str, List] = {}
+        self._views: Dict[Tuple[Tuple[str, bool], ...], Tuple[int, Tuple]] = {}
+        self._lock = threading.Lock()
+
+    def column(self, field: str) -> List:
+        """Key values of `field` for every patient, by registration position."""
+        values = self._columns.setdefault(field, [])
+        if len(values) < len(self.registry):
+            key = SORT_KEYS[field]
+            values.extend(key(self.registry[i]) for i in range(len(values), len(self.registry)))
+        return values
+
+    def order(self, keys: Union[str, Sequence[str]]) -> List[int]:
+        """Registry positions in sorted order (stable)."""
+        positions = list(range(len(self.registry)))
+        for field, descending in reversed(_parse_keys(keys)):
+            positions.sort(key=self.column(field).__getitem__, reverse=descending)
+        return positions
+
+    def cached(self, keys: Union[str, Sequence[str]]) -> Optional[Tuple]:
+        """The cached view for `keys` if it is still current, else None (never sorts)."""
+        cached = self._views.get(_parse_keys(keys))
+        if cached is not None and cached[0] == self.registry.version:
+            return cached[1]
+        return None
+
+    @METRICS.timed("operation_seconds", op="sort")
+    def sorted(self, keys: Union[str, Sequence[str]]) -> Tuple:
+        """Patients sorted by `keys`, e.g. sorted("age") or sorted(("-age", "name")); cached."""
+        parsed = _parse_keys(keys)
+        cached = self._views.get(parsed)
+        if cached is not None and cached[0] == self.registry.version:
+            return cached[1]
+        with self.registry.lock.read(), self._lock:
+            version = self.registry.version
+            cached = self._views.get(parsed)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            spec = [("-" if descending else "") + field for field, descending in parsed]
+            patients = self.registry
+            view = tuple(patients[i] for i in self.order(spec))
+            self._views[parsed] = (version, view)
+            return view
+
+    def invalidate(self):
+        """Drop every cached view and key column (e.g. after editing patients in place)."""
+        with self._lock:
+            self._columns.clear()
+            self._views.clear()
+
+
+def run_sorts(bench: Callable, patients) -> None:
+    """
+    Time the sort cases over any patient sequence. bench(group, name, func, scale,
+    ops=...) times one case: benchmarks.harness.Harness.bench in the benchmark
+    suite, a plain perf_counter loop in compare_sort_performance.
+    """
+    registry = patients if isinstance(patients, PatientRegistry) else PatientRegistry(patients)
+    n = len(registry)
+    if n <= BUBBLE_LIMIT:
+        bench("sorts", "baseline_bubble_by_age", lambda: bubble_sort_patients_by_age(registry[:]), n, ops=n)
+    if n <= MERGE_LIMIT:
+        bench("sorts", "baseline_merge_by_name", lambda: merge_sort_patients_by_name(registry[:]), n, ops=n)
+    for keys in ("age", "name", ("age", "name")):
+        label = "timsort_" + "_".join((keys,) if isinstance(keys, str) else keys)
+        bench("sorts", label, lambda: SortService(registry).sorted(keys), n, ops=n)
+    sorter = SortService(registry)
+    sorter.sorted(("age", "name"))
+    bench("sorts", "timsort_cached_view", lambda: sorter.sorted(("age", "name")), n, ops=n)
+
+
+def compare_sort_performance(patients, repeat: int = 3):
+    """
+    Sort timings for the menu: the median of `repeat` runs (after one warm-up) of
+    each run_sorts case. Bubble and merge sort are skipped above their size
+    limits; benchmarks/suite.py times the same cases with percentiles.
+    """
+    def bench(group, name, func, scale, ops=1):
+        samples = []
+        for _ in range(repeat + 1):
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+        print(f"{name:<28} {statistics.median(samples[1:]):.6f} seconds ({scale:,} patients)")
+    run_sorts(bench, patients)
@@ -0,0 +1,93 @@
+import builtins
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from typing import List, Optional, Tuple
+
+ENV_FLAG = "HOSPITAL_PROFILE_STARTUP"
+CLI_FLAG = "--profile-startup"
+
+
+class StartupProfiler:
+    """
+    Built-in equivalent of `python -X importtime` plus named phases, for checking how
+    long the kiosk takes to reach the main menu.
+    - install(): wraps builtins.__import__ and times every first-time import
+      (self and cumulative microseconds, nested like -X importtime)
+    - phase(name): context manager timing a startup step (e.g. "load patients")
+    - report(): prints both tables and the elapsed time to stderr
+    Enabled with --profile-startup or HOSPITAL_PROFILE_STARTUP=1.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter_ns()
+        self.imports: List[Tuple[int, str, int, int]] = []  # (depth, module, self ns, cumulative ns)
+        self.phases: List[Tuple[str, int]] = []
+        self._children: List[int] = []
+        self._original_import = None
+        self.reported = False
+
+    @classmethod
+    def from_argv(cls, argv: List[str]) -> Optional["StartupProfiler"]:
+        """Create and install a profiler if requested on the command line or environment."""
+        requested = CLI_FLAG in argv or os.environ.get(ENV_FLAG, "") not in ("", "0")
+        if not requested:
+            return None
+        if CLI_FLAG in argv:
+            argv.remove(CLI_FLAG)
+        profiler = cls()
+        profiler.install()
+        return profiler
+
+    def install(self):
+        if self._original_import is None:
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._import
+
+    def uninstall(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level == 0 and name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+        self._children.append(0)
+        start = time.perf_counter_ns()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            children = self._children.pop()
+            if self._children:
+                self._children[-1] += elapsed
+            self.imports.append((len(self._children), name, elapsed - children, elapsed))
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter_ns() - start))
+
+    def report(self, title="main menu", stream=None):
+        """Print the import and phase tables once, with the time since the profiler started."""
+        if self.reported:
+            return
+        self.reported = True
+        stream = stream or sys.stderr
+        total_ms = (time.perf_counter_ns() - self.started) / 1e6
+        print("import time: self [us] | cumulative | imported package", file=stream)
+        for depth, name, self_ns, cumulative_ns in self.imports:
+            print(f"import time: {self_ns // 1000:>9} | {cumulative_ns // 1000:>10} | {'  ' * depth}{name}",
+                  file=stream)
+        for name, elapsed in self.phases:
+            print(f"phase: {name:<28} {elapsed / 1e6:9.2f} ms", file=stream)
+        print(f"startup: reached {title} after {total_ms:.2f} ms", file=stream)
+
+
+def phase(profiler: Optional[StartupProfiler], name: str):
+    """profiler.phase(name), or a no-op when profiling is off."""
+    return profiler.phase(name) if profiler is not None else nullcontext()
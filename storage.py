@@ -0,0 +1,592 @@
+import csv
+import os
+import sys
+import threading
+from abc import ABC, abstractmethod
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from concurrency import locked_cached_property
+from doctors import DoctorDirectory, read_doctors_csv
+from ledger import DailyDate, PaymentLedger, add_price_version_column
+from money import format_cents, parse_cents
+from patient import Doctor, Patient
+from patient_table import PatientTable
+from payment_history import PaymentHistoryIndex, filter_rows, iter_payment_history, payment_key
+from snapshot import HospitalState, SNAPSHOT_PATH, SOURCES, load_state
+from summary import PatientSummary
+from utilities import (
+    PATIENT_FIELDS, _resolve_doctor_cell, load_patients_from_csv,
+    load_services_csv, pandas_patient_summary, patient_to_row
+)
+from writers import CsvAppendWriter, repair_torn_tail
+
+ENV_BACKEND = "HOSPITAL_STORAGE"  # "csv" (default) or "sqlite"
+ENV_DB = "HOSPITAL_DB"
+DB_PATH = "data/hospital.db"
+HISTORY_PATH = "data/payment_history.csv"
+SUMMARY_PATH = "data/patient_summary.json"
+PRICE_VERSION_FIELDS = ['Version', 'Service', 'Price']
+
+# One payment: (patient_id, [(service, cost cents)], total cents, discounted cents, method,
+# price list version or None)
+Payment = Tuple[str, Sequence[Tuple[str, int]], int, int, str, Optional[str]]
+
+
+class StorageBackend(ABC):
+    """
+    Persistence interface used by HospitalSystem, BillingSystem and load_doctors.
+    - load_state(): prices (cents), the DoctorDirectory and every patient at start
+    - add_patients() / record_payments(): batched writes (one transaction / one
+      buffered flush per batch); add_patient() / record_payment() are batches of one
+    - get_patient(), iter_payments(): point lookups and filtered payment history
+      (rows in the legacy payment_history.csv format, amounts as "45.00" strings)
+    - load_summary() / save_summary(): running report aggregates
+    - load_price_versions() / save_price_version(): every price list payments were
+      billed with, by version (see service_catalog); price_list_path is the file
+      the catalog watches for edits (None: prices only change through the app)
+    Backends: CsvBackend (data/*.csv, the default) and SqliteBackend (data/hospital.db).
+    """
+
+    name = ""
+    price_list_path: Optional[str] = None
+
+    @abstractmethod
+    def load_state(self) -> HospitalState:
+        ...
+
+    def load_services(self) -> Dict[str, int]:
+        return self.load_state().services
+
+    def load_doctors(self) -> DoctorDirectory:
+        return self.load_state().doctors
+
+    @abstractmethod
+    def add_patients(self, patients: Iterable[Patient]):
+        ...
+
+    def add_patient(self, patient: Patient):
+        self.add_patients([patient])
+
+    @abstractmethod
+    def get_patient(self, patient_id: str) -> Optional[Patient]:
+        ...
+
+    @abstractmethod
+    def record_payments(self, payments: Iterable[Payment]) -> List[Optional[str]]:
+        ...
+
+    def record_payment(self, patient_id: str, services_used: Sequence[Tuple[str, int]],
+                       total: int, discounted_total: int, payment_method: str,
+                       price_version: Optional[str] = None) -> Optional[str]:
+        """Store one payment (amounts in cents); returns its PaymentID when the backend assigns one."""
+        return self.record_payments([
+            (patient_id, services_used, total, discounted_total, payment_method, price_version)
+        ])[0]
+
+    @abstractmethod
+    def has_payments(self) -> bool:
+        ...
+
+    @abstractmethod
+    def iter_payments(self, patient_id=None, date_from=None, date_to=None,
+                      payment_method=None) -> Iterator[Dict[str, str]]:
+        ...
+
+    @abstractmethod
+    def load_summary(self) -> PatientSummary:
+        ...
+
+    def save_summary(self, summary: PatientSummary):
+        pass
+
+    def load_price_versions(self) -> Dict[str, Dict[str, int]]:
+        return {}
+
+    def save_price_version(self, version: str, services: Dict[str, int]):
+        pass
+
+    @abstractmethod
+    def pandas_summary(self):
+        """Full pandas recompute of the summary report over the stored patients."""
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class CsvBackend(StorageBackend):
+    """
+    The original flat files: state from the binary snapshot over data/*.csv, patients
+    appended through a CsvAppendWriter, payments through the PaymentLedger (each
+    file owned by its own writer thread, so any thread may add or record).
+    Point lookups scan patients.csv; payment filters use the in-memory offset index
+    (history_index, persisted in the .idx sidecar).
+    """
+
+    name = "csv"
+
+    def __init__(self, sources: Dict[str, str] = SOURCES, snapshot_path: str = SNAPSHOT_PATH,
+                 history_path: str = HISTORY_PATH, summary_path: str = SUMMARY_PATH,
+                 ledger_layout: str = "legacy"):
+        self.sources = sources
+        self.snapshot_path = snapshot_path
+        self.history_path = history_path
+        self.summary_path = summary_path
+        self.ledger_layout = ledger_layout
+
+    def load_state(self) -> HospitalState:
+        return load_state(self.snapshot_path, self.sources)
+
+    def load_services(self) -> Dict[str, int]:
+        return load_services_csv(self.sources["billing"])
+
+    def load_doctors(self) -> DoctorDirectory:
+        return read_doctors_csv(self.sources["doctors"])
+
+    @property
+    def price_list_path(self) -> str:
+        return self.sources["billing"]
+
+    @property
+    def price_versions_path(self) -> str:
+        return os.path.join(os.path.dirname(self.sources["billing"]), "price_versions.csv")
+
+    def load_price_versions(self) -> Dict[str, Dict[str, int]]:
+        versions: Dict[str, Dict[str, int]] = {}
+        if os.path.exists(self.price_versions_path):
+            with open(self.price_versions_path, 'r', newline='') as f:
+                for row in csv.DictReader(f):
+                    versions.setdefault(row['Version'], {})[row['Service']] = parse_cents(row['Price'])
+        return versions
+
+    def save_price_version(self, version: str, services: Dict[str, int]):
+        # Rare (once per new price list), so a direct append + fsync instead of a writer thread
+        path = self.price_versions_path
+        repair_torn_tail(path)
+        with open(path, 'a', newline='') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            if f.tell() == 0:
+                writer.writerow(PRICE_VERSION_FIELDS)
+            writer.writerows((version, service, format_cents(price)) for service, price in services.items())
+            f.flush()
+            os.fsync(f.fileno())
+
+    @locked_cached_property
+    def patient_writer(self) -> CsvAppendWriter:
+        # One append-only writer shared by every registration path
+        return CsvAppendWriter(self.sources["patients"], PATIENT_FIELDS)
+
+    @locked_cached_property
+    def ledger(self) -> PaymentLedger:
+        # One long-lived writer for the payment history (batched across payments)
+        directory = os.path.dirname(self.history_path)
+        return PaymentLedger(self.history_path, self.ledger_layout,
+                             payments_path=os.path.join(directory, "payments.csv"),
+                             items_path=os.path.join(directory, "payment_items.csv"))
+
+    @locked_cached_property
+    def history_index(self) -> PaymentHistoryIndex:
+        # Kept in memory; each filtered query only indexes the rows appended since the last
+        return PaymentHistoryIndex(self.history_path)
+
+    def add_patients(self, patients: Iterable[Patient]):
+        self.patient_writer.write_rows([patient_to_row(p) for p in patients])
+
+    def get_patient(self, patient_id: str) -> Optional[Patient]:
+        self.flush()
+        for patient in load_patients_from_csv(self.sources["patients"]):
+            if patient.patient_id == patient_id:
+                return patient
+        return None
+
+    def record_payments(self, payments: Iterable[Payment]) -> List[Optional[str]]:
+        payments = list(payments)
+        if len(payments) == 1:
+            return [self.ledger.record(*payments[0])]
+        return self.ledger.record_many(payments)
+
+    def has_payments(self) -> bool:
+        if self.ledger_layout == "legacy":
+            return os.path.exists(self.history_path)
+        return os.path.exists(self.ledger.payments_path)
+
+    def iter_payments(self, patient_id=None, date_from=None, date_to=None,
+                      payment_method=None) -> Iterator[Dict[str, str]]:
+        filters = dict(patient_id=patient_id, date_from=date_from, date_to=date_to, payment_method=payment_method)
+        if self.ledger_layout == "legacy":
+            self.flush()
+            return iter_payment_history(self.history_path, index=self.history_index, **filters)
+        return filter_rows(self.ledger.iter_legacy_rows(), **filters)
+
+    def load_summary(self) -> PatientSummary:
+        # Open the writer first so it repairs any torn last row before folding
+        self.patient_writer
+        return PatientSummary.load_or_build(self.sources["patients"], self.summary_path)
+
+    def save_summary(self, summary: PatientSummary):
+        self.flush()
+        appended = self.patient_writer.bytes_written if "patient_writer" in vars(self) else 0
+        summary.checkpoint(self.summary_path, self.sources["patients"], appended)
+
+    def pandas_summary(self):
+        self.flush()
+        pandas_patient_summary(self.sources["patients"])
+
+    def flush(self):
+        loaded = vars(self)
+        if "patient_writer" in loaded:
+            self.patient_writer.flush()
+        if "ledger" in loaded:
+            self.ledger.flush()
+
+    def close(self):
+        loaded = vars(self)
+        if "patient_writer" in loaded:
+            self.patient_writer.close()
+        if "ledger" in loaded:
+            self.ledger.close()
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS services (
+    name TEXT PRIMARY KEY,
+    price_cents INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS doctors (
+    doctor_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    department TEXT NOT NULL,
+    position INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS doctors_department ON doctors (department, position);
+CREATE TABLE IF NOT EXISTS patients (
+    seq INTEGER PRIMARY KEY,
+    patient_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    age INTEGER NOT NULL,
+    urgent_care TEXT,
+    specialist_needed TEXT,
+    regular_checkup TEXT,
+    follow_up TEXT,
+    insurance TEXT,
+    chronic_condition TEXT,
+    specific_doctor TEXT,
+    insurance_type TEXT
+);
+CREATE INDEX IF NOT EXISTS patients_id ON patients (patient_id);
+CREATE INDEX IF NOT EXISTS patients_name ON patients (name COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS payments (
+    payment_id INTEGER PRIMARY KEY,
+    patient_id TEXT NOT NULL,
+    total_cents INTEGER NOT NULL,
+    discounted_cents INTEGER NOT NULL,
+    method TEXT NOT NULL,
+    date TEXT NOT NULL,
+    price_version TEXT
+);
+CREATE INDEX IF NOT EXISTS payments_patient ON payments (patient_id, date);
+CREATE INDEX IF NOT EXISTS payments_date ON payments (date);
+CREATE TABLE IF NOT EXISTS payment_items (
+    payment_id INTEGER NOT NULL REFERENCES payments (payment_id),
+    position INTEGER NOT NULL,
+    service TEXT NOT NULL,
+    cost_cents INTEGER NOT NULL,
+    PRIMARY KEY (payment_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS price_versions (
+    version TEXT NOT NULL,
+    service TEXT NOT NULL,
+    price_cents INTEGER NOT NULL,
+    PRIMARY KEY (version, service)
+);
+"""
+
+# Fixed SQL text with ? parameters: sqlite3 keeps the compiled statements in its
+# per-connection cache, so every call after the first reuses a prepared statement.
+_INSERT_SERVICE = "INSERT OR REPLACE INTO services (name, price_cents) VALUES (?, ?)"
+_INSERT_DOCTOR = "INSERT OR REPLACE INTO doctors (doctor_id, name, department, position) VALUES (?, ?, ?, ?)"
+_INSERT_PATIENT = ("INSERT INTO patients (" + ", ".join(PATIENT_FIELDS) + ") VALUES ("
+                   + ", ".join("?" * len(PATIENT_FIELDS)) + ")")
+_INSERT_PAYMENT = ("INSERT INTO payments (patient_id, total_cents, discounted_cents, method, date, price_version) "
+                   "VALUES (?, ?, ?, ?, ?, ?)")
+_INSERT_PRICE_VERSION = "INSERT OR IGNORE INTO price_versions (version, service, price_cents) VALUES (?, ?, ?)"
+_INSERT_ITEM = "INSERT INTO payment_items (payment_id, position, service, cost_cents) VALUES (?, ?, ?, ?)"
+_SELECT_PATIENTS = "SELECT " + ", ".join(PATIENT_FIELDS) + " FROM patients"
+_SELECT_PATIENT = _SELECT_PATIENTS + " WHERE patient_id = ? ORDER BY seq LIMIT 1"
+_SELECT_PAYMENTS = (
+    "SELECT p.patient_id, i.service, i.cost_cents, p.total_cents, p.discounted_cents, p.method, p.date,"
+    " p.price_version"
+    " FROM payments p JOIN payment_items i ON i.payment_id = p.payment_id"
+)
+
+
+class SqliteBackend(StorageBackend):
+    """
+    Single-file SQLite database (stdlib sqlite3) with indexed tables for services,
+    doctors, patients and payments (+ payment_items, one row per service).
+    - WAL journal with synchronous=NORMAL: readers never block the writer and a
+      commit is one sequential WAL append
+    - every batch (add_patients, record_payments, migration) runs in one transaction
+    - lookups by PatientID / name / payment date go through indexes instead of scans
+    - the connection is shared by every thread; writes take a lock so one batch is
+      one transaction
+    Amounts are stored as integer cents. Fill it once with `python storage.py migrate`.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, db_path: str = DB_PATH):
+        # Imported here: sqlite3 costs more at import than the whole CSV start path
+        import sqlite3
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        with self.conn:
+            self.conn.executescript(_SCHEMA)
+            # Databases created before payments were tagged with their price list version
+            if "price_version" not in {row[1] for row in self.conn.execute("PRAGMA table_info(payments)")}:
+                self.conn.execute("ALTER TABLE payments ADD COLUMN price_version TEXT")
+        self.today = DailyDate()
+        self._write_lock = threading.Lock()
+
+    def is_empty(self) -> bool:
+        return self.conn.execute("SELECT NOT EXISTS (SELECT 1 FROM patients)").fetchone()[0] == 1
+
+    # --- reads ---
+
+    def load_services(self) -> Dict[str, int]:
+        return dict(self.conn.execute("SELECT name, price_cents FROM services ORDER BY rowid"))
+
+    def load_doctors(self) -> DoctorDirectory:
+        return DoctorDirectory(Doctor(doctor_id, name, department) for doctor_id, name, department in
+                               self.conn.execute("SELECT doctor_id, name, department FROM doctors ORDER BY position"))
+
+    def load_price_versions(self) -> Dict[str, Dict[str, int]]:
+        versions: Dict[str, Dict[str, int]] = {}
+        for version, service, price in self.conn.execute(
+                "SELECT version, service, price_cents FROM price_versions ORDER BY rowid"):
+            versions.setdefault(version, {})[service] = price
+        return versions
+
+    @staticmethod
+    def _patient(row, resolved: Dict) -> Patient:
+        cell = row[9] or ""
+        if cell in resolved:
+            specific_doctor = resolved[cell]
+        else:
+            specific_doctor = resolved[cell] = _resolve_doctor_cell(cell)
+        return Patient(row[0], row[1], row[2], row[3], row[4], row[5], row[6], row[7], row[8],
+                       specific_doctor, row[10])
+
+    def load_state(self) -> HospitalState:
+        resolved = {}
+        table = PatientTable()
+        for row in self.conn.execute(_SELECT_PATIENTS + " ORDER BY seq"):
+            table.append(self._patient(row, resolved))
+        return HospitalState(self.load_services(), self.load_doctors(), table)
+
+    def get_patient(self, patient_id: str) -> Optional[Patient]:
+        row = self.conn.execute(_SELECT_PATIENT, (patient_id,)).fetchone()
+        if row is None:
+            return None
+        return self._patient(row, {})
+
+    def has_payments(self) -> bool:
+        return self.conn.execute("SELECT EXISTS (SELECT 1 FROM payments)").fetchone()[0] == 1
+
+    def iter_payments(self, patient_id=None, date_from=None, date_to=None,
+                      payment_method=None) -> Iterator[Dict[str, str]]:
+        clauses = []
+        params = []
+        if patient_id is not None:
+            clauses.append("p.patient_id = ?")
+            params.append(patient_id)
+        if date_from is not None:
+            clauses.append("p.date >= ?")
+            params.append(date_from)
+        if date_to is not None:
+            clauses.append("p.date <= ?")
+            params.append(date_to)
+        if payment_method is not None:
+            clauses.append("lower(p.method) = ?")
+            params.append(payment_method)
+        sql = _SELECT_PAYMENTS
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY p.payment_id, i.position"
+        for patient, service, cost, total, discounted, method, day, version in self.conn.execute(sql, params):
+            yield {
+                'PatientID': patient,
+                'Service': service,
+                'Cost': format_cents(cost),
+                'Total': format_cents(total),
+                'DiscountedTotal': format_cents(discounted),
+                'PaymentMethod': method,
+                'Date': day,
+                'PriceVersion': version or '',
+            }
+
+    def load_summary(self) -> PatientSummary:
+        # Built from the table on first use; there is no file offset to checkpoint against
+        summary = PatientSummary()
+        add = summary.add_values
+        for age, urgent_care, insurance, insurance_type in self.conn.execute(
+                "SELECT age, urgent_care, insurance, insurance_type FROM patients ORDER BY seq"):
+            add(age, urgent_care, insurance, insurance_type)
+        return summary
+
+    def pandas_summary(self):
+        pandas_patient_summary(sqlite_path=self.db_path)
+
+    # --- writes ---
+
+    def add_patients(self, patients: Iterable[Patient]):
+        with self._write_lock, self.conn:
+            self.conn.executemany(_INSERT_PATIENT, (patient_to_row(p) for p in patients))
+
+    def record_payments(self, payments: Iterable[Payment]) -> List[Optional[str]]:
+        current_date = self.today()
+        ids = []
+        with self._write_lock, self.conn:
+            for patient_id, services_used, total, discounted_total, payment_method, *version in payments:
+                payment_id = self.conn.execute(
+                    _INSERT_PAYMENT,
+                    (patient_id, total, discounted_total, payment_method, current_date, version[0] if version else None)
+                ).lastrowid
+                self.conn.executemany(_INSERT_ITEM, [
+                    (payment_id, position, service, cost)
+                    for position, (service, cost) in enumerate(services_used)
+                ])
+                ids.append(str(payment_id))
+        return ids
+
+    def save_price_version(self, version: str, services: Dict[str, int]):
+        with self._write_lock, self.conn:
+            self.conn.executemany(_INSERT_PRICE_VERSION,
+                                  [(version, service, price) for service, price in services.items()])
+
+    def import_payment_rows(self, rows: Iterable[Dict[str, str]]) -> Tuple[int, int]:
+        """
+        Load legacy-format history rows (one per service). Consecutive rows with the
+        same patient, totals, method, date and price version form one payment. Returns
+        (payments, skipped rows); runs in the caller's transaction.
+        """
+        payments = 0
+        skipped = 0
+        for (patient_id, total, discounted, method, day, version), group in groupby(rows, key=payment_key):
+            items = []
+            for row in group:
+                try:
+                    items.append((row['Service'], parse_cents(row['Cost'])))
+                except (ValueError, AttributeError):
+                    skipped += 1
+            try:
+                total_cents, discounted_cents = parse_cents(total), parse_cents(discounted)
+            except (ValueError, AttributeError):
+                skipped += len(items)
+                continue
+            if not items:
+                continue
+            payment_id = self.conn.execute(
+                _INSERT_PAYMENT, (patient_id, total_cents, discounted_cents, method, day, version or None)
+            ).lastrowid
+            self.conn.executemany(_INSERT_ITEM, [
+                (payment_id, position, service, cost) for position, (service, cost) in enumerate(items)
+            ])
+            payments += 1
+        return payments, skipped
+
+    def close(self):
+        self.conn.close()
+
+
+def migrate_csv_to_sqlite(source: CsvBackend, dest: SqliteBackend, replace: bool = False) -> Dict[str, int]:
+    """
+    One-shot copy of the CSV data (prices, doctors, patients, payment history) into
+    the database, in a single transaction. Refuses to run on a non-empty database
+    unless replace=True, which clears it first. Returns row counts per table.
+    """
+    if not dest.is_empty() and not replace:
+        raise ValueError(f"{dest.db_path} already holds patients; refusing to overwrite it")
+    conn = dest.conn
+    services = source.load_services()
+    doctors = source.load_doctors()
+    patients = load_patients_from_csv(source.sources["patients"])
+    with conn:
+        for table in ("payment_items", "payments", "patients", "doctors", "services", "price_versions"):
+            conn.execute(f"DELETE FROM {table}")
+        conn.executemany(_INSERT_SERVICE, services.items())
+        conn.executemany(_INSERT_PRICE_VERSION, [
+            (version, service, price)
+            for version, prices in source.load_price_versions().items() for service, price in prices.items()
+        ])
+        conn.executemany(_INSERT_DOCTOR, [
+            (doctor.doctor_id, doctor.name, doctor.department, position)
+            for position, doctor in enumerate(doctors)
+        ])
+        conn.executemany(_INSERT_PATIENT, (patient_to_row(p) for p in patients))
+        payments, skipped = dest.import_payment_rows(source.iter_payments())
+    if skipped:
+        print(f"Warning: skipped {skipped} malformed payment row(s).")
+    return {
+        "services": len(services),
+        "doctors": len(doctors),
+        "patients": len(patients),
+        "payments": payments,
+    }
+
+
+def open_storage(kind: Optional[str] = None, db_path: Optional[str] = None) -> StorageBackend:
+    """Backend named by `kind` or $HOSPITAL_STORAGE ("csv" by default, or "sqlite")."""
+    kind = (kind or os.environ.get(ENV_BACKEND) or "csv").lower()
+    if kind == "csv":
+        return CsvBackend()
+    if kind == "sqlite":
+        backend = SqliteBackend(db_path or os.environ.get(ENV_DB) or DB_PATH)
+        if backend.is_empty() and os.path.exists(SOURCES["patients"]):
+            print(f"Warning: {backend.db_path} has no patients yet. Run `python storage.py migrate` "
+                  "to import data/*.csv.")
+        return backend
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+
+def main(argv: List[str]) -> int:
+    import argparse
+    parser = argparse.ArgumentParser(description="Storage backend tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="copy data/*.csv into the SQLite database")
+    migrate.add_argument("--db", default=os.environ.get(ENV_DB) or DB_PATH)
+    migrate.add_argument("--replace", action="store_true", help="overwrite a non-empty database")
+    sub.add_parser("add-price-version", help="add the PriceVersion column to data/payment_history.csv "
+                                             "(stop every desk first)")
+    args = parser.parse_args(argv)
+
+    if args.command == "add-price-version":
+        path = CsvBackend().history_path
+        if add_price_version_column(path):
+            print(f"Added column PriceVersion to {path}; new payments record their price list version.")
+        else:
+            print(f"{path} already has a PriceVersion column.")
+        return 0
+
+    dest = SqliteBackend(args.db)
+    try:
+        counts = migrate_csv_to_sqlite(CsvBackend(), dest, replace=args.replace)
+    except ValueError as e:
+        print(f"Error: {e} (use --replace)")
+        return 1
+    finally:
+        dest.close()
+    print(f"Migrated into {args.db}: " + ", ".join(f"{n} {table}" for table, n in counts.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
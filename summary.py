@@ -0,0 +1,205 @@
+import csv
+import io
+import json
+import math
+import os
+from typing import Dict, Optional
+
+CHECKPOINT_VERSION = 1
+
+
+class PatientSummary:
+    """
+    Running aggregates behind the Patient Summary Report, kept up to date in O(1)
+    per registered patient instead of re-reading patients.csv with pandas:
+      - counts: urgent / non-urgent, insured / uninsured, private / public,
+        invalid insurance values
+      - age: Welford running mean and variance, min, max
+      - age groups (kids <= 15, adults 16-64, elderly >= 65) and a 10-year histogram
+    Persisted as a JSON checkpoint that remembers how many bytes of patients.csv it
+    covers, so a restart only folds in rows appended since (see load_or_build).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min_age: Optional[int] = None
+        self.max_age: Optional[int] = None
+        self.urgent = 0
+        self.non_urgent = 0
+        self.insured = 0
+        self.uninsured = 0
+        self.invalid_insurance = 0
+        self.private = 0
+        self.public = 0
+        self.kids = 0
+        self.adults = 0
+        self.elderly = 0
+        self.age_histogram: Dict[int, int] = {}  # decade start -> patients
+        self.source_size = 0  # bytes of patients.csv folded in
+
+    def add(self, patient):
+        """Fold one patient (anything with the Patient attributes) into the aggregates."""
+        self.add_values(patient.age, patient.urgent_care, patient.insurance, patient.insurance_type)
+
+    def add_values(self, age: int, urgent_care: str, insurance: str, insurance_type: Optional[str]):
+        self.count += 1
+        delta = age - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (age - self.mean)
+        if self.min_age is None or age < self.min_age:
+            self.min_age = age
+        if self.max_age is None or age > self.max_age:
+            self.max_age = age
+
+        if urgent_care == 'y':
+            self.urgent += 1
+        elif urgent_care == 'n':
+            self.non_urgent += 1
+        if insurance == 'y':
+            self.insured += 1
+            if insurance_type == 'private':
+                self.private += 1
+            elif insurance_type == 'public':
+                self.public += 1
+        elif insurance == 'n':
+            self.uninsured += 1
+        else:
+            self.invalid_insurance += 1
+
+        if age <= 15:
+            self.kids += 1
+        elif age >= 65:
+            self.elderly += 1
+        else:
+            self.adults += 1
+        decade = age // 10 * 10
+        self.age_histogram[decade] = self.age_histogram.get(decade, 0) + 1
+
+    @property
+    def std(self) -> float:
+        """Sample standard deviation (ddof=1, same as pandas)."""
+        if self.count < 2:
+            return math.nan
+        return math.sqrt(self.m2 / (self.count - 1))
+
+    # --- CSV folding ---
+
+    def fold_csv(self, csv_path: str, offset: int = 0):
+        """Add every complete row of csv_path after byte `offset` (0 = whole file)."""
+        if not os.path.exists(csv_path):
+            return
+        with open(csv_path, 'rb') as f:
+            header = next(csv.reader([f.readline().decode('utf-8')]), [])
+            if not header:
+                return
+            columns = {name.lower(): i for i, name in enumerate(header)}
+            i_age = columns['age']
+            i_urgent = columns['urgent_care']
+            i_insurance = columns['insurance']
+            i_type = columns['insurance_type']
+            start = max(offset, f.tell())
+            f.seek(start)
+            data = f.read()
+        complete = data[:data.rfind(b'\n') + 1]
+        for row in csv.reader(io.StringIO(complete.decode('utf-8'))):
+            if len(row) < len(header):
+                continue
+            try:
+                age = int(row[i_age])
+            except ValueError:
+                continue
+            self.add_values(age, row[i_urgent], row[i_insurance], row[i_type])
+        self.source_size = start + len(complete)
+
+    # --- checkpoint ---
+
+    def to_dict(self) -> Dict:
+        data = dict(vars(self))
+        data["age_histogram"] = {str(k): v for k, v in self.age_histogram.items()}
+        data["version"] = CHECKPOINT_VERSION
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "PatientSummary":
+        summary = cls()
+        for key in vars(summary):
+            if key in data:
+                setattr(summary, key, data[key])
+        summary.age_histogram = {int(k): v for k, v in data.get("age_histogram", {}).items()}
+        return summary
+
+    def save(self, checkpoint_path: str):
+        tmp_path = checkpoint_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, checkpoint_path)
+
+    @classmethod
+    def load_or_build(cls, csv_path="data/patients.csv",
+                      checkpoint_path="data/patient_summary.json") -> "PatientSummary":
+        """
+        Load the checkpoint and fold in rows appended to csv_path since it was written.
+        Without a usable checkpoint (missing, other version, CSV shrank) the
+        summary is rebuilt from the whole CSV once.
+        """
+        size = os.path.getsize(csv_path) if os.path.exists(csv_path) else 0
+        summary = None
+        try:
+            with open(checkpoint_path, 'r') as f:
+                data = json.load(f)
+            if data.get("version") == CHECKPOINT_VERSION and data.get("source_size", 0) <= size:
+                summary = cls.from_dict(data)
+        except (OSError, ValueError):
+            pass
+        if summary is None:
+            summary = cls()
+            summary.fold_csv(csv_path)
+        elif summary.source_size < size:
+            summary.fold_csv(csv_path, summary.source_size)
+        return summary
+
+    def checkpoint(self, checkpoint_path: str, csv_path: str, appended_bytes: int):
+        """
+        Persist after this process appended `appended_bytes` to csv_path (and added
+        those patients through add()). If the file grew by anything else meanwhile
+        (another process), the checkpoint is dropped so the next start rebuilds.
+        """
+        size = os.path.getsize(csv_path) if os.path.exists(csv_path) else 0
+        if size == self.source_size + appended_bytes:
+            self.source_size = size
+            self.save(checkpoint_path)
+        elif os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+    # --- report ---
+
+    def print_report(self):
+        """Same text as utilities.pandas_patient_summary, from the running aggregates."""
+        print("\n=== Patient Summary Report ===\n")
+        print("General Statistics:")
+        print("-------------------")
+        print(f"Total Patients      : {self.count}")
+        print(f"Average Age         : {self.mean:.2f}")
+        print(f"Min Age             : {self.min_age}")
+        print(f"Max Age             : {self.max_age}")
+        print(f"Standard Deviation  : {self.std:.2f}\n")
+        print("Categorical Summary:")
+        print("--------------------")
+        print(f"Urgent Cases        : {self.urgent}")
+        print(f"Non-Urgent Cases    : {self.non_urgent}")
+        print(f"With Insurance      : {self.insured}")
+        print(f"Without Insurance   : {self.uninsured}\n")
+        if self.invalid_insurance:
+            print(f"[WARNING] {self.invalid_insurance} patient(s) have blank or invalid insurance values. Please check your CSV.")
+        print("Insurance Type Breakdown:")
+        print("--------------------------")
+        print(f"Private Insurance   : {self.private}")
+        print(f"Public Insurance    : {self.public}")
+        print(f"None/Other          : {self.uninsured}\n")
+        print("Age Distribution Groups:")
+        print("-------------------------")
+        print(f"Kids (≤ 15)         : {self.kids}")
+        print(f"Elderly (≥ 65)      : {self.elderly}")
+        print(f"Adults (16–64)      : {self.adults}\n")
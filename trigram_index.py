@@ -0,0 +1,123 @@
+import heapq
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Set, Tuple
+
+GRAM = 3
+
+
+def trigrams(word: str) -> Set[str]:
+    """Trigrams of one word, padded so its start/end and short words count: "ann" -> " an", "ann", "nn " """
+    padded = f" {word} "
+    return {padded[i:i + GRAM] for i in range(len(padded) - GRAM + 1)}
+
+
+class TrigramIndex:
+    """
+    Name search over normalized names (see registry.normalize_name: NFKC, whitespace
+    collapsed, casefolded), in two levels:
+      - words: word -> positions of the names containing it (array('I'), ascending)
+      - grams: trigram -> vocabulary words containing it
+    Millions of names share a much smaller vocabulary of words, so the trigram work
+    (substring and typo matching) runs over that vocabulary and only the chosen
+    words' posting lists are touched per query.
+    - substring(term): words containing the longest part of the term, their
+      positions, then `term in name` to verify
+    - fuzzy(term): every word of the term matched against similar vocabulary words
+      (exact > prefix > substring > trigram Dice similarity), names ranked by the
+      mean of their per-word scores
+    add() is O(words per name) (plus the trigrams of a word seen for the first time),
+    so the index stays in sync on registration.
+    """
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.names: List[str] = []
+        self.words: Dict[str, array] = {}
+        self.grams: Dict[str, List[str]] = {}
+        for name in names:
+            self.add(name)
+
+    def add(self, name: str):
+        """Index the next position's normalized name."""
+        position = len(self.names)
+        self.names.append(name)
+        words = self.words
+        for word in set(name.split()):
+            posting = words.get(word)
+            if posting is None:
+                posting = words[word] = array('I')
+                for gram in trigrams(word):
+                    self.grams.setdefault(gram, []).append(word)
+            posting.append(position)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def words_containing(self, part: str) -> List[str]:
+        """Vocabulary words with `part` as a substring."""
+        inner = {part[i:i + GRAM] for i in range(len(part) - GRAM + 1)}
+        if not inner:
+            return [word for word in self.words if part in word]
+        rarest = min((self.grams.get(gram, ()) for gram in inner), key=len)
+        return [word for word in rarest if part in word]
+
+    def _positions(self, words: Iterable[str]) -> List[int]:
+        postings = [self.words[word] for word in words]
+        if len(postings) == 1:
+            return list(postings[0])
+        return sorted(set().union(*postings))
+
+    def substring(self, term: str) -> List[int]:
+        """Positions whose name contains `term` (normalized), ascending."""
+        parts = term.split()
+        if not parts:
+            return list(range(len(self.names)))
+        # Inner parts of a multi-word term are whole words; the first may be a word
+        # suffix and the last a prefix, so every part is at least inside some word
+        part = max(parts, key=len)
+        positions = self._positions(self.words_containing(part))
+        if len(parts) == 1:
+            return positions
+        names = self.names
+        return [i for i in positions if term in names[i]]
+
+    def similar_words(self, word: str, limit: int = 50, min_similarity: float = 0.3) -> List[Tuple[float, str]]:
+        """Up to `limit` (score, vocabulary word) pairs for one query word, best first."""
+        query = trigrams(word)
+        shared = Counter()
+        for gram in query:
+            shared.update(self.grams.get(gram, ()))
+        scored = []
+        for candidate, count in shared.items():
+            if candidate == word:
+                score = 1.0
+            elif candidate.startswith(word):
+                score = 0.9
+            elif word in candidate:
+                score = 0.8
+            else:
+                score = min(0.79, 2 * count / (len(query) + len(trigrams(candidate))))
+            if score >= min_similarity:
+                scored.append((score, candidate))
+        return heapq.nlargest(limit, scored)
+
+    def fuzzy(self, term: str, limit: int = 10, min_similarity: float = 0.3) -> List[Tuple[float, int]]:
+        """
+        Up to `limit` (score, position) pairs, best first; score is the mean over the
+        term's words of the best match in the name (1.0 = every word found as is).
+        """
+        parts = term.split()
+        if not parts or not self.names:
+            return []
+        totals: Dict[int, float] = {}
+        for part in parts:
+            best: Dict[int, float] = {}
+            for score, word in self.similar_words(part, min_similarity=min_similarity):
+                for position in self.words[word]:
+                    if best.get(position, 0.0) < score:
+                        best[position] = score
+            for position, score in best.items():
+                totals[position] = totals.get(position, 0.0) + score
+        count = len(parts)
+        ranked = heapq.nlargest(limit, totals.items(), key=lambda item: (item[1], -item[0]))
+        return [(total / count, position) for position, total in ranked]
@@ -1,34 +1,48 @@
 import csv
+import io
 import os
 import ast
-from typing import List
+import sys
+from contextlib import closing
+from functools import lru_cache
+from typing import Dict, List, Optional
 from patient import Patient
-import time
+from money import parse_cents
+
+def validate_input(value: str, kind="text", valid_range=None):
+    """
+    The rules behind get_valid_input, for one value: returns the accepted value
+    (int for "number", 'y'/'n' for "yes_no") or raises ValueError with the message
+    the prompt shows. Also used by the headless batch_admission import.
+    """
+    if kind == "text":
+        if value.strip():
+            return value
+        raise ValueError("Input cannot be empty. Please try again.")
+    if kind == "number":
+        try:
+            num = int(value)
+        except ValueError:
+            raise ValueError("Please enter a valid number.") from None
+        if valid_range and (num < valid_range[0] or num > valid_range[1]):
+            raise ValueError(f"Please enter a number between {valid_range[0]} and {valid_range[1]}.")
+        return num
+    if kind == "yes_no":
+        if value.lower() in ['y', 'n']:
+            return value.lower()
+        raise ValueError("Please enter 'y' or 'n'.")
+    if kind == "choice":
+        if valid_range and value in valid_range:
+            return value
+        raise ValueError(f"Please enter one of the following: {', '.join(str(x) for x in valid_range or ())}")
+    raise ValueError(f"Unknown input kind: {kind}")
 
 def get_valid_input(prompt: str, kind="text", valid_range=None):
     while True:
-        user_input = input(prompt)
-        if kind == "text":
-            if user_input.strip():
-                return user_input
-            print("Input cannot be empty. Please try again.")
-        elif kind == "number":
-            try:
-                num = int(user_input)
-                if valid_range and (num < valid_range[0] or num > valid_range[1]):
-                    print(f"Please enter a number between {valid_range[0]} and {valid_range[1]}.")
-                    continue
-                return num
-            except ValueError:
-                print("Please enter a valid number.")
-        elif kind == "yes_no":
-            if user_input.lower() in ['y', 'n']:
-                return user_input.lower()
-            print("Please enter 'y' or 'n'.")
-        elif kind == "choice":
-            if valid_range and user_input in valid_range:
-                return user_input
-            print(f"Please enter one of the following: {', '.join(str(x) for x in valid_range)}")
+        try:
+            return validate_input(input(prompt), kind, valid_range)
+        except ValueError as e:
+            print(e)
 
 # Loop-based Bubble Sort
 def bubble_sort_patients_by_age(patients):
@@ -70,20 +84,22 @@ def linear_search_patient_by_id(patients, patient_id):
             return patient
     return None
 
-# Recursive Binary Search (on sorted list by name)
+# Iterative Binary Search (on sorted list by name)
+# Kept as a baseline; the menu uses PatientRegistry's maintained name index instead.
 def binary_search_patient_by_name(patients, target_name, low=0, high=None):
     if high is None:
         high = len(patients) - 1
-    if low > high:
-        return None
-    mid = (low + high) // 2
-    mid_name = patients[mid].name.lower()
-    if mid_name == target_name.lower():
-        return patients[mid]
-    elif mid_name > target_name.lower():
-        return binary_search_patient_by_name(patients, target_name, low, mid-1)
-    else:
-        return binary_search_patient_by_name(patients, target_name, mid+1, high)
+    target = target_name.lower()
+    while low <= high:
+        mid = (low + high) // 2
+        mid_name = patients[mid].name.lower()
+        if mid_name == target:
+            return patients[mid]
+        elif mid_name > target:
+            high = mid - 1
+        else:
+            low = mid + 1
+    return None
     
 # Truth Table / Logical Evaluation
 
@@ -94,26 +110,38 @@ def filter_patients_truth_table(patients, urgent=None, insured=None):
             filtered.append(p)
     return filtered
 
-# Performance Analysis
+PATIENT_FIELDS = [
+    'patient_id', 'name', 'age', 'urgent_care', 'specialist_needed',
+    'regular_checkup', 'follow_up', 'insurance', 'chronic_condition',
+    'specific_doctor', 'insurance_type'
+]
 
-def compare_sort_performance(patients):
-    start = time.time()
-    bubble_sort_patients_by_age(patients)
-    bubble_time = time.time() - start
-    start = time.time()
-    merge_sort_patients_by_name(patients)
-    merge_time = time.time() - start
-    print(f"Bubble Sort (by age): {bubble_time:.6f} seconds")
-    print(f"Merge Sort (by name): {merge_time:.6f} seconds")
+@lru_cache(maxsize=1024)
+def _parse_legacy_doctor(cell: str) -> Optional[str]:
+    """
+    Older rows store specific_doctor as a dict literal:
+      "{'DoctorID': 'D012', 'DoctorName': 'Jason Lin'}"
+    Only the DoctorID is kept. Only a handful of distinct values exist, so
+    literal_eval runs once per value.
+    """
+    try:
+        doctor = ast.literal_eval(cell)
+    except (SyntaxError, ValueError):
+        return None
+    if isinstance(doctor, dict) and doctor.get("DoctorID"):
+        return str(doctor["DoctorID"])
+    return None
 
-def load_patients_from_csv(filepath="data/patients.csv") -> List[Patient]:
+def load_patients_from_csv(filepath="data/patients.csv", offset=0) -> List[Patient]:
     """
-    Read CSV. For each row:
-    - Convert y/n strings to 'y'/'n'
-    - Parse specific_doctor via ast.literal_eval if it looks like a dict, else None
-    - Instantiate Patient(patient_id, name, age, urgent_care, specialist_needed,
-                         regular_checkup, follow_up, insurance, chronic_condition,
-                         specific_doctor, insurance_type)
+    Read CSV with csv.reader, addressing columns by position (taken once from the header).
+    - offset: byte position to start reading rows from (0 = right after the header),
+      used to load only the rows appended after a snapshot
+    - specific_doctor holds a DoctorID ("D012"), kept as that (shared) string and
+      resolved through doctors.DoctorDirectory when needed; legacy dict-literal cells
+      go through a cached parser, anything else (blank, 'n') becomes None
+    - Rows that cannot be parsed (or whose age is outside 0-255) are skipped and
+      counted in a warning
     Return list of Patient.
     """
     patients = []
@@ -123,56 +151,91 @@ def load_patients_from_csv(filepath="data/patients.csv") -> List[Patient]:
         print(f"Warning: {filepath} not found. Starting with empty patient list.")
         return patients
     
+    resolved = {}  # raw specific_doctor cell -> shared DoctorID str (or None)
+    skipped = 0
+    
     try:
-        with open(filepath, 'r', newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
+        with open(filepath, 'rb') as raw:
+            header_line = raw.readline()
+            if not header_line:
+                return patients
+            header = next(csv.reader([header_line.decode('utf-8')]))
+            raw.seek(max(offset, raw.tell()))
+            reader = csv.reader(io.TextIOWrapper(raw, encoding='utf-8', newline=''))
+            (i_id, i_name, i_age, i_urgent, i_specialist, i_checkup, i_follow_up,
+             i_insurance, i_chronic, i_doctor, i_insurance_type) = [header.index(f) for f in PATIENT_FIELDS]
+            width = len(header)
+            append = patients.append
             for row in reader:
-                # Convert age to int
-                age = int(row['age'])
-                
-                # Parse specific_doctor
-                specific_doctor = None
-                if row['specific_doctor'] and row['specific_doctor'].strip():
-                    try:
-                        specific_doctor = ast.literal_eval(row['specific_doctor'])
-                    except (SyntaxError, ValueError):
-                        specific_doctor = None
-                
-                # Create Patient object
-                patient = Patient(
-                    patient_id=row['patient_id'],
-                    name=row['name'],
-                    age=age,
-                    urgent_care=row['urgent_care'],
-                    specialist_needed=row['specialist_needed'],
-                    regular_checkup=row['regular_checkup'],
-                    follow_up=row['follow_up'],
-                    insurance=row['insurance'],
-                    chronic_condition=row['chronic_condition'],
-                    specific_doctor=specific_doctor,
-                    insurance_type=row['insurance_type']
-                )
+                if len(row) < width:
+                    skipped += 1
+                    continue
+                try:
+                    age = int(row[i_age])
+                except ValueError:
+                    skipped += 1
+                    continue
+                if not 0 <= age <= 255:
+                    # PatientTable stores ages as unsigned bytes
+                    skipped += 1
+                    continue
                 
-                patients.append(patient)
+                cell = row[i_doctor]
+                if cell in resolved:
+                    specific_doctor = resolved[cell]
+                else:
+                    specific_doctor = _resolve_doctor_cell(cell)
+                    resolved[cell] = specific_doctor
                 
+                append(Patient(
+                    row[i_id], row[i_name], age,
+                    row[i_urgent], row[i_specialist], row[i_checkup], row[i_follow_up],
+                    row[i_insurance], row[i_chronic],
+                    specific_doctor, row[i_insurance_type]
+                ))
+        
+        if skipped:
+            print(f"Warning: skipped {skipped} malformed row(s) in {filepath}.")
         return patients
     except Exception as e:
         print(f"Error loading patients: {e}")
         return []
 
+def _resolve_doctor_cell(cell: str) -> Optional[str]:
+    cell = cell.strip()
+    if not cell:
+        return None
+    if cell.startswith('{'):
+        doctor_id = _parse_legacy_doctor(cell)
+        return sys.intern(doctor_id) if doctor_id is not None else None
+    if cell[0] == 'D' and cell[1:].isdigit():
+        # Kept even when doctors.csv no longer lists it
+        return sys.intern(cell)
+    return None
+
+
+def patient_to_row(patient: Patient) -> List:
+    """Patient -> CSV row in PATIENT_FIELDS order (specific_doctor stored as its DoctorID)."""
+    return [
+        patient.patient_id, patient.name, patient.age,
+        patient.urgent_care, patient.specialist_needed, patient.regular_checkup,
+        patient.follow_up, patient.insurance, patient.chronic_condition,
+        patient.specific_doctor or "",
+        patient.insurance_type
+    ]
+
 
 def save_patient_to_csv(patient: Patient, filepath="data/patients.csv"):
+    """
+    One-off append of a single patient. The running system uses a shared
+    writers.CsvAppendWriter instead (see HospitalSystem.register_patient).
+    """
     try:
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
         file_exists = os.path.isfile(filepath) and os.path.getsize(filepath) > 0
-        specific_doctor_str = str(patient.specific_doctor) if patient.specific_doctor else ""
+        specific_doctor_str = patient.specific_doctor or ""
         with open(filepath, 'a', newline='') as csvfile:
-            fieldnames = [
-                'patient_id', 'name', 'age', 'urgent_care', 'specialist_needed',
-                'regular_checkup', 'follow_up', 'insurance', 'chronic_condition',
-                'specific_doctor', 'insurance_type'
-            ]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer = csv.DictWriter(csvfile, fieldnames=PATIENT_FIELDS)
             if not file_exists:
                 writer.writeheader()
             writer.writerow({
@@ -192,11 +255,38 @@ def save_patient_to_csv(patient: Patient, filepath="data/patients.csv"):
         print(f"Error saving patient: {e}")
 
 
-def pandas_patient_summary(csv_path="data/patients.csv"):
+def load_services_csv(filepath="data/billing.csv") -> Dict[str, int]:
+    """
+    Reads data/billing.csv into {service: price in cents}
+    """
+    services = {}
+    try:
+        # Ensure directory exists
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            
+        # Read the existing billing.csv file
+        with open(filepath, 'r', newline='') as csvfile:
+            reader = csv.DictReader(csvfile)
+            for row in reader:
+                services[row['Service']] = parse_cents(row['Price'])
+        return services
+        
+    except Exception as e:
+        print(f"Error loading services: {e}")
+        return {}
+
+
+def pandas_patient_summary(csv_path="data/patients.csv", sqlite_path=None):
+    """Full pandas recompute of the summary report, from patients.csv or (sqlite_path) the patients table."""
     try:
         import pandas as pd
         import matplotlib.pyplot as plt
-        df = pd.read_csv(csv_path)
+        if sqlite_path:
+            import sqlite3
+            with closing(sqlite3.connect(sqlite_path)) as conn:
+                df = pd.read_sql_query("SELECT * FROM patients ORDER BY seq", conn)
+        else:
+            df = pd.read_csv(csv_path)
         df.columns = df.columns.str.lower()
         # Handle missing or malformed data
         df = df.dropna(subset=['age'])
@@ -0,0 +1,256 @@
+import atexit
+import csv
+import io
+import os
+import threading
+import time
+from typing import List, Optional, Sequence
+
+
+def repair_torn_tail(filepath: str) -> int:
+    """
+    Handle a last line of `filepath` without a trailing newline: either a crash
+    mid-append or a complete row in a hand-edited file. A tail that parses as a
+    full row (at least as many fields as the header) is kept and gets its
+    newline; anything else (short, unparsable, cut inside a quote or a UTF-8 character)
+    is truncated back to the end of the last complete line. Both cases are
+    printed. Returns the number of bytes removed.
+    """
+    if not os.path.isfile(filepath):
+        return 0
+    with open(filepath, 'rb+') as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return 0
+        f.seek(size - 1)
+        if f.read(1) == b'\n':
+            return 0
+        # Walk back in blocks until the previous newline
+        end = size
+        block = 4096
+        while end > 0:
+            start = max(0, end - block)
+            f.seek(start)
+            chunk = f.read(end - start)
+            newline = chunk.rfind(b'\n')
+            if newline != -1:
+                keep = start + newline + 1
+                break
+            end = start
+        else:
+            keep = 0
+        f.seek(keep)
+        tail = f.read()
+        f.seek(0)
+        header = f.readline() if keep else tail
+        removed = 0
+        if _is_complete_row(tail, header):
+            f.seek(size)
+            f.write(b'\n')
+            print(f"Warning: {filepath} did not end with a newline; kept its complete last row "
+                  f"{tail.decode('utf-8')!r}.")
+        else:
+            f.truncate(keep)
+            removed = size - keep
+            print(f"Warning: removed an incomplete last row from {filepath} ({size - keep} bytes): "
+                  f"{tail.decode('utf-8', 'replace')!r}")
+        f.flush()
+        os.fsync(f.fileno())
+        return removed
+
+
+def _is_complete_row(line: bytes, header_line: bytes) -> bool:
+    """True if `line` parses as one CSV row with at least as many fields as `header_line`."""
+    try:
+        rows = list(csv.reader(io.StringIO(line.decode('utf-8'), newline=''), strict=True))
+        header = next(csv.reader(io.StringIO(header_line.decode('utf-8'), newline='')), [])
+    except (UnicodeDecodeError, csv.Error):
+        return False
+    return len(rows) == 1 and len(header) > 0 and len(rows[0]) >= len(header)
+
+
+def upgrade_header(filepath: str, fieldnames: Sequence[str]) -> List[str]:
+    """
+    If `filepath` has an older header that `fieldnames` extends with new trailing
+    columns, rewrite it once with the new header and every row padded with empty
+    values (temp file + rename). Returns the columns added.
+    """
+    if not os.path.isfile(filepath) or os.path.getsize(filepath) == 0:
+        return []
+    fieldnames = list(fieldnames)
+    with open(filepath, 'r', newline='') as f:
+        header = next(csv.reader(f), [])
+        if len(header) >= len(fieldnames) or header != fieldnames[:len(header)]:
+            return []
+        padding = [''] * (len(fieldnames) - len(header))
+        tmp_path = filepath + ".tmp"
+        with open(tmp_path, 'w', newline='') as out:
+            writer = csv.writer(out, lineterminator='\n')
+            writer.writerow(fieldnames)
+            writer.writerows(row + padding for row in csv.reader(f))
+            out.flush()
+            os.fsync(out.fileno())
+    os.replace(tmp_path, filepath)
+    return fieldnames[len(header):]
+
+
+class CsvAppendWriter:
+    """
+    Long-lived, append-only CSV writer (one per file, shared by every caller and thread).
+    - The file is opened once; the header is written if it is empty
+    - On open a last row without a trailing newline is completed if it parses as a
+      full row and truncated otherwise (see repair_torn_tail), and a file with
+      an older header missing trailing fieldnames is upgraded (see upgrade_header)
+    - Callers only format rows into a shared queue buffer (whole rows under one
+      lock, so rows from different threads never interleave); a single writer
+      thread owns the file and writes each batch with a single fsync (group commit)
+      once max_rows are pending or max_delay seconds after the first pending row
+    - A caller more than max_queued rows ahead of the disk waits (back-pressure)
+    - flush() returns once every row queued before it is on disk, close() flushes,
+      stops the writer thread and releases the file; close() also runs at
+      interpreter exit
+    - A failed write is raised by the next write_rows(), flush() or close()
+    """
+
+    def __init__(self, filepath: str, fieldnames: Sequence[str],
+                 max_rows: int = 256, max_delay: float = 1.0, fsync: bool = True,
+                 max_queued: Optional[int] = None):
+        self.filepath = filepath
+        self.fieldnames = list(fieldnames)
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.fsync = fsync
+        self.max_queued = max_queued if max_queued is not None else max(16 * max_rows, 4096)
+        self.torn_bytes = 0
+
+        directory = os.path.dirname(filepath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.torn_bytes = repair_torn_tail(filepath)  # prints what it kept or removed
+        added = upgrade_header(filepath, self.fieldnames)
+        if added:
+            print(f"Added column(s) {', '.join(added)} to {filepath}.")
+
+        self._file = open(filepath, 'a', newline='')
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator='\n')
+        if self._file.tell() == 0:
+            self._writer.writerow(self.fieldnames)
+            self._write(self._buffer.getvalue())
+            self._buffer.seek(0)
+            self._buffer.truncate()
+        # Bytes of rows appended by this writer (the header does not count)
+        self.bytes_written = 0
+
+        lock = threading.Lock()
+        self._work = threading.Condition(lock)  # the writer thread waits here for rows
+        self._done = threading.Condition(lock)  # callers wait here for the disk
+        self._pending = 0  # rows in _buffer
+        self._oldest = 0.0  # monotonic time the first pending row was queued
+        self._queued = 0  # write_rows() calls accepted so far
+        self._written = 0  # of those, how many are on disk
+        self._flush_wanted = False
+        self._closing = False
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name=f"writer {os.path.basename(filepath)}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write_row(self, row: Sequence):
+        """Queue one row (values in fieldnames order)."""
+        self.write_rows((row,))
+
+    def write_rows(self, rows: List[Sequence]):
+        """Queue rows as one unit: they reach the file together, in order."""
+        if not rows:
+            return
+        with self._work:
+            self._check()
+            while self._pending >= self.max_queued and self._error is None:
+                self._done.wait()
+            self._check()
+            if not self._pending:
+                self._oldest = time.monotonic()
+                self._work.notify()  # start the max_delay clock
+            self._writer.writerows(rows)
+            self._pending += len(rows)
+            self._queued += 1
+            if self.max_delay <= 0:
+                self._wait_for(self._queued)
+                self._raise_error()
+            elif self._pending >= self.max_rows:
+                self._work.notify()
+
+    def flush(self):
+        """Wait until every row queued so far is written and fsynced."""
+        with self._work:
+            if self._thread.is_alive():
+                self._wait_for(self._queued)
+            self._raise_error()
+
+    def close(self):
+        with self._work:
+            if self._closing:
+                return
+            self._closing = True
+            self._work.notify()
+        self._thread.join()
+        self._file.close()
+        atexit.unregister(self.close)
+        self._raise_error()
+
+    # --- writer thread side ---
+
+    def _check(self):
+        if self._closing:
+            raise ValueError(f"{self.filepath} writer is closed")
+        self._raise_error()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def _wait_for(self, ticket: int):
+        """(lock held) Block until write_rows() call number `ticket` is on disk."""
+        while self._written < ticket and self._error is None:
+            self._flush_wanted = True
+            self._work.notify()
+            self._done.wait()
+
+    def _ready(self) -> bool:
+        """(lock held) Whether the pending rows should be written now."""
+        return (self._flush_wanted or self._closing or self.max_delay <= 0
+                or self._pending >= self.max_rows or time.monotonic() >= self._oldest + self.max_delay)
+
+    def _run(self):
+        while True:
+            with self._work:
+                while not (self._pending and self._ready()):
+                    if self._closing and not self._pending:
+                        return
+                    self._work.wait(self._oldest + self.max_delay - time.monotonic() if self._pending else None)
+                data = self._buffer.getvalue()
+                self._buffer.seek(0)
+                self._buffer.truncate()
+                self._pending = 0
+                self._flush_wanted = False
+                batch = self._queued
+            # The file is only ever touched here; callers keep queueing meanwhile
+            try:
+                size = self._write(data)
+                error = None
+            except Exception as e:
+                size, error = 0, e
+            with self._work:
+                self.bytes_written += size
+                if error is not None and self._error is None:
+                    self._error = error
+                self._written = batch
+                self._done.notify_all()
+
+    def _write(self, data: str) -> int:
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        return len(data.encode(self._file.encoding))